@@ -6,6 +6,8 @@ import pandas as pd
 import os
 from datetime import datetime
 
+from financeiro.cache_planilhas import ler_planilha
+
 # Caminho do arquivo original
 ARQUIVO_ORIGINAL = r'Z:\FRZ LOGISTICA\Diretoria\Sistema.PY\Projeto.PY\Financeiro.py\financeiro\uploads\endereço clientes.xlsx'
 
@@ -231,7 +233,7 @@ def processar_arquivo():
         print(f"📂 Lendo arquivo: {os.path.basename(ARQUIVO_ORIGINAL)}")
         
         # Ler o arquivo Excel
-        df = pd.read_excel(ARQUIVO_ORIGINAL)
+        df = ler_planilha(ARQUIVO_ORIGINAL)
         
         print(f"✅ Arquivo lido com sucesso!")
         print(f"📊 Total de linhas: {len(df)}")
@@ -0,0 +1,177 @@
+"""
+Tabelas de resumo materializadas para os dashboards financeiros.
+
+Os painéis (planejamento_frz, frz_log, dashboard, resumo) somavam as linhas
+brutas de contas_receber/contas_pagar/projecao a cada acesso. Aqui mantemos
+agregados por dia de vencimento × cliente/fornecedor × status (e por mês ×
+cliente para a projeção), reconstruídos na importação e no salvamento da
+projeção. O custo das telas passa a depender de dias × clientes, não do
+número de lançamentos.
+
+O grão diário (venc_key yyyymmdd) atende tanto as semanas de planejamento
+quanto os meses e os cards de "vencidas até hoje".
+
+As somas usam as colunas INTEGER em centavos (valor_principal_centavos /
+valor_centavos): o total de cada grupo é exato e só é convertido para reais
+(/ 100.0) ao gravar o resumo.
+"""
+
+from .clientes_principais import atualizar_cliente_canonico
+from .db_managers.migrate import migrar_valores_centavos
+
+# Resumo de contas a receber: conta_contabil_lsp = (conta_contabil = 'LSP Transportes'),
+# portanto 1, 0 ou NULL; o filtro "conta_contabil != 'LSP Transportes'" vira conta_contabil_lsp = 0.
+# principal_id vem de cliente_canonico (NULL para clientes fora dos 19 principais).
+DDL_RESUMOS = [
+    """
+    CREATE TABLE IF NOT EXISTS resumo_receber_diario (
+        venc_key INTEGER,
+        cliente TEXT,
+        status TEXT,
+        conta_contabil_lsp INTEGER,
+        principal_id INTEGER,
+        valor_total REAL NOT NULL DEFAULT 0,
+        qtd INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_resumo_receber_venc ON resumo_receber_diario (venc_key, cliente)",
+    "CREATE INDEX IF NOT EXISTS idx_resumo_receber_principal ON resumo_receber_diario (principal_id, venc_key)",
+    """
+    CREATE TABLE IF NOT EXISTS resumo_pagar_diario (
+        venc_key INTEGER,
+        fornecedor TEXT,
+        status TEXT,
+        valor_total REAL NOT NULL DEFAULT 0,
+        qtd INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_resumo_pagar_venc ON resumo_pagar_diario (venc_key, fornecedor)",
+    """
+    CREATE TABLE IF NOT EXISTS resumo_projecao_mensal (
+        ano INTEGER NOT NULL,
+        mes INTEGER NOT NULL,
+        cliente TEXT,
+        valor_total REAL NOT NULL DEFAULT 0,
+        qtd INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_resumo_projecao_mes ON resumo_projecao_mensal (ano, mes)",
+]
+
+
+def garantir_tabelas_resumo(conn):
+    """
+    Cria as tabelas de resumo (e índices) caso ainda não existam.
+    Retorna True quando uma tabela existente precisou de coluna nova (e deve ser reconstruída).
+    """
+    cur = conn.cursor()
+    migrou = False
+    cur.execute("PRAGMA table_info(resumo_receber_diario)")
+    colunas = {row[1] for row in cur.fetchall()}
+    if colunas and 'principal_id' not in colunas:
+        cur.execute("ALTER TABLE resumo_receber_diario ADD COLUMN principal_id INTEGER")
+        migrou = True
+    # Sem commit aqui: DDL não abre transação implícita, e quem chama pode estar no meio
+    # de uma (ex.: gravação da projeção + recálculo do resumo num único commit)
+    for ddl in DDL_RESUMOS:
+        cur.execute(ddl)
+    return migrou
+
+
+def _filtro_intervalo(venc_ini, venc_fim):
+    """Retorna (sql, params) para restringir a reconstrução a um intervalo de venc_key."""
+    if venc_ini is None or venc_fim is None:
+        return "", []
+    return " WHERE venc_key BETWEEN ? AND ?", [venc_ini, venc_fim]
+
+
+def atualizar_resumo_receber(conn, venc_ini=None, venc_fim=None):
+    """
+    Reconstrói resumo_receber_diario a partir de contas_receber.
+    Sem intervalo, reconstrói tudo (inclusive linhas sem venc_key); com intervalo, só os dias afetados.
+    """
+    garantir_tabelas_resumo(conn)
+    migrar_valores_centavos(conn, ('contas_receber',))
+    atualizar_cliente_canonico(conn)
+    filtro, params = _filtro_intervalo(venc_ini, venc_fim)
+    cur = conn.cursor()
+    cur.execute(f"DELETE FROM resumo_receber_diario{filtro}", params)
+    cur.execute(f"""
+        INSERT INTO resumo_receber_diario (venc_key, cliente, status, conta_contabil_lsp, principal_id, valor_total, qtd)
+        SELECT r.venc_key, r.cliente, r.status, r.conta_contabil_lsp, cc.principal_id, r.valor_total, r.qtd
+        FROM (
+            SELECT venc_key, cliente, status, (conta_contabil = 'LSP Transportes') AS conta_contabil_lsp,
+                   COALESCE(SUM(valor_principal_centavos), 0) / 100.0 AS valor_total, COUNT(*) AS qtd
+            FROM contas_receber{filtro}
+            GROUP BY venc_key, cliente, status, (conta_contabil = 'LSP Transportes')
+        ) r
+        LEFT JOIN cliente_canonico cc ON cc.nome_raw = r.cliente
+    """, params)
+    conn.commit()
+
+
+def atualizar_resumo_pagar(conn, venc_ini=None, venc_fim=None):
+    """Reconstrói resumo_pagar_diario a partir de contas_pagar (tudo ou apenas o intervalo de venc_key)."""
+    garantir_tabelas_resumo(conn)
+    migrar_valores_centavos(conn, ('contas_pagar',))
+    filtro, params = _filtro_intervalo(venc_ini, venc_fim)
+    cur = conn.cursor()
+    cur.execute(f"DELETE FROM resumo_pagar_diario{filtro}", params)
+    cur.execute(f"""
+        INSERT INTO resumo_pagar_diario (venc_key, fornecedor, status, valor_total, qtd)
+        SELECT venc_key, fornecedor, status, COALESCE(SUM(valor_principal_centavos), 0) / 100.0, COUNT(*)
+        FROM contas_pagar{filtro}
+        GROUP BY venc_key, fornecedor, status
+    """, params)
+    conn.commit()
+
+
+def atualizar_resumo_projecao(conn, mes=None, ano=None):
+    """Reconstrói resumo_projecao_mensal (tudo ou apenas o mês/ano salvo)."""
+    garantir_tabelas_resumo(conn)
+    migrar_valores_centavos(conn, ('projecao',))
+    if mes is None or ano is None:
+        filtro, params = "", []
+    else:
+        filtro, params = " WHERE mes = ? AND ano = ?", [int(mes), int(ano)]
+    cur = conn.cursor()
+    cur.execute(f"DELETE FROM resumo_projecao_mensal{filtro}", params)
+    cur.execute(f"""
+        INSERT INTO resumo_projecao_mensal (ano, mes, cliente, valor_total, qtd)
+        SELECT ano, mes, cliente, COALESCE(SUM(valor_centavos), 0) / 100.0, COUNT(*)
+        FROM projecao{filtro}
+        GROUP BY ano, mes, cliente
+    """, params)
+    conn.commit()
+
+
+def preparar_resumos(conn):
+    """
+    Garante as tabelas de resumo e as reconstrói quando estão vazias mas a origem tem dados
+    (banco existente antes dos resumos, ou importação feita por scripts externos).
+    """
+    migrou = garantir_tabelas_resumo(conn)
+    if migrou:
+        atualizar_resumo_receber(conn)
+    cur = conn.cursor()
+    pares = [
+        ('resumo_receber_diario', 'contas_receber', atualizar_resumo_receber),
+        ('resumo_pagar_diario', 'contas_pagar', atualizar_resumo_pagar),
+        ('resumo_projecao_mensal', 'projecao', atualizar_resumo_projecao),
+    ]
+    for resumo, origem, atualizar in pares:
+        cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (origem,))
+        if not cur.fetchone():
+            continue
+        cur.execute(f"SELECT EXISTS (SELECT 1 FROM {resumo})")
+        vazio = not cur.fetchone()[0]
+        cur.execute(f"SELECT EXISTS (SELECT 1 FROM {origem})")
+        if vazio and cur.fetchone()[0]:
+            atualizar(conn)
+
+
+def atualizar_todos_resumos(conn):
+    """Reconstrói todos os resumos; usado na inicialização do banco."""
+    atualizar_resumo_receber(conn)
+    atualizar_resumo_pagar(conn)
+    atualizar_resumo_projecao(conn)
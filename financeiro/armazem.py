@@ -6,6 +6,8 @@ from datetime import datetime, timedelta
 from collections import defaultdict
 from werkzeug.utils import secure_filename
 
+from .cache_planilhas import ler_planilha
+
 bp = Blueprint('armazem', __name__, url_prefix='/armazem')
 
 # Caminho do arquivo
@@ -20,7 +22,7 @@ def carregar_dados_armazem():
             return None
         
         # ===== LER ABA SJC =====
-        df_sjc = pd.read_excel(ARMAZEM_FILE, sheet_name='SJC', header=None)
+        df_sjc = ler_planilha(ARMAZEM_FILE, sheet_name='SJC', header=None)
         df_sjc = df_sjc.iloc[3:].reset_index(drop=True)  # Pula as 3 primeiras linhas
         
         df_sjc.columns = [
@@ -49,7 +51,7 @@ def carregar_dados_armazem():
         df_sjc['Minerva_JAC_Peso'] = 0
         
         # ===== LER ABA JAC =====
-        df_jac = pd.read_excel(ARMAZEM_FILE, sheet_name='JAC', header=None)
+        df_jac = ler_planilha(ARMAZEM_FILE, sheet_name='JAC', header=None)
         df_jac = df_jac.iloc[3:].reset_index(drop=True)  # Pula as 3 primeiras linhas
         
         df_jac.columns = [
@@ -0,0 +1,191 @@
+"""
+Cache colunar das planilhas enviadas.
+
+Cada módulo que lê um xlsx (margem, painel de frete, armazém, suporte...)
+o reinterpretava inteiro com openpyxl a cada carga fria, o que leva
+segundos no manifesto e no ARMAZEM. Aqui a primeira leitura de cada aba
+grava um arquivo colunar ao lado (Parquet quando o pyarrow está instalado)
+e as leituras seguintes usam esse arquivo.
+
+A chave é caminho + mtime + tamanho da planilha: um novo upload invalida o
+cache sozinho. Colunas com tipos misturados (ex: Valor NF com números e um
+texto, datas e textos nas abas do ARMAZEM), que o Parquet não aceita, são
+gravadas como texto com o tipo de cada valor ('i:12', 'f:1.5', 'd:2025-01-02T00:00:00')
+e voltam com os mesmos valores na leitura. Sem pyarrow não há cache e a
+planilha é lida direto (nada é desserializado com pickle do diretório de uploads).
+"""
+
+import glob
+import hashlib
+import json
+import os
+from datetime import date, datetime, time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_DISPONIVEL = True
+except ImportError:
+    PARQUET_DISPONIVEL = False
+
+DIRETORIO_CACHE = os.path.join(os.path.dirname(__file__), 'uploads', '.cache_planilhas')
+
+# Chave, nos metadados do Parquet, dos nomes originais das colunas (header=None dá nomes inteiros)
+# e das posições das colunas gravadas como texto com tipo
+METADADO_CACHE = b'cache_planilhas'
+
+# Nome da aba ativa por (caminho, versão do arquivo), usado em aba_ativa
+_abas_ativas = {}
+
+
+def _prefixo_sidecar(caminho, sheet_name, header):
+    """Prefixo do sidecar de uma aba (sem a versão mtime/tamanho): permite apagar versões antigas."""
+    caminho = os.path.abspath(caminho)
+    id_caminho = hashlib.sha1(caminho.encode('utf-8')).hexdigest()[:12]
+    nome = os.path.basename(caminho)
+    return os.path.join(DIRETORIO_CACHE, f"{nome}.{id_caminho}.{sheet_name}.h{header}")
+
+
+def _versao(caminho):
+    st = os.stat(caminho)
+    return f"{st.st_mtime_ns}_{st.st_size}"
+
+
+def _codificar(valor):
+    """Valor de uma coluna mista como 'tipo:texto'. Tipos sem codificação levantam TypeError."""
+    if isinstance(valor, str):
+        return 's:' + valor
+    if isinstance(valor, (bool, np.bool_)):
+        return f"b:{int(valor)}"
+    if isinstance(valor, (int, np.integer)):
+        return f"i:{int(valor)}"
+    if isinstance(valor, (float, np.floating)):
+        return 'f:' + repr(float(valor))
+    if isinstance(valor, datetime):
+        return 'd:' + valor.isoformat()
+    if isinstance(valor, date):
+        return 'D:' + valor.isoformat()
+    if isinstance(valor, time):
+        return 't:' + valor.isoformat()
+    raise TypeError(f"tipo sem codificação no cache: {type(valor).__name__}")
+
+
+_DECODIFICADORES = {
+    's': str,
+    'b': lambda texto: bool(int(texto)),
+    'i': int,
+    'f': float,
+    'd': datetime.fromisoformat,
+    'D': date.fromisoformat,
+    't': time.fromisoformat,
+}
+
+
+def _decodificar(texto):
+    if not isinstance(texto, str):
+        return np.nan
+    tipo, valor = texto[0], texto[2:]
+    return _DECODIFICADORES[tipo](valor)
+
+
+def _colunas_mistas(df):
+    """Posições das colunas object com algum valor não textual."""
+    mistas = []
+    for i in range(df.shape[1]):
+        serie = df.iloc[:, i]
+        if serie.dtype == object and not serie.dropna().map(type).eq(str).all():
+            mistas.append(i)
+    return mistas
+
+
+def _ler_sidecar(sidecar):
+    if not os.path.exists(sidecar):
+        return None
+    try:
+        tabela = pq.read_table(sidecar)
+        metadado = json.loads(tabela.schema.metadata[METADADO_CACHE])
+        df = tabela.to_pandas()
+        df.columns = metadado['colunas']
+        for i in metadado['mistas']:
+            df.isetitem(i, pd.Series([_decodificar(v) for v in df.iloc[:, i]], index=df.index, dtype=object))
+        return df
+    except Exception as e:
+        print(f"⚠️ Cache de planilha ilegível, relendo o xlsx: {os.path.basename(sidecar)} ({str(e)})")
+        return None
+
+
+def _gravar_sidecar(prefixo, sidecar, df):
+    os.makedirs(DIRETORIO_CACHE, exist_ok=True)
+    # Versões anteriores da mesma aba (e sidecars .pkl de versões antigas deste módulo) ficaram obsoletas
+    for antigo in glob.glob(glob.escape(prefixo) + '.*'):
+        try:
+            os.remove(antigo)
+        except OSError:
+            pass
+
+    mistas = _colunas_mistas(df)
+    metadado = json.dumps({'colunas': list(df.columns), 'mistas': mistas}).encode()
+    df = df.copy()
+    df.columns = [str(i) for i in range(df.shape[1])]
+    for i in mistas:
+        df.isetitem(i, pd.Series([None if pd.isna(v) else _codificar(v) for v in df.iloc[:, i]],
+                                 index=df.index, dtype=object))
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    tabela = tabela.replace_schema_metadata({**tabela.schema.metadata, METADADO_CACHE: metadado})
+
+    temporario = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        pq.write_table(tabela, temporario)
+        os.replace(temporario, sidecar)
+    except Exception:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+    return sidecar
+
+
+def aba_ativa(caminho):
+    """Nome da aba ativa do xlsx (a que openpyxl devolve em wb.active), lido uma vez por versão do arquivo."""
+    chave = (os.path.abspath(caminho), _versao(caminho))
+    nome = _abas_ativas.get(chave)
+    if nome is None:
+        from openpyxl import load_workbook
+
+        wb = load_workbook(caminho, read_only=True)
+        try:
+            nome = wb.active.title
+        finally:
+            wb.close()
+        _abas_ativas[chave] = nome
+    return nome
+
+
+def ler_planilha(caminho, sheet_name=0, header=0, usecols=None):
+    """
+    pd.read_excel com cache colunar por aba. usecols (lista de nomes) é aplicado depois do
+    cache, que guarda a aba inteira; colunas ausentes levantam ValueError como no read_excel.
+    """
+    prefixo = _prefixo_sidecar(caminho, sheet_name, header)
+    sidecar = f"{prefixo}.{_versao(caminho)}.parquet"
+
+    df = _ler_sidecar(sidecar) if PARQUET_DISPONIVEL else None
+    if df is None:
+        df = pd.read_excel(caminho, sheet_name=sheet_name, header=header)
+        if PARQUET_DISPONIVEL:
+            try:
+                _gravar_sidecar(prefixo, sidecar, df)
+                print(f"🗃️ Cache colunar criado: {os.path.basename(sidecar)}")
+            except Exception as e:
+                print(f"⚠️ Não foi possível gravar o cache da planilha: {str(e)}")
+
+    if usecols is not None:
+        faltando = [c for c in usecols if c not in df.columns]
+        if faltando:
+            raise ValueError(f"Usecols do not match columns, columns expected but not found: {faltando}")
+        df = df[list(usecols)]
+    return df
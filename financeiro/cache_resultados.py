@@ -0,0 +1,64 @@
+"""
+Cache versionado de resultados dos dashboards.
+
+build_dados_frz / build_dados_frz_log e as APIs executivas recalculam tudo
+a cada acesso, mas os números só mudam quando há escrita (importação de
+contas ou salvamento da projeção). Os resultados ficam em memória com
+chave (função, argumentos, versão dos dados) e despejo LRU limitado; cada
+escrita chama invalidar_cache(), que incrementa a versão.
+"""
+
+import copy
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+_lock = threading.Lock()
+_versao_dados = 0
+
+
+def versao_dados():
+    """Versão atual dos dados financeiros (incrementada a cada escrita)."""
+    return _versao_dados
+
+
+def invalidar_cache():
+    """Incrementa a versão dos dados; entradas antigas deixam de ser usadas e saem pelo LRU."""
+    global _versao_dados
+    with _lock:
+        _versao_dados += 1
+    return _versao_dados
+
+
+def cache_por_versao(maxsize=32):
+    """
+    Decorator de memoização com chave (argumentos, versão dos dados) e despejo LRU.
+    Devolve uma cópia do resultado para que o chamador possa alterá-lo sem afetar o cache.
+    """
+    def decorator(func):
+        entradas = OrderedDict()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            chave = (args, tuple(sorted(kwargs.items())), _versao_dados)
+            with _lock:
+                if chave in entradas:
+                    entradas.move_to_end(chave)
+                    return copy.deepcopy(entradas[chave])
+
+            resultado = func(*args, **kwargs)
+
+            with _lock:
+                entradas[chave] = resultado
+                entradas.move_to_end(chave)
+                while len(entradas) > maxsize:
+                    entradas.popitem(last=False)
+            return copy.deepcopy(resultado)
+
+        def limpar():
+            with _lock:
+                entradas.clear()
+
+        wrapper.limpar_cache = limpar
+        return wrapper
+    return decorator
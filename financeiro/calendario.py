@@ -0,0 +1,272 @@
+"""
+Calendário das semanas de planejamento do FRZ.
+
+As semanas de cada mês seguem o padrão fixo do planejamento (PADRAO_SEMANAS,
+dias de início/fim por mês, com semanas que cruzam o mês anterior/seguinte).
+A tabela calendario_semanas materializa esse padrão por data: cada dia
+(data_key yyyymmdd) aponta para a semana de planejamento (semana_id), o mês
+dono da semana e o rótulo. As somas semanais viram um JOIN por data_key com
+GROUP BY semana_id, sem tratamento especial para semanas entre meses.
+
+semana_id = (ano * 100 + mes) * 10 + idx, com idx 0..4 a posição da semana no mês.
+Cada mês tem as chaves dos dias 1..31, inclusive os inexistentes (ex.: 31/09): a grade
+da projeção sempre tem 31 colunas e esses valores entram na semana que contém a chave.
+"""
+
+import sqlite3
+from datetime import date, datetime
+
+# Mapeamento estático das semanas para cada mês (baseado no print)
+PADRAO_SEMANAS = {
+    1: [  # Janeiro
+        {'label': 'SEMANA 1 A 7', 'inicio_dia': 1, 'fim_dia': 7},
+        {'label': 'SEMANA 8 A 14', 'inicio_dia': 8, 'fim_dia': 14},
+        {'label': 'SEMANA 15 A 21', 'inicio_dia': 15, 'fim_dia': 21},
+        {'label': 'SEMANA 22 A 28', 'inicio_dia': 22, 'fim_dia': 28},
+        {'label': '-', 'inicio_dia': None, 'fim_dia': None}
+    ],
+    2: [  # Fevereiro
+        {'label': 'SEMANA 1 A 7', 'inicio_dia': 1, 'fim_dia': 7},
+        {'label': 'SEMANA 8 A 14', 'inicio_dia': 8, 'fim_dia': 14},
+        {'label': 'SEMANA 15 A 21', 'inicio_dia': 15, 'fim_dia': 21},
+        {'label': 'SEMANA 22 A 28', 'inicio_dia': 22, 'fim_dia': 28},
+        {'label': '-', 'inicio_dia': None, 'fim_dia': None}
+    ],
+    3: [  # Março
+        {'label': 'SEMANA 1 A 7', 'inicio_dia': 1, 'fim_dia': 7},
+        {'label': 'SEMANA 8 A 14', 'inicio_dia': 8, 'fim_dia': 14},
+        {'label': 'SEMANA 15 A 21', 'inicio_dia': 15, 'fim_dia': 21},
+        {'label': 'SEMANA 22 A 28', 'inicio_dia': 22, 'fim_dia': 28},
+        {'label': 'SEMANA 29 A 4', 'inicio_dia': 29, 'fim_dia': 4}  # Abril
+    ],
+    4: [  # Abril
+        {'label': 'SEMANA 5 A 11', 'inicio_dia': 5, 'fim_dia': 11},
+        {'label': 'SEMANA 12 A 18', 'inicio_dia': 12, 'fim_dia': 18},
+        {'label': 'SEMANA 19 A 25', 'inicio_dia': 19, 'fim_dia': 25},
+        {'label': 'SEMANA 26 A 2', 'inicio_dia': 26, 'fim_dia': 2},  # Maio
+        {'label': '-', 'inicio_dia': None, 'fim_dia': None}
+    ],
+    5: [  # Maio
+        {'label': 'SEMANA 3 A 9', 'inicio_dia': 3, 'fim_dia': 9},
+        {'label': 'SEMANA 10 A 16', 'inicio_dia': 10, 'fim_dia': 16},
+        {'label': 'SEMANA 17 A 23', 'inicio_dia': 17, 'fim_dia': 23},
+        {'label': 'SEMANA 24 A 30', 'inicio_dia': 24, 'fim_dia': 30},
+        {'label': '-', 'inicio_dia': None, 'fim_dia': None}
+    ],
+    6: [  # Junho
+        {'label': 'SEMANA 31 A 6', 'inicio_dia': 31, 'fim_dia': 6},  # Maio-Junho
+        {'label': 'SEMANA 7 A 13', 'inicio_dia': 7, 'fim_dia': 13},
+        {'label': 'SEMANA 14 A 20', 'inicio_dia': 14, 'fim_dia': 20},
+        {'label': 'SEMANA 21 A 27', 'inicio_dia': 21, 'fim_dia': 27},
+        {'label': 'SEMANA 28 A 4', 'inicio_dia': 28, 'fim_dia': 4}  # Julho
+    ],
+    7: [  # Julho
+        {'label': 'SEMANA 5 A 11', 'inicio_dia': 5, 'fim_dia': 11},
+        {'label': 'SEMANA 12 A 18', 'inicio_dia': 12, 'fim_dia': 18},
+        {'label': 'SEMANA 19 A 25', 'inicio_dia': 19, 'fim_dia': 25},
+        {'label': 'SEMANA 26 A 1', 'inicio_dia': 26, 'fim_dia': 1},  # Agosto
+        {'label': '-', 'inicio_dia': None, 'fim_dia': None}
+    ],
+    8: [  # Agosto
+        {'label': 'SEMANA 2 A 8', 'inicio_dia': 2, 'fim_dia': 8},
+        {'label': 'SEMANA 9 A 15', 'inicio_dia': 9, 'fim_dia': 15},
+        {'label': 'SEMANA 16 A 22', 'inicio_dia': 16, 'fim_dia': 22},
+        {'label': 'SEMANA 23 A 29', 'inicio_dia': 23, 'fim_dia': 29},
+        {'label': '-', 'inicio_dia': None, 'fim_dia': None}
+    ],
+    9: [  # Setembro
+        {'label': 'SEMANA 30 A 5', 'inicio_dia': 30, 'fim_dia': 5},  # Agosto-Setembro
+        {'label': 'SEMANA 6 A 12', 'inicio_dia': 6, 'fim_dia': 12},
+        {'label': 'SEMANA 13 A 19', 'inicio_dia': 13, 'fim_dia': 19},
+        {'label': 'SEMANA 20 A 26', 'inicio_dia': 20, 'fim_dia': 26},
+        {'label': 'SEMANA 27 A 3', 'inicio_dia': 27, 'fim_dia': 3}  # Outubro
+    ],
+    10: [  # Outubro
+        {'label': 'SEMANA 4 A 10', 'inicio_dia': 4, 'fim_dia': 10},
+        {'label': 'SEMANA 11 A 17', 'inicio_dia': 11, 'fim_dia': 17},
+        {'label': 'SEMANA 18 A 24', 'inicio_dia': 18, 'fim_dia': 24},
+        {'label': 'SEMANA 25 A 31', 'inicio_dia': 25, 'fim_dia': 31},
+        {'label': '-', 'inicio_dia': None, 'fim_dia': None}
+    ],
+    11: [  # Novembro
+        {'label': 'SEMANA 1 A 7', 'inicio_dia': 1, 'fim_dia': 7},
+        {'label': 'SEMANA 8 A 14', 'inicio_dia': 8, 'fim_dia': 14},
+        {'label': 'SEMANA 15 A 21', 'inicio_dia': 15, 'fim_dia': 21},
+        {'label': 'SEMANA 22 A 28', 'inicio_dia': 22, 'fim_dia': 28},
+        {'label': '-', 'inicio_dia': None, 'fim_dia': None}
+    ],
+    12: [  # Dezembro
+        {'label': 'SEMANA 29 A 5', 'inicio_dia': 29, 'fim_dia': 5},  # Novembro-Dezembro
+        {'label': 'SEMANA 6 A 12', 'inicio_dia': 6, 'fim_dia': 12},
+        {'label': 'SEMANA 13 A 19', 'inicio_dia': 13, 'fim_dia': 19},
+        {'label': 'SEMANA 20 A 26', 'inicio_dia': 20, 'fim_dia': 26},
+        {'label': 'SEMANA 27 A 2', 'inicio_dia': 27, 'fim_dia': 2}  # Janeiro próximo
+    ]
+}
+
+
+# Anos gerados ao redor do ano corrente quando o calendário é criado
+ANOS_CALENDARIO_ANTES = 5
+ANOS_CALENDARIO_DEPOIS = 5
+
+DDL_CALENDARIO = [
+    """
+    CREATE TABLE IF NOT EXISTS calendario_semanas (
+        data_key INTEGER NOT NULL,
+        semana_id INTEGER NOT NULL,
+        ano INTEGER NOT NULL,
+        mes INTEGER NOT NULL,
+        idx INTEGER NOT NULL,
+        label TEXT NOT NULL,
+        PRIMARY KEY (data_key, semana_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_calendario_semanas_semana ON calendario_semanas (semana_id, data_key)",
+]
+
+
+def semanas_do_padrao(mes, ano):
+    """
+    Calcula as semanas (inicio, fim, label) de mes/ano a partir de PADRAO_SEMANAS.
+    Semanas vazias ficam com inicio/fim None e label '-'.
+    """
+    semanas = []
+    for idx, semana_config in enumerate(PADRAO_SEMANAS.get(mes, [])):
+        if semana_config['inicio_dia'] is None:
+            # Semana vazia
+            semanas.append({'inicio': None, 'fim': None, 'label': '-'})
+            continue
+
+        # Calcular as datas reais (suportando semanas que cruzam mês anterior/próximo)
+        start_day = semana_config['inicio_dia']
+        end_day = semana_config['fim_dia']
+        inicio_year, inicio_month = ano, mes
+        fim_year, fim_month = ano, mes
+
+        if start_day > end_day:
+            # A semana cruza um mês: a primeira semana (idx 0) começa no mês anterior,
+            # as demais (ex.: 'SEMANA 26 A 2' de abril) terminam no mês seguinte
+            if idx == 0:
+                inicio_month, inicio_year = (12, ano - 1) if mes == 1 else (mes - 1, ano)
+            else:
+                fim_month, fim_year = (1, ano + 1) if mes == 12 else (mes + 1, ano)
+
+        try:
+            inicio = datetime(inicio_year, inicio_month, start_day)
+            fim = datetime(fim_year, fim_month, min(end_day, 31))
+        except ValueError:
+            inicio = None
+            fim = None
+
+        semanas.append({'inicio': inicio, 'fim': fim, 'label': semana_config['label']})
+
+    return semanas
+
+
+def _chaves_entre(inicio, fim):
+    """Chaves yyyymmdd de inicio até fim, com dias 1..31 em todos os meses."""
+    ano, mes, dia = inicio.year, inicio.month, inicio.day
+    chave_fim = fim.year * 10000 + fim.month * 100 + fim.day
+    while True:
+        chave = ano * 10000 + mes * 100 + dia
+        if chave > chave_fim:
+            return
+        yield chave
+        dia += 1
+        if dia > 31:
+            dia = 1
+            mes, ano = (1, ano + 1) if mes == 12 else (mes + 1, ano)
+
+
+def _data_da_chave(chave):
+    return datetime(chave // 10000, chave // 100 % 100, chave % 100)
+
+
+def garantir_tabela_calendario(conn):
+    """Cria a tabela calendario_semanas caso não exista."""
+    cur = conn.cursor()
+    for ddl in DDL_CALENDARIO:
+        cur.execute(ddl)
+
+
+def gerar_calendario_semanas(conn, ano_ini, ano_fim):
+    """(Re)gera as linhas de calendario_semanas dos meses de ano_ini até ano_fim."""
+    garantir_tabela_calendario(conn)
+    linhas = []
+    for ano in range(ano_ini, ano_fim + 1):
+        for mes in range(1, 13):
+            base = (ano * 100 + mes) * 10
+            for idx, semana in enumerate(semanas_do_padrao(mes, ano)):
+                if semana['inicio'] is None or semana['fim'] is None:
+                    continue
+                for chave in _chaves_entre(semana['inicio'], semana['fim']):
+                    linhas.append((chave, base + idx, ano, mes, idx, semana['label']))
+
+    cur = conn.cursor()
+    cur.execute("DELETE FROM calendario_semanas WHERE ano BETWEEN ? AND ?", (ano_ini, ano_fim))
+    cur.executemany("""
+        INSERT INTO calendario_semanas (data_key, semana_id, ano, mes, idx, label)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, linhas)
+    conn.commit()
+    return len(linhas)
+
+
+def garantir_calendario_semanas(conn, anos=None):
+    """
+    Garante que calendario_semanas cobre os anos pedidos (ou a janela padrão ao redor do ano corrente).
+    Gera apenas os anos que ainda não existem na tabela.
+    """
+    garantir_tabela_calendario(conn)
+    if anos is None:
+        atual = date.today().year
+        anos = range(atual - ANOS_CALENDARIO_ANTES, atual + ANOS_CALENDARIO_DEPOIS + 1)
+
+    cur = conn.cursor()
+    cur.execute("SELECT DISTINCT ano FROM calendario_semanas")
+    existentes = {row[0] for row in cur.fetchall()}
+    for ano in sorted(set(anos) - existentes):
+        gerar_calendario_semanas(conn, ano, ano)
+
+
+def semanas_dos_meses(cur, meses):
+    """
+    Lê de calendario_semanas as semanas de cada (mes, ano) pedido.
+    Retorna uma lista por mês com 5 posições {'inicio', 'fim', 'label'} (inicio/fim datetime;
+    semanas sem dias ficam com label '-'), no mesmo formato de semanas_do_padrao.
+    """
+    anos = {ano for _, ano in meses}
+    try:
+        garantir_calendario_semanas(cur.connection, anos)
+    except sqlite3.OperationalError:
+        # Snapshot analítico (somente leitura) sem os anos pedidos: gera no banco vivo e lê de lá
+        from .database import get_connection
+        from .snapshot_analitico import agendar_snapshot
+        conn = get_connection()
+        try:
+            garantir_calendario_semanas(conn, anos)
+            return semanas_dos_meses(conn.cursor(), meses)
+        finally:
+            conn.close()
+            agendar_snapshot()
+    chaves = [ano * 100 + mes for mes, ano in meses]
+    cur.execute("""
+        SELECT semana_id, MIN(label), MIN(data_key), MAX(data_key)
+        FROM calendario_semanas
+        WHERE semana_id BETWEEN ? AND ?
+        GROUP BY semana_id
+    """, (min(chaves) * 10, max(chaves) * 10 + 9))
+    por_semana = {semana_id: (label, ini, fim) for semana_id, label, ini, fim in cur.fetchall()}
+
+    resultado = []
+    for chave in chaves:
+        semanas = []
+        for idx in range(5):
+            encontrada = por_semana.get(chave * 10 + idx)
+            if encontrada is None:
+                semanas.append({'inicio': None, 'fim': None, 'label': '-'})
+            else:
+                label, ini, fim = encontrada
+                semanas.append({'inicio': _data_da_chave(ini), 'fim': _data_da_chave(fim), 'label': label})
+        resultado.append(semanas)
+    return resultado
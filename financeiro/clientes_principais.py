@@ -0,0 +1,114 @@
+"""
+Dimensão dos 19 clientes principais do FRZ.
+
+Os nomes de cliente chegam do ERP com variações (acentos, espaços, sufixos).
+Em vez de normalizar e comparar cada nome a cada consulta, a tabela
+cliente_canonico guarda o mapeamento nome bruto → cliente principal
+(principal_id 1..19 na ordem de CLIENTES_19_PRINCIPAIS, ou NULL), preenchido
+na importação. Os filtros dos dashboards viram um IN/JOIN por chave inteira.
+"""
+
+import unicodedata
+
+# Lista dos 19 clientes principais (normalizados)
+CLIENTES_19_PRINCIPAIS = [
+    'ADORO', 'ADORO S.A.', 'ADORO SAO CARLOS', 'AGRA FOODS', 'ALIBEM', 'FRIBOI',
+    'GOLDPAO CD SAO JOSE DOS CAMPOS', 'GTFOODS BARUERI', 'JK DISTRIBUIDORA',
+    'LATICINIO CARMONA', 'MARFRIG - ITUPEVA CD', 'MARFRIG - PROMISSAO',
+    'MARFRIG GLOBAL FOODS S A', 'MINERVA S A', 'PAMPLONA JANDIRA',
+    'PEIXES MEGGS PESCADOS LTDA - SJBV', 'SANTA LUCIA', 'SAUDALI', 'VALENCIO JATAI'
+]
+
+
+# Função inteligente para normalizar nomes de clientes
+def normalizar_nome_cliente(nome):
+    """Normaliza nomes removendo acentos, espaços extras e padronizando maiúsculas"""
+    if not nome:
+        return ""
+
+    # Remove acentos
+    nome = unicodedata.normalize('NFD', nome)
+    nome = ''.join(char for char in nome if unicodedata.category(char) != 'Mn')
+
+    # Converte para maiúsculo e remove espaços extras
+    nome = nome.upper().strip()
+
+    # Remove espaços duplos
+    while '  ' in nome:
+        nome = nome.replace('  ', ' ')
+
+    return nome
+
+
+# Normalização da lista principal feita uma única vez
+_PRINCIPAIS_NORMALIZADOS = [normalizar_nome_cliente(c) for c in CLIENTES_19_PRINCIPAIS]
+
+
+def resolver_cliente_principal(nome_cliente):
+    """
+    Retorna o principal_id (1..19) do cliente principal correspondente ao nome, ou None.
+    Aceita match exato após normalização ou parcial quando a diferença é de até 2 caracteres
+    (ex.: "GTFOODS BARUERI " com espaço).
+    """
+    nome_normalizado = normalizar_nome_cliente(nome_cliente)
+    if not nome_normalizado:
+        return None
+
+    for idx, principal in enumerate(_PRINCIPAIS_NORMALIZADOS, start=1):
+        if nome_normalizado == principal:
+            return idx
+
+        if principal in nome_normalizado or nome_normalizado in principal:
+            # Só aceita se a diferença for apenas espaços
+            if abs(len(nome_normalizado) - len(principal)) <= 2:
+                return idx
+
+    return None
+
+
+def eh_cliente_principal(nome_cliente):
+    """Verifica se um cliente está na lista dos 19 principais usando normalização inteligente"""
+    return resolver_cliente_principal(nome_cliente) is not None
+
+
+DDL_CLIENTE_CANONICO = [
+    """
+    CREATE TABLE IF NOT EXISTS cliente_canonico (
+        nome_raw TEXT PRIMARY KEY,
+        principal_id INTEGER,
+        cliente_principal TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_cliente_canonico_principal ON cliente_canonico (principal_id)",
+]
+
+
+def garantir_cliente_canonico(conn):
+    """Cria a tabela cliente_canonico caso não exista."""
+    cur = conn.cursor()
+    for ddl in DDL_CLIENTE_CANONICO:
+        cur.execute(ddl)
+    conn.commit()
+
+
+def atualizar_cliente_canonico(conn):
+    """
+    Recalcula o mapeamento nome bruto → cliente principal para todos os nomes distintos
+    de contas_receber. São poucas centenas de nomes, então a reconstrução é completa.
+    """
+    garantir_cliente_canonico(conn)
+    cur = conn.cursor()
+    cur.execute("SELECT DISTINCT cliente FROM contas_receber WHERE cliente IS NOT NULL")
+    linhas = []
+    for (nome,) in cur.fetchall():
+        principal_id = resolver_cliente_principal(nome)
+        principal = CLIENTES_19_PRINCIPAIS[principal_id - 1] if principal_id else None
+        linhas.append((nome, principal_id, principal))
+
+    cur.execute("DELETE FROM cliente_canonico")
+    cur.executemany(
+        "INSERT INTO cliente_canonico (nome_raw, principal_id, cliente_principal) VALUES (?, ?, ?)",
+        linhas
+    )
+    conn.commit()
+    return len(linhas)
@@ -228,14 +228,23 @@ class CustoFrotaHelper:
         if not tipologia or not km:
             return 0.0
         
+        custos = CustoFrotaHelper.buscar_custo_por_tipologia(tipologia)
+        return CustoFrotaHelper.calcular_com_custos(custos['custo_fixo'], custos['custo_variavel'],
+                                                    km, custos['encontrado'])
+    
+    @staticmethod
+    def calcular_com_custos(custo_fixo, custo_variavel, km, encontrado=True):
+        """
+        Custo frota fixa com os custos da tipologia já buscados (ex: VeiculoHelper.buscar_placas_com_custo)
+        Retorna: float
+        """
+        if not encontrado or not km:
+            return 0.0
+        
         try:
             km_float = float(km)
         except (ValueError, TypeError):
             return 0.0
         
-        custos = CustoFrotaHelper.buscar_custo_por_tipologia(tipologia)
-        if not custos['encontrado']:
-            return 0.0
-        
-        custo_total = custos['custo_fixo'] + (km_float * custos['custo_variavel'])
+        custo_total = custo_fixo + (km_float * custo_variavel)
         return round(custo_total, 2)
\ No newline at end of file
@@ -1,26 +1,117 @@
-import sqlite3
 import os
+import re
 import bcrypt
 
+from .pool_conexoes import obter_conexao
+
 # Caminho para o banco na raiz do projeto (um nível acima)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.path.join(BASE_DIR, "financeiro.db")
 
 def get_connection():
-    """Cria conexão com o banco SQLite"""
-    # Aumenta timeout para reduzir chances de 'database is locked' em operações concorrentes
-    conn = sqlite3.connect(DB_PATH, timeout=30)
-    # Configura row_factory para permitir acesso por nome de coluna
-    conn.row_factory = sqlite3.Row
-    try:
-        # Ativa WAL (write-ahead logging) para melhorar concorrência entre leitura/escrita
-        conn.execute('PRAGMA journal_mode=WAL;')
-        # Seta busy timeout em ms (para SQLite aguardar locks por até 30s)
-        conn.execute('PRAGMA busy_timeout = 30000;')
-    except Exception:
-        # Se a execução das PRAGMAs falhar (por exemplo, em bancos remotos), seguimos com a conexão
-        pass
-    return conn
+    """
+    Conexão com o banco SQLite, reaproveitada do pool da thread (WAL, busy_timeout de 30s e
+    row_factory sqlite3.Row já configurados). conn.close() a devolve ao pool.
+    """
+    return obter_conexao(DB_PATH, timeout=30)
+
+# =========================
+# Chaves de data ordenáveis
+# =========================
+# As datas chegam do ERP como texto 'dd/mm/yyyy' (competência como 'mm/yyyy').
+# Para permitir range scans por índice, cada coluna de data ganha uma chave
+# inteira: yyyymmdd para datas e yyyymm para competência.
+CHAVES_DATA = {
+    'vencimento': 'venc_key',
+    'emissao': 'emissao_key',
+    'data_baixa': 'baixa_key',
+    'competencia': 'competencia_key',
+}
+
+TABELAS_COM_CHAVES_DATA = ('contas_receber', 'contas_pagar')
+
+INDICES_CHAVES_DATA = [
+    "CREATE INDEX IF NOT EXISTS idx_contas_receber_venc ON contas_receber (venc_key, status, cliente)",
+    "CREATE INDEX IF NOT EXISTS idx_contas_receber_competencia ON contas_receber (competencia_key)",
+    "CREATE INDEX IF NOT EXISTS idx_contas_pagar_venc ON contas_pagar (venc_key, status, fornecedor)",
+    "CREATE INDEX IF NOT EXISTS idx_contas_pagar_competencia ON contas_pagar (competencia_key)",
+]
+
+# A recarga em tabela sombra (tabela_sombra.py) alterna o nome dos índices entre
+# "nome" e "nome__alt", já que o SQLite não renomeia índices junto com a tabela
+SUFIXO_INDICE_ALTERNADO = '__alt'
+
+
+def nome_indice_alternado(nome):
+    """Retorna o outro nome do par nome / nome__alt."""
+    if nome.endswith(SUFIXO_INDICE_ALTERNADO):
+        return nome[:-len(SUFIXO_INDICE_ALTERNADO)]
+    return nome + SUFIXO_INDICE_ALTERNADO
+
+
+def indice_existe(cur, nome):
+    """True se o índice existe com o nome dado ou com o nome alternado."""
+    cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name IN (?, ?)",
+        (nome, nome_indice_alternado(nome))
+    )
+    return cur.fetchone() is not None
+
+
+def criar_indice(cur, ddl):
+    """Executa um "CREATE INDEX IF NOT EXISTS nome ..." a menos que o índice exista com o nome alternado."""
+    nome = re.search(r'INDEX\s+IF\s+NOT\s+EXISTS\s+(\w+)', ddl, re.IGNORECASE).group(1)
+    if not indice_existe(cur, nome):
+        cur.execute(ddl)
+
+
+def sql_chave_data(coluna):
+    """Expressão SQL que converte 'dd/mm/yyyy' (ou 'mm/yyyy' para competência) na chave inteira."""
+    if coluna == 'competencia':
+        return (f"CASE WHEN {coluna} GLOB '[0-9][0-9]/[0-9][0-9][0-9][0-9]*' "
+                f"THEN CAST(SUBSTR({coluna}, 4, 4) || SUBSTR({coluna}, 1, 2) AS INTEGER) END")
+    return (f"CASE WHEN {coluna} GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]*' "
+            f"THEN CAST(SUBSTR({coluna}, 7, 4) || SUBSTR({coluna}, 4, 2) || SUBSTR({coluna}, 1, 2) AS INTEGER) END")
+
+
+def data_key(data):
+    """Converte date/datetime na chave inteira yyyymmdd."""
+    return data.year * 10000 + data.month * 100 + data.day
+
+
+def intervalo_mes_key(mes, ano):
+    """Retorna (inicio, fim) em chaves yyyymmdd cobrindo todo o mês."""
+    base = int(ano) * 10000 + int(mes) * 100
+    return base + 1, base + 31
+
+
+def garantir_chaves_data(conn):
+    """
+    Garante as colunas de chave de data e os índices de range em contas_receber/contas_pagar.
+    Adiciona colunas ausentes (bancos antigos), preenche chaves nulas a partir do texto e cria os índices.
+    """
+    cur = conn.cursor()
+    for tabela in TABELAS_COM_CHAVES_DATA:
+        cur.execute(f"PRAGMA table_info({tabela})")
+        colunas = {row[1] for row in cur.fetchall()}
+        if not colunas:
+            continue
+
+        for coluna, chave in CHAVES_DATA.items():
+            if coluna not in colunas:
+                continue
+            if chave not in colunas:
+                cur.execute(f"ALTER TABLE {tabela} ADD COLUMN {chave} INTEGER")
+            cur.execute(f"UPDATE {tabela} SET {chave} = {sql_chave_data(coluna)} WHERE {chave} IS NULL AND {coluna} IS NOT NULL")
+
+    for ddl in INDICES_CHAVES_DATA:
+        try:
+            criar_indice(cur, ddl)
+        except Exception:
+            # Tabela ou coluna inexistente neste banco; segue sem o índice
+            pass
+    conn.commit()
+
 
 def init_db():
     """Inicializa o banco de dados criando tabelas a partir do schema.sql"""
@@ -36,6 +127,23 @@ def init_db():
 
     cursor.executescript(script_sql)
     conn.commit()
+    garantir_chaves_data(conn)
+
+    # Valores monetários em centavos inteiros (bancos anteriores às colunas)
+    from .db_managers.migrate import migrar_valores_centavos
+    migrar_valores_centavos(conn)
+
+    # Chave única da projeção, calendário de semanas e resumos materializados dos dashboards
+    from .gravacao_projecao import garantir_chave_projecao
+    from .calendario import garantir_calendario_semanas
+    from .agregados import atualizar_todos_resumos
+    garantir_chave_projecao(conn)
+    garantir_calendario_semanas(conn)
+    atualizar_todos_resumos(conn)
+
+    # Índices das consultas quentes (migrações versionadas em schema_version)
+    from .migracoes import aplicar_migracoes
+    aplicar_migracoes(conn)
     conn.close()
     print("Banco de dados inicializado com sucesso!")
 
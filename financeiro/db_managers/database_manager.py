@@ -15,12 +15,35 @@ Estrutura:
 
 import sqlite3
 import os
+import sys
 import threading
+import time
 from contextlib import contextmanager
 from typing import Optional, Dict, Any
 
+try:
+    from ..pool_conexoes import obter_conexao
+except ImportError:
+    # Carregado como db_managers.database_manager (python migrate.py): o pool vem do pacote financeiro
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from financeiro.pool_conexoes import obter_conexao
+
 class DatabaseManager:
-    """Gerenciador central de bancos de dados modulares"""
+    """
+    Gerenciador central de bancos de dados modulares
+    
+    Concorrência (os bancos rodam em WAL):
+    - leitura(module): conexão somente leitura, sem lock; leitores rodam em paralelo
+      entre si e com o escritor, cada bloco enxergando um único snapshot
+    - escrita(module): um escritor por banco neste processo (lock do módulo) e
+      BEGIN IMMEDIATE, com novas tentativas se outro processo segurar a escrita
+    - get_connection(module): compatibilidade; serializado pelo lock do módulo
+    - roteador(): uma conexão com todos os bancos anexados (ATTACH) para consultas
+      que cruzam módulos num único SELECT; cada banco mantém seu WAL e seu lock de escrita
+    """
+    
+    # Tentativas de BEGIN IMMEDIATE quando o lock de escrita continua ocupado após o busy_timeout
+    TENTATIVAS_ESCRITA = 3
     
     # Mapeamento de módulos para bancos
     DB_MAPPING = {
@@ -46,6 +69,116 @@ class DatabaseManager:
         
         return os.path.join(self.base_dir, self.DB_MAPPING[module])
     
+    @staticmethod
+    def _pragmas(timeout: int):
+        return (
+            'PRAGMA journal_mode=WAL;',
+            f'PRAGMA busy_timeout = {timeout * 1000};',
+            'PRAGMA synchronous = NORMAL;',
+            'PRAGMA cache_size = 10000;',
+            'PRAGMA temp_store = memory;',
+        )
+    
+    def _pragmas_roteador(self, timeout: int):
+        anexos = tuple(
+            "ATTACH DATABASE '{}' AS {};".format(os.path.abspath(self.get_db_path(module)).replace("'", "''"), module)
+            for module in self.DB_MAPPING
+        )
+        return self._pragmas(timeout) + anexos + ('PRAGMA query_only = ON;',)
+    
+    @contextmanager
+    def roteador(self, timeout: int = 30):
+        """
+        Conexão somente leitura com financeiro.db (o banco legado, ainda usado por main.py e
+        importacao.py) como main e os bancos modulares anexados com o nome do módulo:
+        core, logistica, manifesto, suporte e margem. Consultas entre domínios viram um único
+        SELECT com junções, em vez de uma consulta por banco e junção em Python.
+        
+        Os ATTACH são feitos uma vez por conexão do pool. Cada arquivo tem seu próprio WAL e
+        lock: ler pelo roteador não bloqueia escritas em nenhum módulo, e escritas continuam
+        passando por escrita(module), que só trava o banco daquele módulo. Dentro do bloco,
+        cada banco é lido num snapshot próprio, fixado na primeira leitura dele.
+        
+        Usage:
+            with db_manager.roteador() as conn:
+                conn.execute('''
+                    SELECT v.placa, v.tipologia, c.custo_mensal
+                    FROM logistica.veiculos_operacionais v
+                    JOIN main.custo_frota c ON UPPER(c.tipo_veiculo) = UPPER(v.tipologia)
+                ''').fetchall()
+        """
+        # Importado aqui: database.py carrega bcrypt, desnecessário para quem só usa os bancos modulares
+        try:
+            from ..database import DB_PATH
+        except ImportError:
+            from financeiro.database import DB_PATH
+        
+        conn = obter_conexao(DB_PATH, timeout=timeout, pragmas=self._pragmas_roteador(timeout))
+        try:
+            conn.execute('BEGIN')
+            yield conn
+        finally:
+            conn.close()
+    
+    @contextmanager
+    def leitura(self, module: str, timeout: int = 30):
+        """
+        Conexão somente leitura (PRAGMA query_only) sem lock de módulo.
+        As consultas do bloco rodam numa transação de leitura: todas veem o mesmo snapshot.
+        
+        Usage:
+            with db_manager.leitura('manifesto') as conn:
+                conn.execute("SELECT ...").fetchall()
+        """
+        db_path = self.get_db_path(module)
+        conn = obter_conexao(db_path, timeout=timeout,
+                             pragmas=self._pragmas(timeout) + ('PRAGMA query_only = ON;',))
+        try:
+            conn.execute('BEGIN')
+            yield conn
+        finally:
+            # close() devolve ao pool desfazendo a transação de leitura
+            conn.close()
+    
+    @contextmanager
+    def escrita(self, module: str, timeout: int = 30):
+        """
+        Conexão de escrita: fila de um escritor por banco (lock do módulo) e transação
+        BEGIN IMMEDIATE, que reserva a escrita logo no início em vez de falhar no meio
+        com 'database is locked'. Commit ao fim do bloco; rollback se houver exceção.
+        
+        Usage:
+            with db_manager.escrita('manifesto') as conn:
+                conn.execute("UPDATE ...")
+        """
+        db_path = self.get_db_path(module)
+        
+        with self.locks[module]:
+            conn = obter_conexao(db_path, timeout=timeout, pragmas=self._pragmas(timeout))
+            try:
+                self._iniciar_escrita(conn)
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+    
+    def _iniciar_escrita(self, conn):
+        """BEGIN IMMEDIATE; o busy_timeout já espera pelo lock, aqui só há novas tentativas com espera crescente."""
+        for tentativa in range(self.TENTATIVAS_ESCRITA):
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) and 'busy' not in str(e):
+                    raise
+                if tentativa == self.TENTATIVAS_ESCRITA - 1:
+                    raise
+                print(f"⚠️ Banco ocupado por outro escritor, nova tentativa ({tentativa + 1}/{self.TENTATIVAS_ESCRITA})")
+                time.sleep(0.2 * 2 ** tentativa)
+    
     @contextmanager
     def get_connection(self, module: str, timeout: int = 30):
         """
@@ -65,16 +198,9 @@ class DatabaseManager:
         with self.locks[module]:
             conn = None
             try:
-                # Criar conexão com configurações otimizadas
-                conn = sqlite3.connect(db_path, timeout=timeout)
-                conn.row_factory = sqlite3.Row
-                
-                # Configurações para melhor performance e concorrência
-                conn.execute('PRAGMA journal_mode=WAL;')
-                conn.execute(f'PRAGMA busy_timeout = {timeout * 1000};')
-                conn.execute('PRAGMA synchronous = NORMAL;')
-                conn.execute('PRAGMA cache_size = 10000;')
-                conn.execute('PRAGMA temp_store = memory;')
+                # Conexão do pool da thread, configurada uma única vez para
+                # melhor performance e concorrência; close() a devolve ao pool
+                conn = obter_conexao(db_path, timeout=timeout, pragmas=self._pragmas(timeout))
                 
                 yield conn
                 
@@ -96,7 +222,12 @@ class DatabaseManager:
             params: Parâmetros da query
             fetch: 'all', 'one', 'none' (para INSERT/UPDATE/DELETE)
         """
-        with self.get_connection(module) as conn:
+        if fetch not in ('all', 'one', 'none'):
+            raise ValueError("fetch deve ser 'all', 'one' ou 'none'")
+        
+        # Consultas usam conexões de leitura em paralelo; alterações passam pela fila de escrita
+        contexto = self.escrita(module) if fetch == 'none' else self.leitura(module)
+        with contexto as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
             
@@ -104,11 +235,7 @@ class DatabaseManager:
                 return cursor.fetchall()
             elif fetch == 'one':
                 return cursor.fetchone()
-            elif fetch == 'none':
-                conn.commit()
-                return cursor.rowcount
-            else:
-                raise ValueError("fetch deve ser 'all', 'one' ou 'none'")
+            return cursor.rowcount
     
     def init_database(self, module: str, schema_sql: str):
         """Inicializa um banco de dados com o schema fornecido"""
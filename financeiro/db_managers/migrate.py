@@ -22,7 +22,54 @@ from datetime import datetime
 # Adicionar o diretório pai ao path para importar módulos
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from db_managers.database_manager import db_manager
+try:
+    from .database_manager import db_manager
+except ImportError:
+    # Executado como script (python migrate.py)
+    from db_managers.database_manager import db_manager
+
+
+# =========================
+# Valores monetários em centavos
+# =========================
+# (tabela, coluna em reais, coluna INTEGER em centavos)
+COLUNAS_CENTAVOS = [
+    ('contas_receber', 'valor_principal', 'valor_principal_centavos'),
+    ('contas_pagar', 'valor_principal', 'valor_principal_centavos'),
+    ('projecao', 'valor', 'valor_centavos'),
+]
+
+
+def migrar_valores_centavos(conn, tabelas=None):
+    """
+    Adiciona as colunas INTEGER de centavos e preenche as linhas que ainda não as têm
+    (CAST(ROUND(valor * 100) AS INTEGER)). É idempotente: só toca linhas com centavos nulos,
+    então pode rodar na inicialização e antes de cada reconstrução de resumo.
+    Dentro de uma transação do chamador não faz commit (o chamador confirma tudo junto).
+    Retorna o número de linhas preenchidas.
+    """
+    em_transacao = conn.in_transaction
+    cur = conn.cursor()
+    preenchidas = 0
+    for tabela, coluna, coluna_centavos in COLUNAS_CENTAVOS:
+        if tabelas is not None and tabela not in tabelas:
+            continue
+        cur.execute(f"PRAGMA table_info({tabela})")
+        colunas = {row[1] for row in cur.fetchall()}
+        if coluna not in colunas:
+            continue
+        if coluna_centavos not in colunas:
+            cur.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna_centavos} INTEGER")
+        cur.execute(f"""
+            UPDATE {tabela}
+            SET {coluna_centavos} = CAST(ROUND(CAST({coluna} AS REAL) * 100) AS INTEGER)
+            WHERE {coluna_centavos} IS NULL AND {coluna} IS NOT NULL
+        """)
+        preenchidas += max(cur.rowcount, 0)
+    if not em_transacao:
+        conn.commit()
+    return preenchidas
+
 
 class DatabaseMigrator:
     """Classe responsável por migrar dados do banco monolítico para a arquitetura modular"""
@@ -150,6 +197,58 @@ class DatabaseMigrator:
         
         return True
     
+    def migrate_cents(self, db_path=None):
+        """Converte os valores monetários do banco para colunas de centavos inteiros"""
+        db_path = db_path or self.source_db
+        print(f"🔄 Migrando valores monetários de {db_path} para centavos...")
+        
+        if not os.path.exists(db_path):
+            print(f"❌ Banco de dados {db_path} não encontrado!")
+            return False
+        
+        try:
+            conn = sqlite3.connect(db_path, timeout=30)
+            try:
+                preenchidas = migrar_valores_centavos(conn)
+            finally:
+                conn.close()
+            print(f"✅ {preenchidas:,} linha(s) convertida(s) para centavos")
+            return True
+        except Exception as e:
+            print(f"❌ Erro ao migrar valores para centavos: {e}")
+            return False
+    
+    def migrate_indexes(self, db_path=None):
+        """Aplica as migrações versionadas de índices e verifica os planos das consultas quentes"""
+        try:
+            from ..migracoes import aplicar_migracoes, versao_atual, verificar_planos
+        except ImportError:
+            from financeiro.migracoes import aplicar_migracoes, versao_atual, verificar_planos
+        
+        db_path = db_path or self.source_db
+        print(f"🔄 Aplicando migrações versionadas em {db_path}...")
+        
+        if not os.path.exists(db_path):
+            print(f"❌ Banco de dados {db_path} não encontrado!")
+            return False
+        
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            aplicadas = aplicar_migracoes(conn)
+            print(f"✅ {len(aplicadas)} migração(ões) aplicada(s); versão atual: {versao_atual(conn)}")
+            
+            print("\n🔍 Verificando planos das consultas quentes:")
+            ok = True
+            for descricao, usa_indice, plano in verificar_planos(conn):
+                print(f"  {'✅' if usa_indice else '❌'} {descricao}: {' | '.join(plano)}")
+                ok = ok and usa_indice
+            return ok
+        except Exception as e:
+            print(f"❌ Erro nas migrações versionadas: {e}")
+            return False
+        finally:
+            conn.close()
+    
     def create_migration_info(self):
         """Cria arquivo com informações da migração"""
         migration_info = {
@@ -210,6 +309,16 @@ def main():
     migrator = DatabaseMigrator()
     
     try:
+        if '--centavos' in sys.argv:
+            # python migrate.py --centavos [caminho/do/banco.db]
+            argumentos = [a for a in sys.argv[1:] if a != '--centavos']
+            sys.exit(0 if migrator.migrate_cents(argumentos[0] if argumentos else None) else 1)
+        
+        if '--indices' in sys.argv:
+            # python migrate.py --indices [caminho/do/banco.db]
+            argumentos = [a for a in sys.argv[1:] if a != '--indices']
+            sys.exit(0 if migrator.migrate_indexes(argumentos[0] if argumentos else None) else 1)
+        
         success = migrator.run_migration()
         if success:
             print("\n🚀 Sistema pronto para usar a nova arquitetura modular!")
@@ -39,7 +39,9 @@ CREATE TABLE IF NOT EXISTS historico_importacoes (
     status_importacao TEXT, -- sucesso, erro, parcial
     log_erros TEXT, -- JSON com detalhes dos erros
     tempo_processamento REAL, -- em segundos
-    hash_arquivo TEXT -- para evitar reimportações
+    hash_arquivo TEXT, -- para evitar reimportações
+    fase TEXT, -- etapa atual do job: na_fila, gravando, resumo, concluido...
+    resultado TEXT -- JSON com a mensagem e o delta da importação
 );
 
 -- Tabela de processamento Pamplona
@@ -0,0 +1,134 @@
+"""
+Deduplicação de uploads pelo conteúdo.
+
+Usuários reenviam com frequência a mesma exportação do ERP ou a mesma
+planilha de manifesto, e cada envio refazia todo o processamento. O
+SHA-256 do arquivo é calculado enquanto ele é gravado (um único passe) e
+guardado em historico_importacoes.hash_arquivo. Se a última importação bem
+sucedida do mesmo alvo (razão ou arquivo de destino) tem o mesmo hash, o
+processamento é pulado e o resumo daquela importação é devolvido.
+
+O alvo identifica o que o arquivo alimenta: 'contas_receber', 'contas_pagar'
+ou '<tipo>:<nome do arquivo de destino>'. Em tipo_importacao ele pode vir
+seguido de ':<detalhe>' (ex: 'contas_receber:incremental').
+
+O hash sozinho não basta: o histórico fica em manifesto.db e sobrevive a um
+financeiro.db recriado ou editado à mão. Para os razões, estado_destino
+guarda linhas e maior rowid da tabela ao fim da importação, e o upload só é
+pulado se o razão continua igual; para arquivos de destino, se o arquivo
+ainda existe. A recarga completa nunca é pulada.
+"""
+
+import hashlib
+import json
+import os
+
+from .database import get_connection
+from .db_managers.database_manager import db_manager
+
+TAMANHO_PEDACO = 1 << 20
+
+
+def salvar_com_hash(file_storage, destino):
+    """Grava o upload em destino calculando o SHA-256 no mesmo passe. Retorna (hash, tamanho)."""
+    sha = hashlib.sha256()
+    tamanho = 0
+    stream = file_storage.stream
+    try:
+        stream.seek(0)
+    except Exception:
+        pass
+    with open(destino, 'wb') as f:
+        for pedaco in iter(lambda: stream.read(TAMANHO_PEDACO), b''):
+            sha.update(pedaco)
+            f.write(pedaco)
+            tamanho += len(pedaco)
+    return sha.hexdigest(), tamanho
+
+
+def estado_razao(tabela):
+    """Estado de contas_receber/contas_pagar em financeiro.db ('linhas:maior rowid'), ou None se ilegível."""
+    conn = get_connection()
+    try:
+        linhas, maior = conn.execute(f"SELECT COUNT(*), MAX(rowid) FROM {tabela}").fetchone()
+        return f"{linhas}:{maior or 0}"
+    except Exception:
+        return None
+    finally:
+        conn.close()
+
+
+def importacao_anterior(alvo, hash_arquivo, estado=None):
+    """
+    Retorna a última importação bem sucedida do alvo (dict, com resultado já decodificado)
+    se ela foi feita com o mesmo arquivo e, com estado informado, deixou o destino nesse
+    mesmo estado (ver estado_razao); senão None.
+    """
+    with db_manager.leitura('manifesto') as conn:
+        row = conn.execute("""
+            SELECT * FROM historico_importacoes
+            WHERE (tipo_importacao = ? OR substr(tipo_importacao, 1, length(?) + 1) = ? || ':')
+              AND status_importacao = 'sucesso'
+            ORDER BY id DESC LIMIT 1
+        """, (alvo, alvo, alvo)).fetchone()
+    if not row or row['hash_arquivo'] != hash_arquivo:
+        return None
+    if estado is not None and row['estado_destino'] != estado:
+        # Destino mudou desde aquela importação (banco recriado, editado, recarregado)
+        return None
+
+    anterior = dict(row)
+    try:
+        anterior['resultado'] = json.loads(anterior['resultado']) if anterior.get('resultado') else {}
+    except ValueError:
+        anterior['resultado'] = {'mensagem': anterior['resultado']}
+    return anterior
+
+
+def receber_upload(file_storage, destino, alvo):
+    """
+    Grava o upload ao lado de destino e, se o conteúdo é o mesmo da última importação do alvo,
+    descarta a cópia (destino pode ter sido alterado pelo processamento, ex: manifesto integrado).
+    Caso contrário, move a cópia para destino.
+    Retorna (hash, tamanho, anterior); anterior é None quando o arquivo precisa ser processado.
+    """
+    parcial = f"{destino}.parcial"
+    hash_arquivo, tamanho = salvar_com_hash(file_storage, parcial)
+    anterior = None
+    # Destino apagado desde a última importação: processa de novo mesmo com o mesmo hash
+    if os.path.exists(destino):
+        try:
+            anterior = importacao_anterior(alvo, hash_arquivo)
+        except Exception as e:
+            print(f"⚠️ Não foi possível consultar o histórico de importações: {str(e)}")
+
+    if anterior:
+        os.remove(parcial)
+        print(f"♻️ Upload idêntico à importação #{anterior['id']} de {alvo}: processamento pulado")
+    else:
+        os.replace(parcial, destino)
+    return hash_arquivo, tamanho, anterior
+
+
+def registrar_importacao(nome_arquivo, tamanho, tipo, hash_arquivo, sucesso, mensagem,
+                         registros=None, tempo=None, usuario=None):
+    """Registra em historico_importacoes um processamento síncrono (upload de manifesto/valencio/pamplona)."""
+    try:
+        with db_manager.escrita('manifesto') as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO historico_importacoes
+                    (nome_arquivo, tamanho_arquivo, tipo_importacao, registros_importados, registros_erro,
+                     usuario_importacao, status_importacao, fase, log_erros, tempo_processamento,
+                     hash_arquivo, resultado)
+                VALUES (?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                nome_arquivo, tamanho, tipo, registros, usuario,
+                'sucesso' if sucesso else 'erro', 'concluido' if sucesso else 'erro',
+                None if sucesso else json.dumps({'erro': mensagem}, ensure_ascii=False),
+                tempo, hash_arquivo, json.dumps({'mensagem': mensagem}, ensure_ascii=False)
+            ))
+            return cur.lastrowid
+    except Exception as e:
+        print(f"⚠️ Não foi possível registrar a importação no histórico: {str(e)}")
+        return None
@@ -0,0 +1,129 @@
+"""
+Detecção do dialeto (encoding e separador) dos CSVs exportados pelo ERP.
+
+A importação testava até 4 encodings × 3 separadores, lendo o arquivo com
+o parser em Python a cada tentativa. Aqui só os primeiros KB são
+inspecionados: BOM, validade do UTF-8 e frequência de cada separador
+candidato por linha. O arquivo é então lido uma única vez, com o parser C
+do pandas, e o dialeto detectado fica registrado junto do upload.
+"""
+
+import codecs
+import csv
+import json
+import os
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+# Bytes inspecionados no início do arquivo
+TAMANHO_AMOSTRA = 64 * 1024
+
+# Em ordem de preferência quando houver empate
+SEPARADORES = [';', ',', '\t']
+
+# Abaixo disso o arquivo não parece uma exportação do ERP
+MIN_COLUNAS = 4
+
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+@dataclass
+class DialetoCSV:
+    """Resultado da detecção: como o pandas deve ler o arquivo."""
+    encoding: str
+    separador: str
+    bom: bool = False
+    colunas: int = 0
+
+    def como_dict(self):
+        return asdict(self)
+
+
+def _utf8_valido(filepath, amostra):
+    """
+    Valida o UTF-8 primeiro na amostra (falha rápida) e, se ela passar, no arquivo todo
+    em pedaços de 1 MB: um acento em latin-1 no fim do arquivo quebraria a leitura única.
+    """
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    try:
+        decodificador.decode(amostra)
+    except UnicodeDecodeError:
+        return False
+
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(filepath, 'rb') as f:
+            for pedaco in iter(lambda: f.read(1 << 20), b''):
+                decodificador.decode(pedaco)
+        decodificador.decode(b'', final=True)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _detectar_encoding(filepath, amostra):
+    """Retorna (encoding, bom). Sem BOM e sem UTF-8 válido, cai para latin-1 (decodifica qualquer byte)."""
+    for bom, encoding in BOMS:
+        if amostra.startswith(bom):
+            return encoding, True
+    if _utf8_valido(filepath, amostra):
+        return 'utf-8', False
+    return 'latin-1', False
+
+
+def _detectar_separador(linhas):
+    """
+    Escolhe o separador cuja contagem de campos por linha (respeitando aspas) é a mais
+    consistente com o cabeçalho; entre os consistentes, o que gera mais colunas.
+    """
+    melhor = None
+    for sep in SEPARADORES:
+        contagens = [len(campos) for campos in csv.reader(linhas, delimiter=sep, quotechar='"') if campos]
+        if not contagens or contagens[0] < MIN_COLUNAS:
+            continue
+        colunas = contagens[0]
+        consistencia = sum(1 for c in contagens if c == colunas) / len(contagens)
+        pontuacao = (consistencia, colunas)
+        if melhor is None or pontuacao > melhor[0]:
+            melhor = (pontuacao, sep, colunas)
+    return (melhor[1], melhor[2]) if melhor else (None, 0)
+
+
+def detectar_dialeto(filepath, tamanho_amostra=TAMANHO_AMOSTRA):
+    """Detecta encoding e separador do CSV inspecionando apenas o início do arquivo."""
+    with open(filepath, 'rb') as f:
+        amostra = f.read(tamanho_amostra)
+        truncada = len(amostra) == tamanho_amostra
+
+    encoding, bom = _detectar_encoding(filepath, amostra)
+    texto = amostra.decode(encoding, errors='ignore')
+    linhas = texto.splitlines()
+    if truncada and len(linhas) > 1:
+        # A última linha da amostra pode ter sido cortada no meio
+        linhas = linhas[:-1]
+
+    separador, colunas = _detectar_separador(linhas[:200])
+    if separador is None:
+        raise ValueError("Não foi possível ler o arquivo CSV com nenhuma combinação de encoding/separador")
+
+    dialeto = DialetoCSV(encoding=encoding, separador=separador, bom=bom, colunas=colunas)
+    print(f"✅ Dialeto detectado: encoding={encoding}, sep='{separador}', colunas={colunas}, bom={bom}")
+    return dialeto
+
+
+def registrar_dialeto(uploads_dir, nome_arquivo, dialeto, **extras):
+    """Grava o dialeto detectado em <nome_arquivo>.dialeto.json na pasta de uploads."""
+    registro = dialeto.como_dict()
+    registro.update(extras)
+    registro['detectado_em'] = datetime.now().isoformat(timespec='seconds')
+    caminho = os.path.join(uploads_dir, f"{nome_arquivo}.dialeto.json")
+    try:
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(registro, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"⚠️ Não foi possível registrar o dialeto do upload: {str(e)}")
+    return caminho
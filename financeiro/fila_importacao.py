@@ -0,0 +1,241 @@
+"""
+Fila de importação em segundo plano.
+
+O POST de /importacao lia, convertia e gravava o arquivo dentro da thread
+da requisição: arquivos grandes prendiam o worker por minutos e estouravam
+o timeout do proxy. Aqui a requisição só grava o upload e devolve o id de
+um job; um pool limitado executa a importação. Com um único trabalhador,
+uploads simultâneos entram na fila em vez de disputar o lock de escrita
+do SQLite.
+
+Status, fase, linhas e duração de cada job ficam em historico_importacoes
+(manifesto.db) e são expostos em /api/importacao/jobs/<id>.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .db_managers.database_manager import db_manager
+from .deduplicacao_upload import estado_razao, importacao_anterior
+from .importacao import MODOS_IMPORTACAO, processar_upload, salvar_upload_temporario
+
+# Os dois razões ficam no mesmo banco: mais de um trabalhador só disputaria o lock de escrita
+MAX_TRABALHADORES = 1
+
+# Jobs aguardando ou em execução; acima disso o upload é recusado
+MAX_PENDENTES = 20
+
+# Intervalo mínimo entre gravações de progresso de um mesmo job
+INTERVALO_PROGRESSO = 1.0
+
+STATUS_FINAIS = ('sucesso', 'erro')
+
+_executor = ThreadPoolExecutor(max_workers=MAX_TRABALHADORES, thread_name_prefix='importacao')
+_pendentes = 0
+_lock_pendentes = threading.Lock()
+
+
+class FilaCheiaError(Exception):
+    """A fila atingiu MAX_PENDENTES jobs."""
+
+
+def garantir_tabela_jobs():
+    """
+    Garante historico_importacoes com as colunas fase/resultado e marca como erro
+    os jobs que ficaram na fila ou em execução quando o servidor parou.
+    """
+    with db_manager.escrita('manifesto') as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS historico_importacoes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome_arquivo TEXT NOT NULL,
+                tamanho_arquivo INTEGER,
+                tipo_importacao TEXT,
+                registros_importados INTEGER,
+                registros_erro INTEGER,
+                data_importacao DATETIME DEFAULT CURRENT_TIMESTAMP,
+                usuario_importacao TEXT,
+                status_importacao TEXT,
+                log_erros TEXT,
+                tempo_processamento REAL,
+                hash_arquivo TEXT
+            )
+        """)
+        cur.execute("PRAGMA table_info(historico_importacoes)")
+        existentes = {row[1] for row in cur.fetchall()}
+        for coluna in ('fase', 'resultado', 'estado_destino'):
+            if coluna not in existentes:
+                cur.execute(f"ALTER TABLE historico_importacoes ADD COLUMN {coluna} TEXT")
+        cur.execute("""
+            UPDATE historico_importacoes
+            SET status_importacao = 'erro', fase = 'interrompido',
+                log_erros = '{"erro": "Servidor reiniciado durante a importação"}'
+            WHERE status_importacao IN ('na_fila', 'processando')
+        """)
+        if cur.rowcount:
+            print(f"⚠️ {cur.rowcount} job(s) de importação interrompido(s) marcados como erro")
+
+
+def criar_job(upload, modo, usuario=None, anterior=None):
+    """
+    Registra o job na fila. Com anterior (importação idêntica já feita), o job já nasce
+    concluído, como 'duplicado', repetindo o resultado daquela importação.
+    """
+    if anterior:
+        status, fase = 'sucesso', 'duplicado'
+        registros = anterior['registros_importados']
+        resultado = dict(anterior['resultado'], duplicado_de=anterior['id'])
+        resultado = json.dumps(resultado, ensure_ascii=False)
+        estado = anterior['estado_destino']
+    else:
+        status, fase, registros, resultado, estado = 'na_fila', 'na_fila', 0, None, None
+
+    with db_manager.escrita('manifesto') as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO historico_importacoes
+                (nome_arquivo, tamanho_arquivo, tipo_importacao, usuario_importacao, hash_arquivo,
+                 status_importacao, fase, registros_importados, registros_erro, resultado,
+                 tempo_processamento, estado_destino)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?, ?)
+        """, (upload['arquivo'], upload['tamanho'], f"{upload['tabela']}:{modo}", usuario, upload.get('hash'),
+              status, fase, registros, resultado, 0 if anterior else None, estado))
+        return cur.lastrowid
+
+
+def atualizar_job(job_id, **campos):
+    """Atualiza as colunas informadas do job (status_importacao, fase, registros_importados...)."""
+    if not campos:
+        return
+    atribuicoes = ', '.join(f"{coluna} = ?" for coluna in campos)
+    with db_manager.escrita('manifesto') as conn:
+        conn.execute(
+            f"UPDATE historico_importacoes SET {atribuicoes} WHERE id = ?",
+            (*campos.values(), job_id)
+        )
+
+
+def _job_para_dict(row):
+    job = dict(row)
+    for coluna in ('resultado', 'log_erros'):
+        if job.get(coluna):
+            try:
+                job[coluna] = json.loads(job[coluna])
+            except ValueError:
+                pass
+    job['finalizado'] = job.get('status_importacao') in STATUS_FINAIS
+    return job
+
+
+def obter_job(job_id):
+    with db_manager.leitura('manifesto') as conn:
+        row = conn.execute("SELECT * FROM historico_importacoes WHERE id = ?", (job_id,)).fetchone()
+    return _job_para_dict(row) if row else None
+
+
+def listar_jobs(limite=10):
+    """Jobs de importação de contas mais recentes primeiro."""
+    with db_manager.leitura('manifesto') as conn:
+        rows = conn.execute("""
+            SELECT * FROM historico_importacoes
+            WHERE tipo_importacao LIKE 'contas_%'
+            ORDER BY id DESC LIMIT ?
+        """, (limite,)).fetchall()
+    return [_job_para_dict(row) for row in rows]
+
+
+def enfileirar_importacao(file_storage, modo='incremental', usuario=None):
+    """
+    Grava o upload, registra o job e o coloca na fila. Retorna (id do job, importação anterior):
+    se o arquivo é idêntico à última importação do mesmo razão e o razão não mudou desde ela,
+    nada é enfileirado e a importação anterior (dict) é devolvida junto com o id do job
+    registrado como duplicado. modo='completo' (recarga pedida pelo usuário) sempre importa.
+    Nome não reconhecido/falha ao gravar levanta ValueError; fila cheia, FilaCheiaError.
+    """
+    global _pendentes
+    if modo not in MODOS_IMPORTACAO:
+        modo = 'incremental'
+
+    with _lock_pendentes:
+        if _pendentes >= MAX_PENDENTES:
+            raise FilaCheiaError(f"⚠️ Fila de importação cheia ({MAX_PENDENTES} jobs). Tente novamente em instantes.")
+        _pendentes += 1
+
+    try:
+        upload = salvar_upload_temporario(file_storage)
+        anterior = None
+        if modo != 'completo':
+            try:
+                anterior = importacao_anterior(upload['tabela'], upload['hash'], estado_razao(upload['tabela']))
+            except Exception as e:
+                print(f"⚠️ Não foi possível consultar o histórico de importações: {str(e)}")
+        job_id = criar_job(upload, modo, usuario, anterior)
+        if anterior:
+            os.remove(upload['temp_path'])
+            with _lock_pendentes:
+                _pendentes -= 1
+            print(f"♻️ {upload['arquivo']} idêntico à importação #{anterior['id']}: processamento pulado")
+            return job_id, anterior
+        _executor.submit(_executar, job_id, upload, modo)
+    except Exception:
+        with _lock_pendentes:
+            _pendentes -= 1
+        raise
+
+    print(f"🗂️ Job de importação #{job_id} na fila: {upload['arquivo']} ({modo})")
+    return job_id, None
+
+
+def _executar(job_id, upload, modo):
+    global _pendentes
+    inicio = time.time()
+    ultima_gravacao = [0.0]
+
+    def progresso(fase, linhas=None):
+        # Blocos chegam a cada poucos décimos de segundo: grava no máximo uma vez por intervalo
+        agora = time.time()
+        if fase == 'gravando' and agora - ultima_gravacao[0] < INTERVALO_PROGRESSO:
+            return
+        ultima_gravacao[0] = agora
+        campos = {'fase': fase, 'tempo_processamento': round(agora - inicio, 2)}
+        if linhas is not None:
+            campos['registros_importados'] = linhas
+        try:
+            atualizar_job(job_id, **campos)
+        except Exception as e:
+            print(f"⚠️ Não foi possível registrar o progresso do job #{job_id}: {str(e)}")
+
+    try:
+        atualizar_job(job_id, status_importacao='processando', fase='iniciando')
+        retorno = processar_upload(upload, modo, progresso)
+        campos = {
+            'status_importacao': 'sucesso' if retorno['sucesso'] else 'erro',
+            'fase': 'concluido' if retorno['sucesso'] else 'erro',
+            'registros_importados': retorno['linhas'],
+            'resultado': json.dumps({'mensagem': retorno['mensagem'], 'delta': retorno['resultado']},
+                                    ensure_ascii=False),
+        }
+        if retorno['sucesso']:
+            # Estado do razão que este arquivo produziu, para a deduplicação do próximo upload
+            campos['estado_destino'] = estado_razao(upload['tabela'])
+        else:
+            campos['log_erros'] = json.dumps({'erro': retorno['mensagem']}, ensure_ascii=False)
+    except Exception as e:
+        campos = {
+            'status_importacao': 'erro', 'fase': 'erro',
+            'log_erros': json.dumps({'erro': str(e)}, ensure_ascii=False),
+        }
+    finally:
+        with _lock_pendentes:
+            _pendentes -= 1
+
+    campos['tempo_processamento'] = round(time.time() - inicio, 2)
+    try:
+        atualizar_job(job_id, **campos)
+    except Exception as e:
+        print(f"❌ Não foi possível registrar o fim do job #{job_id}: {str(e)}")
+    print(f"🏁 Job de importação #{job_id}: {campos['status_importacao']} em {campos['tempo_processamento']}s")
@@ -0,0 +1,92 @@
+"""
+Gravação em lote da projeção diária por cliente.
+
+A tela de projeção regravava o mês inteiro (DELETE + 31 INSERTs por cliente)
+ou fazia DELETE + INSERT por célula. Aqui a chave (cliente, mes, ano, dia) é
+única e cada salvamento é um único executemany de upsert para as células
+alteradas; dias com valor zero são removidos, mantendo a tabela esparsa.
+O resumo mensal é recalculado na mesma transação.
+"""
+
+from .agregados import atualizar_resumo_projecao
+from .db_managers.migrate import migrar_valores_centavos
+
+# Clientes da tela de projeção (ordem das linhas; o formulário antigo gravava o índice 1..19)
+CLIENTES_PROJECAO = [
+    'ADORO', 'ADORO S.A.', 'ADORO SAO CARLOS', 'AGRA FOODS', 'ALIBEM', 'FRIBOI',
+    'GOLDPAO CD SAO JOSE DOS CAMPOS', 'GTFOODS BARUERI', 'JK DISTRIBUIDORA',
+    'LATICINIO CARMONA', 'MARFRIG - ITUPEVA CD', 'MARFRIG - PROMISSAO',
+    'MARFRIG GLOBAL FOODS S A', 'MINERVA S A', 'PAMPLONA JANDIRA',
+    'PEIXES MEGGS PESCADOS LTDA - SJBV', 'SANTA LUCIA', 'SAUDALI', 'VALENCIO JATAÍ'
+]
+
+INDICE_PROJECAO = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_projecao_chave ON projecao (cliente, mes, ano, dia)"
+)
+
+
+def garantir_chave_projecao(conn):
+    """
+    Cria o índice único (cliente, mes, ano, dia) da projeção.
+    Antes, converte os registros gravados pelo id do cliente (1..19) para o nome
+    e remove duplicatas, mantendo a gravação mais recente de cada célula.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_projecao_chave'")
+    if cur.fetchone():
+        return
+
+    cur.executemany(
+        "UPDATE projecao SET cliente = ? WHERE cliente = ?",
+        [(nome, str(i)) for i, nome in enumerate(CLIENTES_PROJECAO, start=1)]
+    )
+    cur.execute("""
+        DELETE FROM projecao
+        WHERE id NOT IN (SELECT MAX(id) FROM projecao GROUP BY cliente, mes, ano, dia)
+    """)
+    removidos = cur.rowcount
+    cur.execute(INDICE_PROJECAO)
+    conn.commit()
+    if removidos:
+        print(f"🧹 Projeção: {removidos} registro(s) duplicado(s) removido(s) antes do índice único")
+
+
+def gravar_projecao(conn, mes, ano, celulas):
+    """
+    Grava as células (cliente, dia, valor) de mes/ano numa única transação.
+    Valores não nulos fazem upsert; zero/None removem a célula.
+    Retorna (gravadas, removidas).
+    """
+    garantir_chave_projecao(conn)
+    migrar_valores_centavos(conn, ('projecao',))
+    mes, ano = int(mes), int(ano)
+
+    upserts = []
+    remocoes = []
+    for cliente, dia, valor in celulas:
+        if valor:
+            valor = float(valor)
+            upserts.append((cliente, mes, ano, int(dia), valor, int(round(valor * 100))))
+        else:
+            remocoes.append((cliente, mes, ano, int(dia)))
+
+    cur = conn.cursor()
+    try:
+        cur.executemany(
+            "DELETE FROM projecao WHERE cliente = ? AND mes = ? AND ano = ? AND dia = ?",
+            remocoes
+        )
+        cur.executemany("""
+            INSERT INTO projecao (cliente, mes, ano, dia, valor, valor_centavos)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (cliente, mes, ano, dia)
+            DO UPDATE SET valor = excluded.valor, valor_centavos = excluded.valor_centavos,
+                          criado_em = CURRENT_TIMESTAMP
+        """, upserts)
+        # Recalcula o resumo do mês e confirma tudo de uma vez
+        atualizar_resumo_projecao(conn, mes, ano)
+    except Exception:
+        conn.rollback()
+        raise
+
+    return len(upserts), len(remocoes)
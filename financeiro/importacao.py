@@ -1,9 +1,24 @@
 import os
 import pandas as pd
-import sqlite3
 import time
 import sys
 
+from .database import CHAVES_DATA, garantir_chaves_data
+from .pool_conexoes import obter_conexao
+from .agregados import atualizar_resumo_receber, atualizar_resumo_pagar
+from .cache_resultados import invalidar_cache
+from .snapshot_analitico import agendar_snapshot
+from .db_managers.migrate import migrar_valores_centavos
+from .dialeto_csv import detectar_dialeto, registrar_dialeto
+from .deduplicacao_upload import salvar_com_hash
+from .tabela_sombra import (
+    criar_tabela_sombra, descartar_tabela_sombra, indexar_tabela_sombra, trocar_tabela_sombra
+)
+from .importacao_incremental import (
+    aplicar_importacao_incremental, criar_area_importacao, garantir_colunas_incrementais, impressao_digital,
+    preencher_chave_natural
+)
+
 # Tenta forçar stdout para UTF-8 durante execução local para evitar
 # UnicodeEncodeError em consoles Windows (cp1252) ao imprimir emojis.
 try:
@@ -20,16 +35,11 @@ DB_PATH = os.path.join(BASE_DIR, "financeiro.db")
 # Conexão com o banco
 # =========================
 def get_connection():
-    # Aumenta timeout para reduzir chances de 'database is locked' em operações concorrentes
-    conn = sqlite3.connect(DB_PATH, timeout=30)
-    try:
-        # Ativa WAL (write-ahead logging) para melhorar concorrência entre leitura/escrita
-        conn.execute('PRAGMA journal_mode=WAL;')
-        # Seta busy timeout em ms (para SQLite aguardar locks por até 30s)
-        conn.execute('PRAGMA busy_timeout = 30000;')
-    except Exception:
-        pass
-    return conn
+    """
+    Conexão do pool da thread (WAL e busy_timeout de 30s já configurados, como em
+    database.get_connection). Linhas como tuplas, como a importação sempre usou.
+    """
+    return obter_conexao(DB_PATH, timeout=30, row_factory=None)
 
 
 def _cleanup_upload_variants(uploads_dir, standard_filename, keep_filename=None):
@@ -72,39 +82,107 @@ def _cleanup_upload_variants(uploads_dir, standard_filename, keep_filename=None)
 # =========================
 # Carregar CSV ou XLSX
 # =========================
+
+# Linhas por bloco na importação: a memória fica limitada ao bloco, não ao tamanho do arquivo
+TAMANHO_BLOCO = 50000
+
+# Encoding e separador vêm de detectar_dialeto; o arquivo é lido uma vez só, com o parser C
+OPCOES_CSV = {
+    'on_bad_lines': 'skip',
+    'skipinitialspace': True,
+    'quotechar': '"',
+    'engine': 'c',
+}
+
+# Mapeia os nomes das colunas do ERP para o padrão do banco
+MAPEAMENTO_COLUNAS = {
+    # Contas a Pagar
+    'CNPJ Filial': 'cnpj_filial',
+    'Filial': 'filial',
+    'CNPJ Fornecedor': 'cnpj_fornecedor',
+    'Fornecedor': 'fornecedor',
+    'Sequência': 'sequencia',
+    'Nº Documento': 'numero_documento',
+    'Cheque': 'cheque',
+    'Emissão': 'emissao',
+    'Vencimento': 'vencimento',
+    'Vencimento Original': 'vencimento_original',
+    'Competência': 'competencia',
+    'Valor Principal': 'valor_principal',
+    'Juros/Desc': 'juros_desc',
+    'Valor Título': 'valor_titulo',
+    'Data Baixa': 'data_baixa',
+    'Data Liquidação': 'data_liquidacao',
+    'Banco Pagto': 'banco_pagto',
+    'Conta Pagto': 'conta_pagto',
+    'Forma Pagto': 'forma_pagto',
+    'Observações': 'observacoes',
+    'Conta Contábil': 'conta_contabil',
+    'Centro de Custo': 'centro_custo',
+    'Status': 'status',
+    'Descrição Despesa': 'descricao_despesa',
+
+    # Contas a Receber
+    'CNPJ Cliente': 'cnpj_cliente',
+    'Cliente': 'cliente',
+    'Email para fatura': 'email_fatura'
+}
+
+
+def mapear_colunas(df):
+    """Renomeia apenas as colunas do DataFrame que existem em MAPEAMENTO_COLUNAS."""
+    colunas_existentes = {col: MAPEAMENTO_COLUNAS[col] for col in df.columns if col in MAPEAMENTO_COLUNAS}
+    return df.rename(columns=colunas_existentes)
+
+
+def _ler_xlsx_em_blocos(filepath, tamanho_bloco):
+    """Lê a primeira planilha do xlsx em modo read_only, gerando DataFrames de até tamanho_bloco linhas."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        linhas = wb.active.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        cabecalho = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(cabecalho)]
+        n = len(cabecalho)
+
+        bloco = []
+        for linha in linhas:
+            if all(v is None for v in linha):
+                continue
+            bloco.append(tuple(linha[:n]) + (None,) * (n - len(linha)))
+            if len(bloco) >= tamanho_bloco:
+                yield pd.DataFrame(bloco, columns=cabecalho)
+                bloco = []
+        if bloco:
+            yield pd.DataFrame(bloco, columns=cabecalho)
+    finally:
+        wb.close()
+
+
+def ler_blocos(filepath, tamanho_bloco=TAMANHO_BLOCO, dialeto=None):
+    """
+    Lê o CSV/XLSX em blocos de até tamanho_bloco linhas (colunas com os nomes originais).
+    No CSV tudo é lido como texto, para o tipo de cada coluna não variar de um bloco para outro.
+    """
+    if filepath.endswith(".csv"):
+        dialeto = dialeto or detectar_dialeto(filepath)
+        leitor = pd.read_csv(filepath, sep=dialeto.separador, encoding=dialeto.encoding, dtype=str,
+                             chunksize=tamanho_bloco, **OPCOES_CSV)
+        with leitor:
+            yield from leitor
+    elif filepath.endswith(".xlsx"):
+        yield from _ler_xlsx_em_blocos(filepath, tamanho_bloco)
+    else:
+        raise ValueError("Formato de arquivo não suportado. Use CSV ou XLSX.")
+
+
 def carregar_dataframe(filepath):
     if filepath.endswith(".csv"):
-        # Lista de encodings para testar
-        encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-        # Lista de separadores para testar
-        separators = [';', ',', '\t']
-        
-        df = None
-        for encoding in encodings:
-            for sep in separators:
-                try:
-                    print(f"🔄 Tentando encoding={encoding}, sep='{sep}'")
-                    df = pd.read_csv(
-                        filepath, 
-                        sep=sep, 
-                        encoding=encoding, 
-                        on_bad_lines='skip',
-                        skipinitialspace=True,
-                        quotechar='"',
-                        engine='python'  # Mais flexível para arquivos malformados
-                    )
-                    if len(df.columns) >= 4:  # Verificação básica de que o arquivo foi lido corretamente
-                        print(f"✅ Sucesso com encoding={encoding}, sep='{sep}', colunas={len(df.columns)}")
-                        break
-                except Exception as e:
-                    print(f"❌ Falhou encoding={encoding}, sep='{sep}': {str(e)[:100]}")
-                    continue
-            if df is not None and len(df.columns) >= 4:
-                break
-        
-        if df is None or len(df.columns) < 4:
-            raise ValueError("Não foi possível ler o arquivo CSV com nenhuma combinação de encoding/separador")
-            
+        dialeto = detectar_dialeto(filepath)
+        df = pd.read_csv(filepath, sep=dialeto.separador, encoding=dialeto.encoding, **OPCOES_CSV)
     elif filepath.endswith(".xlsx"):
         df = pd.read_excel(filepath)
     else:
@@ -113,54 +191,104 @@ def carregar_dataframe(filepath):
     print(f"📊 Arquivo carregado: {len(df)} linhas, {len(df.columns)} colunas")
     print(f"🏷️ Colunas detectadas: {list(df.columns)[:5]}...")  # Mostra primeiras 5 colunas
     
-    # Mapeia os nomes das colunas para o padrão do banco
-    mapeamento_colunas = {
-        # Contas a Pagar
-        'CNPJ Filial': 'cnpj_filial',
-        'Filial': 'filial', 
-        'CNPJ Fornecedor': 'cnpj_fornecedor',
-        'Fornecedor': 'fornecedor',
-        'Sequência': 'sequencia',
-        'Nº Documento': 'numero_documento',
-        'Cheque': 'cheque',
-        'Emissão': 'emissao',
-        'Vencimento': 'vencimento',
-        'Vencimento Original': 'vencimento_original',
-        'Competência': 'competencia',
-        'Valor Principal': 'valor_principal',
-        'Juros/Desc': 'juros_desc',
-        'Valor Título': 'valor_titulo',
-        'Data Baixa': 'data_baixa',
-        'Data Liquidação': 'data_liquidacao',
-        'Banco Pagto': 'banco_pagto',
-        'Conta Pagto': 'conta_pagto',
-        'Forma Pagto': 'forma_pagto',
-        'Observações': 'observacoes',
-        'Conta Contábil': 'conta_contabil',
-        'Centro de Custo': 'centro_custo',
-        'Status': 'status',
-        'Descrição Despesa': 'descricao_despesa',
-        
-        # Contas a Receber
-        'CNPJ Cliente': 'cnpj_cliente',
-        'Cliente': 'cliente',
-        'Email para fatura': 'email_fatura'
-    }
-    
-    # Renomeia apenas as colunas que existem no DataFrame
-    colunas_existentes = {col: mapeamento_colunas[col] for col in df.columns if col in mapeamento_colunas}
-    df = df.rename(columns=colunas_existentes)
-    print(f"🔄 Colunas mapeadas: {len(colunas_existentes)} de {len(df.columns)}")
+    df = mapear_colunas(df)
+    print(f"🔄 Colunas mapeadas: {len(df.columns)}")
     
     return df
 
 
+def converter_valores_brasileiros(serie):
+    """
+    Converte uma coluna de valores no formato brasileiro ("1.234,56") para float, de forma vetorizada.
+    Vazios e valores inválidos viram 0.0; colunas já numéricas (xlsx) são mantidas como estão.
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return pd.to_numeric(serie, errors='coerce').fillna(0.0).astype(float)
+    # Remove espaços e pontos (separadores de milhares) e substitui vírgula por ponto
+    texto = serie.astype(str).str.strip()
+    texto = texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    return pd.to_numeric(texto, errors='coerce').fillna(0.0)
+
+
+def adicionar_chaves_data(df):
+    """Acrescenta ao DataFrame as chaves inteiras de data (venc_key, emissao_key, baixa_key, competencia_key)."""
+    for coluna, chave in CHAVES_DATA.items():
+        if coluna not in df.columns:
+            continue
+        serie = df[coluna]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            datas = serie
+        elif coluna == 'competencia':
+            datas = pd.to_datetime(serie.astype(str).str.strip(), format='%m/%Y', errors='coerce')
+        else:
+            datas = pd.to_datetime(serie.astype(str).str.strip().str[:10], format='%d/%m/%Y', errors='coerce')
+
+        if coluna == 'competencia':
+            df[chave] = (datas.dt.year * 100 + datas.dt.month).astype('Int64')
+        else:
+            df[chave] = (datas.dt.year * 10000 + datas.dt.month * 100 + datas.dt.day).astype('Int64')
+    return df
+
+
+def valores_em_centavos(serie):
+    """Converte valores em reais (float) para centavos inteiros (Int64), preservando nulos."""
+    return (pd.to_numeric(serie, errors='coerce') * 100).round().astype('Int64')
+
+
 # =========================
 # Função principal
 # =========================
-def importar_arquivo(file_storage):
-    """Processa o arquivo enviado e salva no banco"""
+def _detalhe_importacao(resumo):
+    """Sufixo da mensagem de sucesso com as contagens da importação."""
+    if resumo.get('resultado') is not None:
+        return f" ({resumo['resultado']})"
+    return f" ({resumo['linhas']:,} linhas)"
+
+
+# Modos de importação: incremental aplica só o delta; completo recarrega a tabela via tabela sombra
+MODOS_IMPORTACAO = ('incremental', 'completo')
+
+
+def _publicar_upload(uploads_dir, standard_filename, temp_path):
+    """
+    Depois da importação, move o upload temporário para o nome padrão (os.replace sobrescreve
+    o anterior de uma vez). Se o arquivo padrão estiver travado (ex: OneDrive), tenta algumas
+    vezes e, não conseguindo, registra num marker qual é o arquivo atual. Por fim limpa variantes.
+    """
+    moved = False
+    for attempt in range(5):
+        try:
+            os.replace(temp_path, os.path.join(uploads_dir, standard_filename))
+            print(f"🔁 Arquivo temporário movido para: {standard_filename}")
+            moved = True
+            break
+        except Exception as e:
+            print(f"⚠️ Tentativa {attempt+1} mover temp->padrão falhou: {str(e)}")
+            time.sleep(0.5)
+
+    # Marker apontando para o arquivo atual (o padrão, ou o temporário se não foi possível mover)
+    atual = standard_filename if moved else os.path.relpath(temp_path, uploads_dir)
+    marker = os.path.join(uploads_dir, f"{standard_filename}.current")
+    try:
+        with open(marker, 'w', encoding='utf-8') as mf:
+            mf.write(atual)
+        print(f"📌 Marker criado: {os.path.basename(marker)} -> {atual}")
+    except Exception as e:
+        print(f"⚠️ Não foi possível criar marker de arquivo atual: {str(e)}")
+
+    # Limpeza de variantes/backups, mantendo o arquivo atual
+    try:
+        _cleanup_upload_variants(uploads_dir, standard_filename, keep_filename=atual)
+    except Exception as e:
+        print(f"⚠️ Falha na limpeza de variantes: {str(e)}")
 
+
+def salvar_upload_temporario(file_storage):
+    """
+    Identifica pelo nome se o upload é de contas a receber ou a pagar e grava o arquivo em
+    uploads/pendentes (fora do alcance da limpeza de variantes enquanto aguarda a importação).
+    Retorna o dicionário do upload; nome não reconhecido ou falha ao gravar levantam ValueError.
+    """
     filename = file_storage.filename
     
     # Determina o nome padronizado baseado no conteúdo
@@ -171,294 +299,253 @@ def importar_arquivo(file_storage):
         standard_filename = "contas-a-pagar.csv"
         action = "pagar"
     else:
-        return "⚠️ Arquivo ignorado (nome não reconhecido)."
+        raise ValueError("⚠️ Arquivo ignorado (nome não reconhecido).")
     
     # Configura caminhos: sempre usar a pasta 'uploads' dentro do pacote financeiro
     uploads_dir = os.path.join(os.path.dirname(__file__), 'uploads')
-    os.makedirs(uploads_dir, exist_ok=True)
-    filepath = os.path.join(uploads_dir, standard_filename)
+    pendentes_dir = os.path.join(uploads_dir, 'pendentes')
+    os.makedirs(pendentes_dir, exist_ok=True)
     
     # Salva com um nome temporário para evitar colisões/locks (ex: OneDrive)
-    timestamp = int(time.time())
+    timestamp = time.time_ns()
     base, ext = os.path.splitext(standard_filename)
     # preserva extensão (.csv ou .xlsx)
     temp_filename = f"{base}.{timestamp}{ext}"
-    temp_path = os.path.join(uploads_dir, temp_filename)
+    temp_path = os.path.join(pendentes_dir, temp_filename)
 
     try:
-        file_storage.save(temp_path)
+        # SHA-256 calculado na gravação, para reconhecer reenvios do mesmo arquivo
+        hash_arquivo, tamanho = salvar_com_hash(file_storage, temp_path)
         print(f"💾 Arquivo salvo temporariamente como: {temp_filename}")
     except Exception as e:
-        return f"❌ Falha ao salvar arquivo enviado: {str(e)}"
+        raise ValueError(f"❌ Falha ao salvar arquivo enviado: {str(e)}")
+
+    return {
+        'arquivo': filename,
+        'action': action,
+        'tabela': 'contas_receber' if action == "receber" else 'contas_pagar',
+        'standard_filename': standard_filename,
+        'uploads_dir': uploads_dir,
+        'temp_path': temp_path,
+        'tamanho': tamanho,
+        'hash': hash_arquivo,
+    }
 
-    # Tenta remover o arquivo padrão anterior (se existir), com retries curtos
-    if os.path.exists(filepath):
-        removed = False
-        for attempt in range(5):
-            try:
-                os.remove(filepath)
-                print(f"🗑️ Arquivo anterior removido: {standard_filename}")
-                removed = True
-                break
-            except PermissionError as pe:
-                # Arquivo está sendo usado por outro processo; aguarda e tenta novamente
-                print(f"⚠️ Tentativa {attempt+1}: não foi possível remover {standard_filename} (PermissionError). Retentando em 0.5s...")
-                time.sleep(0.5)
-            except Exception as e:
-                print(f"⚠️ Erro ao remover arquivo antigo: {str(e)}")
-                break
 
-        if not removed:
-            # Se não conseguiu remover, tentamos renomear como backup; se também falhar, seguimos usando o arquivo temporário
-            backup_name = f"{standard_filename}.backup.{timestamp}"
-            backup_path = os.path.join(uploads_dir, backup_name)
-            try:
-                os.replace(filepath, backup_path)
-                print(f"� Arquivo antigo renomeado para backup: {backup_name}")
-                removed = True
-            except Exception as e:
-                print(f"⚠️ Não foi possível renomear arquivo antigo (provável lock). Continuando com o arquivo temporário: {str(e)}")
+def processar_upload(upload, modo='incremental', progresso=None):
+    """
+    Importa um upload gravado por salvar_upload_temporario.
+    progresso(fase, linhas=None), se informado, é chamado a cada etapa e a cada bloco gravado.
+    Retorna {'sucesso', 'mensagem', 'linhas', 'resultado'}.
+    """
+    if modo not in MODOS_IMPORTACAO:
+        modo = 'incremental'
+    progresso = progresso or (lambda fase, linhas=None: None)
+    temp_path = upload['temp_path']
+
+    try:
+        progresso('importando')
+        if modo == 'completo':
+            # Recarga em tabela sombra: a tabela viva segue consultável até a troca
+            if upload['action'] == "receber":
+                resumo = salvar_contas_receber(temp_path, progresso=progresso)
+            else:
+                resumo = salvar_contas_pagar(temp_path, progresso=progresso)
+        else:
+            resumo = importar_incremental(temp_path, upload['tabela'], progresso=progresso)
+        if modo == 'completo' or resumo['resultado'].houve_mudanca:
+            invalidar_cache()
+            agendar_snapshot()
+    except Exception as e:
+        # A troca/upsert é atômica; por garantia descarta resultados em cache
+        invalidar_cache()
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return {'sucesso': False, 'mensagem': f"❌ Erro ao importar {upload['arquivo']}: {str(e)}",
+                'linhas': 0, 'resultado': None}
+
+    progresso('publicando', resumo['linhas'])
+    if resumo['dialeto']:
+        registrar_dialeto(upload['uploads_dir'], upload['standard_filename'], resumo['dialeto'],
+                          linhas=resumo['linhas'])
+    _publicar_upload(upload['uploads_dir'], upload['standard_filename'], temp_path)
+
+    if upload['action'] == "receber":
+        mensagem = "📥 Contas a Receber importadas com sucesso!" + _detalhe_importacao(resumo)
+    else:
+        mensagem = "📤 Contas a Pagar importadas com sucesso!" + _detalhe_importacao(resumo)
+    resultado = resumo.get('resultado')
+    return {'sucesso': True, 'mensagem': mensagem, 'linhas': resumo['linhas'],
+            'resultado': vars(resultado) if resultado is not None else None}
 
-    # Usaremos o arquivo salvo temporariamente para o processamento
-    filepath = temp_path
 
+def importar_arquivo(file_storage, modo='incremental'):
+    """Processa o arquivo enviado e salva no banco (na thread de quem chama)"""
     try:
-        # Limpa dados anteriores do banco antes de importar
-        conn = get_connection()
-        cur = conn.cursor()
-        
-        if action == "receber":
-            # Executa DELETE, commita e fecha a conexão para liberar locks antes de reabrir conexão
-            cur.execute("DELETE FROM contas_receber")
-            conn.commit()
-            conn.close()
-            print("🧹 Dados anteriores de contas a receber removidos (commit realizado)")
+        upload = salvar_upload_temporario(file_storage)
+    except ValueError as e:
+        return str(e)
+    return processar_upload(upload, modo)['mensagem']
 
-            # Agora a função de importação abre sua própria conexão para inserir os dados
-            salvar_contas_receber(filepath)
 
-            # Tentar mover o arquivo temporário para o nome padrão (sobrescrever)
-            moved = False
-            try:
-                for attempt in range(5):
-                    try:
-                        # move (replace) temp -> padrão
-                        if os.path.exists(temp_path):
-                            os.replace(temp_path, os.path.join(uploads_dir, standard_filename))
-                            print(f"🔁 Arquivo temporário movido para: {standard_filename}")
-                            moved = True
-                            break
-                    except Exception as e:
-                        print(f"⚠️ Tentativa {attempt+1} mover temp->padrão falhou: {str(e)}")
-                        time.sleep(0.5)
-
-                # Se não conseguiu mover, grava um marker apontando pro temp para referência
-                marker = os.path.join(uploads_dir, f"{standard_filename}.current")
-                try:
-                    with open(marker, 'w', encoding='utf-8') as mf:
-                        # se moveu, manter o padrão; senão, aponta para o temp atual
-                        mf.write(standard_filename if moved else os.path.basename(filepath))
-                    print(f"📌 Marker criado: {os.path.basename(marker)} -> {os.path.basename(filepath)}")
-                except Exception as e:
-                    print(f"⚠️ Não foi possível criar marker de arquivo atual: {str(e)}")
+# =========================
+# Gravação em blocos
+# =========================
+COLUNAS_MONETARIAS = ['valor_principal', 'juros_desc', 'valor_titulo']
 
-            except Exception:
-                pass
 
-            # Após import bem-sucedida, tenta limpar variantes e backups, mantendo o arquivo atual
-            try:
-                keep = standard_filename if moved else os.path.basename(filepath)
-                _cleanup_upload_variants(uploads_dir, standard_filename, keep_filename=keep)
-            except Exception as e:
-                print(f"⚠️ Falha na limpeza de variantes: {str(e)}")
+def _converter_bloco(df):
+    """Converte valores monetários (e centavos) e acrescenta as chaves de data a um bloco já mapeado."""
+    # Garante coluna centro_custo
+    if 'centro_custo' not in df.columns:
+        df['centro_custo'] = ''
 
-            return "📥 Contas a Receber importadas com sucesso!"
+    for coluna in COLUNAS_MONETARIAS:
+        if coluna in df.columns:
+            df[coluna] = converter_valores_brasileiros(df[coluna])
 
-        elif action == "pagar":
-            cur.execute("DELETE FROM contas_pagar")
-            conn.commit()
-            conn.close()
-            print("🧹 Dados anteriores de contas a pagar removidos (commit realizado)")
-            salvar_contas_pagar(filepath)
+    # Valor principal também em centavos inteiros (somas exatas nos resumos)
+    if 'valor_principal' in df.columns:
+        df['valor_principal_centavos'] = valores_em_centavos(df['valor_principal'])
 
-            # Tentar mover temp -> padrão (analogamente)
-            moved = False
-            try:
-                for attempt in range(5):
-                    try:
-                        if os.path.exists(temp_path):
-                            os.replace(temp_path, os.path.join(uploads_dir, standard_filename))
-                            print(f"🔁 Arquivo temporário movido para: {standard_filename}")
-                            moved = True
-                            break
-                    except Exception as e:
-                        print(f"⚠️ Tentativa {attempt+1} mover temp->padrão falhou: {str(e)}")
-                        time.sleep(0.5)
-
-                marker = os.path.join(uploads_dir, f"{standard_filename}.current")
-                try:
-                    with open(marker, 'w', encoding='utf-8') as mf:
-                        mf.write(standard_filename if moved else os.path.basename(filepath))
-                    print(f"📌 Marker criado: {os.path.basename(marker)} -> {os.path.basename(filepath)}")
-                except Exception as e:
-                    print(f"⚠️ Não foi possível criar marker de arquivo atual: {str(e)}")
-            except Exception:
-                pass
+    # Chaves de data ordenáveis para as consultas por intervalo
+    return adicionar_chaves_data(df)
 
-            # Limpeza de variantes/backups
-            try:
-                keep = standard_filename if moved else os.path.basename(filepath)
-                _cleanup_upload_variants(uploads_dir, standard_filename, keep_filename=keep)
-            except Exception as e:
-                print(f"⚠️ Falha na limpeza de variantes: {str(e)}")
 
-            return "📤 Contas a Pagar importadas com sucesso!"
-            
-    except Exception as e:
-        return f"❌ Erro ao importar {filename}: {str(e)}"
+def _inserir_bloco(cur, tabela, df):
+    """Insere o bloco com um único executemany; NaN/NA viram NULL e datas viram texto."""
+    for coluna in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[coluna]):
+            df[coluna] = df[coluna].dt.strftime('%Y-%m-%d %H:%M:%S')
+    linhas = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    colunas = ', '.join(df.columns)
+    marcadores = ', '.join('?' * len(df.columns))
+    cur.executemany(f"INSERT INTO {tabela} ({colunas}) VALUES ({marcadores})", linhas)
+    return len(df)
+
+
+def _gravar_blocos(conn, filepath, tabela, preparar_bloco, tamanho_bloco, dialeto=None,
+                   confirmar_cada_bloco=False, progresso=None):
+    """
+    Lê, converte e insere o arquivo bloco a bloco na transação já aberta em conn.
+    Com confirmar_cada_bloco (carga em tabela sombra, invisível aos leitores), faz commit
+    a cada bloco para não segurar o lock de escrita durante a carga inteira.
+    Retorna o total de linhas inseridas.
+    """
+    cur = conn.cursor()
+    total = 0
+    for numero, bloco in enumerate(ler_blocos(filepath, tamanho_bloco, dialeto), start=1):
+        bloco = preparar_bloco(bloco)
+        total += _inserir_bloco(cur, tabela, bloco)
+        if confirmar_cada_bloco:
+            conn.commit()
+        print(f"📦 Bloco {numero}: {len(bloco):,} linhas ({total:,} no total)")
+        if progresso:
+            progresso('gravando', total)
+    return total
+
+
+def _dialeto_do_arquivo(filepath):
+    """Dialeto do CSV (None para xlsx), detectado antes de abrir a transação."""
+    return detectar_dialeto(filepath) if filepath.endswith(".csv") else None
 
 
 # =========================
 # Contas a Receber
 # =========================
-def salvar_contas_receber(filepath):
+
+# Colunas do ERP com nome próprio em contas_receber (aplicado antes do mapeamento geral)
+MAPEAMENTO_RECEBER = {
+    'Nº Documento': 'documento',
+    'Banco Pagto': 'banco_recebimento',
+    'Conta Pagto': 'conta_recebimento',
+    'Forma Pagto': 'forma_recebimento',
+    'Email para fatura': 'descricao_receita'  # Usando campo disponível
+}
+
+COLUNAS_RECEBER = ['cnpj_filial', 'filial', 'cnpj_cliente', 'cliente', 'sequencia',
+                   'documento', 'cheque', 'emissao', 'vencimento', 'vencimento_original',
+                   'competencia', 'valor_principal', 'valor_principal_centavos',
+                   'juros_desc', 'valor_titulo', 'data_baixa',
+                   'data_liquidacao', 'banco_recebimento', 'conta_recebimento',
+                   'forma_recebimento', 'observacoes', 'conta_contabil', 'centro_custo',
+                   'status', 'descricao_receita',
+                   'venc_key', 'emissao_key', 'baixa_key', 'competencia_key']
+
+
+def _preparar_bloco_receber(df):
+    """Mapeia, converte e seleciona as colunas de contas_receber de um bloco."""
+    df = mapear_colunas(df.rename(columns=MAPEAMENTO_RECEBER))
+    df = _converter_bloco(df)
+    return df[[col for col in COLUNAS_RECEBER if col in df.columns]]
+
+
+def salvar_contas_receber(filepath, tamanho_bloco=TAMANHO_BLOCO, progresso=None):
+    """
+    Recarga completa de contas a receber em streaming: o arquivo é lido em blocos de
+    tamanho_bloco linhas, convertido de forma vetorizada e inserido com executemany em
+    contas_receber__staging, que é indexada e trocada pela tabela viva numa transação curta.
+    Retorna {'linhas': inseridas, 'dialeto': DialetoCSV ou None}.
+    """
     print(f"🔄 Iniciando importação de: {filepath}")
-    df = carregar_dataframe(filepath)
-    print(f"📊 Dados carregados: {len(df)} registros")
+    dialeto = _dialeto_do_arquivo(filepath)
 
     conn = get_connection()
     cur = conn.cursor()
     
     print(f"🔗 Conectado ao banco: {DB_PATH}")
 
-    # Mapeamento das colunas do CSV para as colunas da tabela
-    column_mapping = {
-        'CNPJ Filial': 'cnpj_filial',
-        'Filial': 'filial', 
-        'CNPJ Cliente': 'cnpj_cliente',
-        'Cliente': 'cliente',
-        'Sequência': 'sequencia',
-        'Nº Documento': 'documento',
-        'Cheque': 'cheque',
-        'Emissão': 'emissao',
-        'Vencimento': 'vencimento',
-        'Vencimento Original': 'vencimento_original',
-        'Competência': 'competencia',
-        'Valor Principal': 'valor_principal',
-        'Juros/Desc': 'juros_desc',
-        'Valor Título': 'valor_titulo',
-        'Data Baixa': 'data_baixa',
-        'Data Liquidação': 'data_liquidacao',
-        'Banco Pagto': 'banco_recebimento',
-        'Conta Pagto': 'conta_recebimento',
-        'Forma Pagto': 'forma_recebimento',
-        'Observações': 'observacoes',
-        'Conta Contábil': 'conta_contabil',
-        'Status': 'status',
-        'Email para fatura': 'descricao_receita'  # Usando campo disponível
-    }
-    
-    print(f"🏷️ Colunas originais: {list(df.columns)}")
-    
-    # Renomeia as colunas
-    df = df.rename(columns=column_mapping)
-    print(f"🏷️ Colunas após mapeamento: {list(df.columns)}")
-    
-    # Adiciona coluna centro_custo se não existir
-    if 'centro_custo' not in df.columns:
-        df['centro_custo'] = ''
-        print("➕ Adicionada coluna centro_custo")
-    
-    # Função para converter valores monetários brasileiros
-    def converter_valor_brasileiro(valor):
-        if pd.isna(valor) or valor == '':
-            return 0.0
-        try:
-            # Converte para string e remove espaços
-            valor_str = str(valor).strip()
-            # Remove pontos (separadores de milhares) e substitui vírgula por ponto
-            valor_str = valor_str.replace('.', '').replace(',', '.')
-            return float(valor_str)
-        except:
-            return 0.0
-    
-    # Converte valores monetários do formato brasileiro para float
-    colunas_monetarias = ['valor_principal', 'juros_desc', 'valor_titulo']
-    for coluna in colunas_monetarias:
-        if coluna in df.columns:
-            valores_originais = df[coluna].head(3).tolist()
-            df[coluna] = df[coluna].apply(converter_valor_brasileiro)
-            valores_convertidos = df[coluna].head(3).tolist()
-            print(f"💰 {coluna}: {valores_originais} → {valores_convertidos}")
-    
-    # Remove a coluna id se existir (é auto incremento)
-    if 'id' in df.columns:
-        df = df.drop('id', axis=1)
-        print("🗑️ Removida coluna id")
-    
-    # Seleciona apenas as colunas que existem na tabela
-    colunas_tabela = ['cnpj_filial', 'filial', 'cnpj_cliente', 'cliente', 'sequencia', 
-                      'documento', 'cheque', 'emissao', 'vencimento', 'vencimento_original',
-                      'competencia', 'valor_principal', 'juros_desc', 'valor_titulo',
-                      'data_baixa', 'data_liquidacao', 'banco_recebimento', 'conta_recebimento',
-                      'forma_recebimento', 'observacoes', 'conta_contabil', 'centro_custo',
-                      'status', 'descricao_receita']
-    
-    # Filtra apenas as colunas que existem tanto no DataFrame quanto na tabela
-    colunas_existentes = [col for col in colunas_tabela if col in df.columns]
-    print(f"✅ Colunas para inserir: {colunas_existentes}")
-    df_filtrado = df[colunas_existentes]
-    
-    # Verificar dados específicos antes da inserção
-    minerva_count = len(df_filtrado[df_filtrado['cliente'].str.contains('MINERVA', na=False)])
-    if minerva_count > 0:
-        print(f"🔍 Registros MINERVA encontrados: {minerva_count}")
-        minerva_sample = df_filtrado[df_filtrado['cliente'].str.contains('MINERVA', na=False)].head(2)
-        print(f"📋 Amostra MINERVA:")
-        for idx, row in minerva_sample.iterrows():
-            print(f"  - {row['cliente']} | {row['vencimento']} | R$ {row['valor_principal']:.2f} | {row['status']}")
-
     # Contar registros antes da inserção
     cur.execute("SELECT COUNT(*) FROM contas_receber")
     antes = cur.fetchone()[0]
     print(f"📊 Registros no banco antes: {antes:,}")
 
-    # Inserir dados
-    df_filtrado.to_sql("contas_receber", conn, if_exists="append", index=False)
-    print("💾 Dados inseridos no banco")
-    
-    # Commit explícito
-    conn.commit()
-    print("✅ Commit realizado")
+    # Bancos antigos podem não ter as colunas de chave de data, a de centavos nem as da importação incremental
+    garantir_chaves_data(conn)
+    migrar_valores_centavos(conn, ('contas_receber',))
+    garantir_colunas_incrementais(conn, 'contas_receber', COLUNAS_RECEBER)
+
+    staging = criar_tabela_sombra(conn, 'contas_receber')
+    try:
+        # Hash e chave natural como na importação incremental, para a próxima reconhecer estes títulos
+        linhas = _gravar_blocos(conn, filepath, staging, lambda bloco: impressao_digital(_preparar_bloco_receber(bloco)),
+                                tamanho_bloco, dialeto, confirmar_cada_bloco=True, progresso=progresso)
+        preencher_chave_natural(conn, 'contas_receber', staging)
+        indexar_tabela_sombra(conn, 'contas_receber')
+        trocar_tabela_sombra(conn, 'contas_receber')
+    except Exception:
+        descartar_tabela_sombra(conn, 'contas_receber')
+        conn.close()
+        raise
     
-    # Contar registros após a inserção
+    # Contar registros após a troca
     cur.execute("SELECT COUNT(*) FROM contas_receber")
     depois = cur.fetchone()[0]
-    print(f"📊 Registros no banco depois: {depois:,}")
-    print(f"➕ Registros adicionados: {depois - antes:,}")
+    print(f"📊 Registros no banco depois: {depois:,} (antes: {antes:,})")
     
     # Verificar especificamente MINERVA após inserção
     cur.execute("SELECT COUNT(*) FROM contas_receber WHERE cliente LIKE '%MINERVA%'")
     minerva_db = cur.fetchone()[0]
     print(f"🔍 MINERVA no banco após inserção: {minerva_db:,}")
+
+    # Reconstrói o resumo diário usado pelos dashboards
+    if progresso:
+        progresso('resumo', linhas)
+    atualizar_resumo_receber(conn)
+    print("📈 Resumo de contas a receber atualizado")
     
     conn.close()
     print("🔚 Conexão fechada")
+    return {'linhas': linhas, 'dialeto': dialeto}
 
 
 # =========================
 # Contas a Pagar
 # =========================
-def salvar_contas_pagar(filepath):
-    df = carregar_dataframe(filepath)
-
-    conn = get_connection()
-    cur = conn.cursor()
-
-    # cria tabela do zero
-    cur.execute("DROP TABLE IF EXISTS contas_pagar")
-    cur.execute("""
-    CREATE TABLE contas_pagar (
+DDL_CONTAS_PAGAR = """
+    CREATE TABLE IF NOT EXISTS contas_pagar (
         cnpj_filial TEXT,
         filial TEXT,
         cnpj_fornecedor TEXT,
@@ -471,6 +558,7 @@ def salvar_contas_pagar(filepath):
         vencimento_original TEXT,
         competencia TEXT,
         valor_principal REAL,
+        valor_principal_centavos INTEGER,
         juros_desc REAL,
         valor_titulo REAL,
         data_baixa TEXT,
@@ -482,73 +570,114 @@ def salvar_contas_pagar(filepath):
         conta_contabil TEXT,
         centro_custo TEXT,
         status TEXT,
-        descricao_despesa TEXT
+        descricao_despesa TEXT,
+        venc_key INTEGER,
+        emissao_key INTEGER,
+        baixa_key INTEGER,
+        competencia_key INTEGER,
+        chave_natural TEXT,
+        hash_conteudo INTEGER
     )
-    """)
-
-    # Mapeamento de colunas semelhantes ao CSV -> tabela
-    mapping = {
-        'CNPJ Filial': 'cnpj_filial',
-        'Filial': 'filial',
-        'CNPJ Fornecedor': 'cnpj_fornecedor',
-        'Fornecedor': 'fornecedor',
-        'Sequência': 'sequencia',
-        'Nº Documento': 'numero_documento',
-        'Cheque': 'cheque',
-        'Emissão': 'emissao',
-        'Vencimento': 'vencimento',
-        'Vencimento Original': 'vencimento_original',
-        'Competência': 'competencia',
-        'Valor Principal': 'valor_principal',
-        'Juros/Desc': 'juros_desc',
-        'Valor Título': 'valor_titulo',
-        'Data Baixa': 'data_baixa',
-        'Data Liquidação': 'data_liquidacao',
-        'Banco Pagto': 'banco_pagto',
-        'Conta Pagto': 'conta_pagto',
-        'Forma Pagto': 'forma_pagto',
-        'Observações': 'observacoes',
-        'Conta Contábil': 'conta_contabil',
-        'Centro de Custo': 'centro_custo',
-        'Status': 'status',
-        'Descrição Despesa': 'descricao_despesa'
-    }
+"""
 
-    # Renomeia colunas que existem
-    col_exist = {c: mapping[c] for c in df.columns if c in mapping}
-    df = df.rename(columns=col_exist)
+COLUNAS_PAGAR = ['cnpj_filial','filial','cnpj_fornecedor','fornecedor','sequencia','numero_documento',
+                 'cheque','emissao','vencimento','vencimento_original','competencia','valor_principal',
+                 'valor_principal_centavos','juros_desc','valor_titulo','data_baixa','data_liquidacao',
+                 'banco_pagto','conta_pagto','forma_pagto','observacoes','conta_contabil','centro_custo',
+                 'status','descricao_despesa','venc_key','emissao_key','baixa_key','competencia_key']
 
-    # Garante coluna centro_custo
-    if 'centro_custo' not in df.columns:
-        df['centro_custo'] = ''
 
-    # Conversor de valores brasileiros -> float
-    def converter_valor_brasileiro(valor):
-        import pandas as pd
-        if pd.isna(valor) or valor == '':
-            return 0.0
-        try:
-            valor_str = str(valor).strip()
-            valor_str = valor_str.replace('.', '').replace(',', '.')
-            return float(valor_str)
-        except:
-            return 0.0
-
-    colunas_monetarias = ['valor_principal', 'juros_desc', 'valor_titulo']
-    for coluna in colunas_monetarias:
-        if coluna in df.columns:
-            df[coluna] = df[coluna].apply(converter_valor_brasileiro)
+def _preparar_bloco_pagar(df):
+    """Mapeia, converte e seleciona as colunas de contas_pagar de um bloco."""
+    df = _converter_bloco(mapear_colunas(df))
+    return df[[col for col in COLUNAS_PAGAR if col in df.columns]]
 
-    # Seleciona apenas colunas da tabela
-    colunas_tabela = ['cnpj_filial','filial','cnpj_fornecedor','fornecedor','sequencia','numero_documento',
-                      'cheque','emissao','vencimento','vencimento_original','competencia','valor_principal',
-                      'juros_desc','valor_titulo','data_baixa','data_liquidacao','banco_pagto','conta_pagto',
-                      'forma_pagto','observacoes','conta_contabil','centro_custo','status','descricao_despesa']
 
-    colunas_existentes = [col for col in colunas_tabela if col in df.columns]
-    df_filtrado = df[colunas_existentes]
+def salvar_contas_pagar(filepath, tamanho_bloco=TAMANHO_BLOCO, progresso=None):
+    """
+    Recarga completa de contas_pagar em streaming (blocos de tamanho_bloco linhas).
+    A tabela é recriada do zero como contas_pagar__staging e trocada pela viva ao final;
+    se a leitura falhar, a tabela viva não é tocada.
+    Retorna {'linhas': inseridas, 'dialeto': DialetoCSV ou None}.
+    """
+    dialeto = _dialeto_do_arquivo(filepath)
+    conn = get_connection()
+
+    # cria tabela do zero
+    staging = criar_tabela_sombra(conn, 'contas_pagar', DDL_CONTAS_PAGAR)
+    try:
+        # Hash e chave natural como na importação incremental, para a próxima reconhecer estes títulos
+        linhas = _gravar_blocos(conn, filepath, staging, lambda bloco: impressao_digital(_preparar_bloco_pagar(bloco)),
+                                tamanho_bloco, dialeto, confirmar_cada_bloco=True, progresso=progresso)
+        preencher_chave_natural(conn, 'contas_pagar', staging)
+        indexar_tabela_sombra(conn, 'contas_pagar')
+        trocar_tabela_sombra(conn, 'contas_pagar')
+    except Exception:
+        descartar_tabela_sombra(conn, 'contas_pagar')
+        conn.close()
+        raise
+
+    # Índices de range que a tabela anterior não tinha são criados depois da troca
+    garantir_chaves_data(conn)
+
+    # Reconstrói o resumo diário usado pelos dashboards
+    if progresso:
+        progresso('resumo', linhas)
+    atualizar_resumo_pagar(conn)
+    conn.close()
+    return {'linhas': linhas, 'dialeto': dialeto}
+
+
+# =========================
+# Importação incremental
+# =========================
+TABELAS_IMPORTACAO = {
+    'contas_receber': (COLUNAS_RECEBER, _preparar_bloco_receber, atualizar_resumo_receber),
+    'contas_pagar': (COLUNAS_PAGAR, _preparar_bloco_pagar, atualizar_resumo_pagar),
+}
+
+
+def importar_incremental(filepath, tabela, remover_ausentes=True, tamanho_bloco=TAMANHO_BLOCO, progresso=None):
+    """
+    Importa o arquivo aplicando só o delta em tabela (contas_receber ou contas_pagar):
+    o arquivo vai em blocos para uma tabela temporária e o upsert pela chave natural
+    é feito numa única transação. Com remover_ausentes, títulos que sumiram da exportação
+    são apagados. Retorna {'linhas', 'dialeto', 'resultado': ResultadoIncremental}.
+    """
+    print(f"🔄 Iniciando importação incremental de {tabela}: {filepath}")
+    colunas, preparar_bloco, atualizar_resumo = TABELAS_IMPORTACAO[tabela]
+    dialeto = _dialeto_do_arquivo(filepath)
+
+    conn = get_connection()
+    cur = conn.cursor()
+    if tabela == 'contas_pagar':
+        cur.execute(DDL_CONTAS_PAGAR)
+    garantir_chaves_data(conn)
+    migrar_valores_centavos(conn, (tabela,))
+    garantir_colunas_incrementais(conn, tabela, colunas)
+
+    try:
+        cur.execute("BEGIN")
+        area = criar_area_importacao(cur, colunas)
+        linhas = _gravar_blocos(conn, filepath, area, lambda bloco: impressao_digital(preparar_bloco(bloco)),
+                                tamanho_bloco, dialeto, progresso=progresso)
+        resultado = aplicar_importacao_incremental(conn, tabela, colunas, remover_ausentes)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        conn.close()
+        raise
+    print(f"✅ {tabela}: {resultado}")
+
+    # Resumo diário só no intervalo de vencimentos afetado
+    if resultado.houve_mudanca:
+        if progresso:
+            progresso('resumo', linhas)
+        if resultado.resumo_completo:
+            atualizar_resumo(conn)
+        else:
+            atualizar_resumo(conn, resultado.venc_ini, resultado.venc_fim)
+        print("📈 Resumo diário atualizado")
 
-    # Insere na tabela
-    df_filtrado.to_sql("contas_pagar", conn, if_exists="append", index=False)
-    conn.commit()
     conn.close()
+    return {'linhas': linhas, 'dialeto': dialeto, 'resultado': resultado}
@@ -0,0 +1,193 @@
+"""
+Importação incremental de contas a receber / contas a pagar.
+
+A importação completa apagava o razão inteiro e o regravava a cada
+exportação diária do ERP, mesmo quando só algumas centenas de títulos
+mudavam. No modo incremental cada linha recebe uma chave natural estável
+(filial, cliente/fornecedor, documento, sequência) e um hash do conteúdo.
+O arquivo é carregado numa tabela temporária e comparado com o razão em
+SQL: linhas novas são inseridas, alteradas são atualizadas (upsert pela
+chave natural) e as que sumiram da exportação são removidas. Só o delta é
+escrito, e o resumo diário é reconstruído apenas no intervalo afetado.
+
+Linhas gravadas antes do modo incremental (chave_natural NULL) são sempre
+substituídas na primeira importação incremental.
+"""
+
+from dataclasses import dataclass
+
+import pandas as pd
+
+from .database import criar_indice
+
+# Colunas que identificam um título; as que não existirem no arquivo são ignoradas
+CHAVES_NATURAIS = {
+    'contas_receber': ['cnpj_filial', 'cnpj_cliente', 'cliente', 'documento', 'sequencia'],
+    'contas_pagar': ['cnpj_filial', 'cnpj_fornecedor', 'fornecedor', 'numero_documento', 'sequencia'],
+}
+
+TABELA_BRUTA = '_importacao_bruta'
+TABELA_STAGING = '_importacao'
+TABELA_CHAVES = '_importacao_chaves'
+
+
+@dataclass
+class ResultadoIncremental:
+    """Contagens do delta aplicado e intervalo de venc_key afetado."""
+    inseridos: int = 0
+    atualizados: int = 0
+    removidos: int = 0
+    venc_ini: int = None
+    venc_fim: int = None
+    # Alguma linha afetada sem venc_key: o resumo precisa ser reconstruído inteiro
+    resumo_completo: bool = False
+
+    @property
+    def houve_mudanca(self):
+        return bool(self.inseridos or self.atualizados or self.removidos)
+
+    def __str__(self):
+        return f"+{self.inseridos} novas, {self.atualizados} alteradas, {self.removidos} removidas"
+
+
+def garantir_colunas_incrementais(conn, tabela, colunas):
+    """
+    Garante em tabela as colunas do arquivo, chave_natural/hash_conteudo e o índice único
+    da chave natural (NULLs não conflitam, então linhas antigas não impedem o índice).
+    """
+    cur = conn.cursor()
+    cur.execute(f"PRAGMA table_info({tabela})")
+    existentes = {row[1] for row in cur.fetchall()}
+    for coluna in colunas:
+        if coluna not in existentes:
+            cur.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna}")
+    if 'chave_natural' not in existentes:
+        cur.execute(f"ALTER TABLE {tabela} ADD COLUMN chave_natural TEXT")
+    if 'hash_conteudo' not in existentes:
+        cur.execute(f"ALTER TABLE {tabela} ADD COLUMN hash_conteudo INTEGER")
+    criar_indice(cur, f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{tabela}_chave_natural ON {tabela} (chave_natural)")
+    conn.commit()
+
+
+def impressao_digital(df):
+    """Acrescenta hash_conteudo (hash vetorizado de todas as colunas da linha, em int64)."""
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    df = df.copy()
+    df['hash_conteudo'] = hashes.view('int64')
+    return df
+
+
+def criar_area_importacao(cur, colunas):
+    """Cria a tabela temporária que recebe os blocos do arquivo (sem afinidade de tipo)."""
+    cur.execute(f"DROP TABLE IF EXISTS temp.{TABELA_BRUTA}")
+    cur.execute(f"CREATE TEMP TABLE {TABELA_BRUTA} ({', '.join(colunas)}, hash_conteudo)")
+    return f"temp.{TABELA_BRUTA}"
+
+
+def _expressao_chave(colunas_chave):
+    return " || '|' || ".join(f"COALESCE(CAST({c} AS TEXT), '')" for c in colunas_chave)
+
+
+def _montar_staging(cur, tabela, colunas):
+    """
+    Monta a tabela temporária com a chave natural. Chaves repetidas no arquivo
+    (mesmo documento/sequência) são diferenciadas pela ordem de ocorrência (#1, #2...).
+    """
+    chave = _expressao_chave([c for c in CHAVES_NATURAIS[tabela] if c in colunas])
+    cur.execute(f"DROP TABLE IF EXISTS temp.{TABELA_STAGING}")
+    cur.execute(f"""
+        CREATE TEMP TABLE {TABELA_STAGING} AS
+        SELECT {', '.join(colunas)}, hash_conteudo,
+               chave_base || '#' || ROW_NUMBER() OVER (PARTITION BY chave_base ORDER BY ordem) AS chave_natural
+        FROM (SELECT rowid AS ordem, *, {chave} AS chave_base FROM {TABELA_BRUTA})
+    """)
+    cur.execute(f"CREATE INDEX temp.idx_importacao_chave ON {TABELA_STAGING} (chave_natural)")
+
+
+def preencher_chave_natural(conn, tabela, destino):
+    """
+    Calcula chave_natural em destino (ex: a tabela sombra de uma recarga completa de tabela)
+    com a mesma regra de _montar_staging, na ordem de inserção das linhas. Assim a importação
+    incremental seguinte reconhece os títulos da recarga em vez de tratá-los como novos.
+    """
+    cur = conn.cursor()
+    cur.execute(f"PRAGMA table_info({destino})")
+    colunas = {row[1] for row in cur.fetchall()}
+    chave = _expressao_chave([c for c in CHAVES_NATURAIS[tabela] if c in colunas])
+    # Tabela temporária por rowid + subconsulta correlacionada: UPDATE ... FROM exigiria SQLite 3.33
+    cur.execute(f"DROP TABLE IF EXISTS temp.{TABELA_CHAVES}")
+    cur.execute(f"""
+        CREATE TEMP TABLE {TABELA_CHAVES} AS
+        SELECT ordem, chave_base || '#' || ROW_NUMBER() OVER (PARTITION BY chave_base ORDER BY ordem) AS chave_natural
+        FROM (SELECT rowid AS ordem, {chave} AS chave_base FROM {destino})
+    """)
+    cur.execute(f"CREATE UNIQUE INDEX temp.idx_chaves_ordem ON {TABELA_CHAVES} (ordem)")
+    cur.execute(f"""
+        UPDATE {destino}
+        SET chave_natural = (SELECT k.chave_natural FROM temp.{TABELA_CHAVES} k WHERE k.ordem = {destino}.rowid)
+    """)
+    cur.execute(f"DROP TABLE temp.{TABELA_CHAVES}")
+    conn.commit()
+
+
+def _medir_delta(cur, tabela, remover_ausentes):
+    """Conta novos/alterados/removidos e o intervalo de venc_key (antigo e novo) das linhas afetadas."""
+    filtro_removidos = "t.chave_natural IS NULL"
+    if remover_ausentes:
+        filtro_removidos += f" OR NOT EXISTS (SELECT 1 FROM {TABELA_STAGING} i WHERE i.chave_natural = t.chave_natural)"
+
+    cur.execute(f"""
+        WITH delta AS (
+            SELECT i.venc_key AS venc_novo, t.venc_key AS venc_antigo, t.rowid IS NULL AS novo
+            FROM {TABELA_STAGING} i
+            LEFT JOIN {tabela} t ON t.chave_natural = i.chave_natural
+            WHERE t.hash_conteudo IS NOT i.hash_conteudo
+        ),
+        removidos AS (
+            SELECT t.venc_key FROM {tabela} t WHERE {filtro_removidos}
+        ),
+        vencimentos AS (
+            SELECT venc_novo AS v FROM delta
+            UNION ALL SELECT venc_antigo FROM delta WHERE NOT novo
+            UNION ALL SELECT venc_key FROM removidos
+        )
+        SELECT
+            (SELECT COALESCE(SUM(novo), 0) FROM delta),
+            (SELECT COALESCE(SUM(NOT novo), 0) FROM delta),
+            (SELECT COUNT(*) FROM removidos),
+            (SELECT MIN(v) FROM vencimentos),
+            (SELECT MAX(v) FROM vencimentos),
+            (SELECT COUNT(*) FROM vencimentos WHERE v IS NULL)
+    """)
+    inseridos, atualizados, removidos, venc_ini, venc_fim, sem_venc = cur.fetchone()
+    return ResultadoIncremental(inseridos, atualizados, removidos, venc_ini, venc_fim, bool(sem_venc)), filtro_removidos
+
+
+def aplicar_importacao_incremental(conn, tabela, colunas, remover_ausentes=True):
+    """
+    Aplica em tabela o delta entre o razão e a área de importação (já preenchida),
+    dentro da transação aberta em conn. Retorna ResultadoIncremental.
+    """
+    cur = conn.cursor()
+    _montar_staging(cur, tabela, colunas)
+    resultado, filtro_removidos = _medir_delta(cur, tabela, remover_ausentes)
+
+    if resultado.removidos:
+        cur.execute(f"DELETE FROM {tabela} WHERE rowid IN (SELECT t.rowid FROM {tabela} t WHERE {filtro_removidos})")
+
+    if resultado.inseridos or resultado.atualizados:
+        lista = ', '.join(colunas)
+        atualizacoes = ', '.join(f"{c} = excluded.{c}" for c in colunas)
+        cur.execute(f"""
+            INSERT INTO {tabela} ({lista}, hash_conteudo, chave_natural)
+            SELECT {', '.join('i.' + c for c in colunas)}, i.hash_conteudo, i.chave_natural
+            FROM {TABELA_STAGING} i
+            LEFT JOIN {tabela} t ON t.chave_natural = i.chave_natural
+            WHERE t.hash_conteudo IS NOT i.hash_conteudo
+            ON CONFLICT (chave_natural)
+            DO UPDATE SET {atualizacoes}, hash_conteudo = excluded.hash_conteudo
+        """)
+
+    cur.execute(f"DROP TABLE IF EXISTS temp.{TABELA_STAGING}")
+    cur.execute(f"DROP TABLE IF EXISTS temp.{TABELA_BRUTA}")
+    return resultado
@@ -0,0 +1,246 @@
+"""
+Instrumentação opcional das consultas SQL por requisição.
+
+Não havia como ver para onde ia o tempo das requisições: build_dados_frz,
+enrich_data_with_tipologia, ClienteHelper.buscar_multiplos_nomes_manifesto
+e integrar_dados_manifesto disparam centenas de consultas quase iguais sem
+deixar rastro. Com FINANCEIRO_DEBUG_SQL=1 as conexões do pool
+(pool_conexoes) passam a usar CursorInstrumentado, que registra para cada
+instrução o texto normalizado (literais viram ?), o tempo (execute + fetch)
+e as linhas.
+
+Ao fim da requisição o registro vira um resumo: consultas agrupadas pela
+forma normalizada, formas repetidas acima de LIMITE_N_MAIS_1 marcadas como
+N+1 e EXPLAIN QUERY PLAN das formas mais lentas que LIMITE_LENTA_MS. Os
+últimos resumos ficam em memória para /debug/queries, e cada resposta leva
+o cabeçalho X-SQL-Consultas.
+
+Desligada, o custo é um teste de flag na criação de cada cursor.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+ATIVO = os.environ.get('FINANCEIRO_DEBUG_SQL', '').lower() in ('1', 'true', 'sim')
+
+# Mesma forma de consulta repetida a partir disso numa requisição é sinalizada como N+1
+LIMITE_N_MAIS_1 = int(os.environ.get('FINANCEIRO_SQL_N_MAIS_1', 10))
+
+# Consultas acima disso (ms) recebem EXPLAIN QUERY PLAN no resumo
+LIMITE_LENTA_MS = float(os.environ.get('FINANCEIRO_SQL_LENTA_MS', 100))
+
+# Resumos de requisições guardados para /debug/queries
+MAX_RESUMOS = 50
+
+# Consultas guardadas individualmente por requisição; além disso só entram na contagem
+MAX_CONSULTAS_POR_REQUISICAO = 20000
+
+_local = threading.local()
+_resumos = deque(maxlen=MAX_RESUMOS)
+_lock_resumos = threading.Lock()
+
+_RE_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACOS = re.compile(r"\s+")
+
+
+def ativar(ativo=True):
+    global ATIVO
+    ATIVO = ativo
+
+
+def normalizar_sql(sql):
+    """Forma da consulta: literais viram ?, listas IN (?, ?, ...) viram uma só e espaços são compactados."""
+    forma = _RE_TEXTO.sub('?', sql)
+    forma = _RE_NUMERO.sub('?', forma)
+    forma = _RE_LISTA.sub('(?, ...)', forma)
+    return _RE_ESPACOS.sub(' ', forma).strip()
+
+
+class ConsultaRegistrada:
+    __slots__ = ('sql', 'parametros', 'banco', 'tempo', 'linhas')
+
+    def __init__(self, sql, parametros, banco, tempo, linhas):
+        self.sql = sql
+        self.parametros = parametros
+        self.banco = banco
+        self.tempo = tempo
+        self.linhas = linhas
+
+
+class RegistroRequisicao:
+    def __init__(self, descricao):
+        self.descricao = descricao
+        self.inicio = time.perf_counter()
+        self.consultas = []
+        self.descartadas = 0
+
+    def adicionar(self, sql, parametros, banco, tempo, linhas):
+        if len(self.consultas) >= MAX_CONSULTAS_POR_REQUISICAO:
+            self.descartadas += 1
+            return None
+        consulta = ConsultaRegistrada(sql, parametros, banco, tempo, linhas)
+        self.consultas.append(consulta)
+        return consulta
+
+
+def _registro_atual():
+    return getattr(_local, 'registro', None)
+
+
+def iniciar_registro(descricao=''):
+    """Começa a registrar as consultas da thread atual (início da requisição)."""
+    if ATIVO:
+        _local.registro = RegistroRequisicao(descricao)
+
+
+def encerrar_registro():
+    """Para de registrar e retorna o resumo (também guardado para /debug/queries), ou None."""
+    registro = _registro_atual()
+    _local.registro = None
+    if registro is None:
+        return None
+    resumo = resumir(registro)
+    with _lock_resumos:
+        _resumos.appendleft(resumo)
+    return resumo
+
+
+def ultimos_resumos():
+    with _lock_resumos:
+        return list(_resumos)
+
+
+def _plano(banco, sql, parametros=()):
+    """EXPLAIN QUERY PLAN numa conexão própria, com os mesmos parâmetros da execução registrada."""
+    try:
+        uri = banco if banco.startswith('file:') else f"file:{banco}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=5)
+        try:
+            return [linha[-1] for linha in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametros).fetchall()]
+        finally:
+            conn.close()
+    except Exception as e:
+        return [f"(plano indisponível: {str(e)})"]
+
+
+def resumir(registro):
+    formas = {}
+    for consulta in registro.consultas:
+        forma = normalizar_sql(consulta.sql)
+        dados = formas.get((consulta.banco, forma))
+        if dados is None:
+            dados = formas[(consulta.banco, forma)] = {
+                'sql': forma, 'banco': os.path.basename(consulta.banco),
+                'exemplo': (consulta.sql, consulta.parametros), 'vezes': 0, 'tempo_ms': 0.0, 'max_ms': 0.0, 'linhas': 0,
+            }
+        ms = consulta.tempo * 1000
+        dados['vezes'] += 1
+        dados['tempo_ms'] += ms
+        dados['linhas'] += consulta.linhas
+        if ms > dados['max_ms']:
+            dados['max_ms'] = ms
+            dados['exemplo'] = (consulta.sql, consulta.parametros)
+
+    lentas = []
+    for (banco, _), dados in formas.items():
+        dados['tempo_ms'] = round(dados['tempo_ms'], 2)
+        dados['max_ms'] = round(dados['max_ms'], 2)
+        dados['n_mais_1'] = dados['vezes'] >= LIMITE_N_MAIS_1
+        sql, parametros = dados['exemplo']
+        if dados['max_ms'] >= LIMITE_LENTA_MS and sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            lentas.append({'sql': dados['sql'], 'banco': dados['banco'], 'max_ms': dados['max_ms'],
+                           'plano': _plano(banco, sql, parametros)})
+
+    por_forma = sorted(formas.values(), key=lambda d: d['tempo_ms'], reverse=True)
+    for dados in por_forma:
+        dados.pop('exemplo')
+    return {
+        'requisicao': registro.descricao,
+        'em': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'duracao_ms': round((time.perf_counter() - registro.inicio) * 1000, 2),
+        'consultas': len(registro.consultas) + registro.descartadas,
+        'tempo_sql_ms': round(sum(d['tempo_ms'] for d in por_forma), 2),
+        'n_mais_1': [d for d in por_forma if d['n_mais_1']],
+        'lentas': lentas,
+        'por_forma': por_forma,
+    }
+
+
+def cabecalho(resumo):
+    """Valor do cabeçalho X-SQL-Consultas."""
+    return (f"{resumo['consultas']} consultas; {resumo['tempo_sql_ms']}ms; "
+            f"n+1={len(resumo['n_mais_1'])}; lentas={len(resumo['lentas'])}")
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """Cursor que registra tempo e linhas de cada instrução na requisição em andamento."""
+
+    _consulta = None
+
+    def _banco(self):
+        chave = getattr(self.connection, '_chave', None)
+        return chave[0] if chave else ''
+
+    def _registrar(self, funcao, sql, parametros, *args):
+        registro = _registro_atual()
+        if registro is None:
+            self._consulta = None
+            return funcao(sql, *args)
+        inicio = time.perf_counter()
+        try:
+            return funcao(sql, *args)
+        finally:
+            self._consulta = registro.adicionar(sql, parametros, self._banco(), time.perf_counter() - inicio,
+                                                max(self.rowcount, 0))
+
+    def execute(self, sql, *args):
+        # Parâmetros guardados para o EXPLAIN QUERY PLAN das consultas lentas
+        return self._registrar(super().execute, sql, args[0] if args else (), *args)
+
+    def executemany(self, sql, *args):
+        # Os parâmetros podem ser um iterador já consumido; executemany não é SELECT, não recebe plano
+        return self._registrar(super().executemany, sql, (), *args)
+
+    def executescript(self, sql):
+        return self._registrar(super().executescript, sql, ())
+
+    def _buscar(self, funcao, *args):
+        consulta = self._consulta
+        if consulta is None:
+            return funcao(*args)
+        inicio = time.perf_counter()
+        try:
+            resultado = funcao(*args)
+        finally:
+            consulta.tempo += time.perf_counter() - inicio
+        return resultado
+
+    def fetchone(self):
+        linha = self._buscar(super().fetchone)
+        if linha is not None and self._consulta is not None:
+            self._consulta.linhas += 1
+        return linha
+
+    def fetchmany(self, *args):
+        linhas = self._buscar(super().fetchmany, *args)
+        if self._consulta is not None:
+            self._consulta.linhas += len(linhas)
+        return linhas
+
+    def fetchall(self):
+        linhas = self._buscar(super().fetchall)
+        if self._consulta is not None:
+            self._consulta.linhas += len(linhas)
+        return linhas
+
+    def __next__(self):
+        linha = self._buscar(super().__next__)
+        if self._consulta is not None:
+            self._consulta.linhas += 1
+        return linha
@@ -0,0 +1,179 @@
+"""
+Motor de KPIs do resumo executivo.
+
+A página /resumo fazia uma consulta de agregação por card (receita realizada,
+total a receber, pendentes, vencidas, a pagar, top clientes, mês anterior,
+ticket médio, fluxo dos próximos meses). Aqui cada tabela de resumo é lida
+uma única vez: um CTE restringe o intervalo e a agregação condicional
+(SUM(CASE ...)) calcula todos os cards de uma vez.
+"""
+
+from dataclasses import dataclass, field
+
+from .database import intervalo_mes_key
+
+
+@dataclass
+class KPIsReceber:
+    """Contas a receber dos 19 clientes principais no mês."""
+    realizada: float = 0.0
+    count_realizada: int = 0
+    total_a_receber: float = 0.0
+    pendente: float = 0.0
+    count_pendente: int = 0
+    vencidas: float = 0.0
+    count_vencidas: int = 0
+    realizada_mes_anterior: float = 0.0
+    top_clientes: list = field(default_factory=list)
+
+
+@dataclass
+class KPIsPagar:
+    """Contas a pagar do mês (sem REIS TRANSPORTES)."""
+    total: float = 0.0
+    pendente: float = 0.0
+    count_pendente: int = 0
+    vencidas: float = 0.0
+    count_vencidas: int = 0
+
+
+@dataclass
+class KPIsMes:
+    """Todos os números do resumo executivo de um mês."""
+    mes: int
+    ano: int
+    receber: KPIsReceber
+    pagar: KPIsPagar
+    meta: float = 0.0
+    # [(mes, ano, projecao, a_pagar)] dos meses seguintes
+    meses_seguintes: list = field(default_factory=list)
+
+
+def _deslocar_mes(mes, ano, delta):
+    """Retorna (mes, ano) deslocado de delta meses."""
+    total = ano * 12 + (mes - 1) + delta
+    return total % 12 + 1, total // 12
+
+
+def _kpis_receber(cur, venc_ini, venc_fim, ant_ini, ant_fim, hoje_key, limite_top):
+    """Uma leitura de resumo_receber_diario (mês anterior + mês atual), agrupada por cliente."""
+    cur.execute("""
+        WITH receber AS (
+            SELECT cliente, venc_key, UPPER(status) AS status, conta_contabil_lsp, valor_total, qtd
+            FROM resumo_receber_diario
+            WHERE venc_key BETWEEN ? AND ?
+            AND principal_id IS NOT NULL
+        )
+        SELECT
+            cliente,
+            SUM(CASE WHEN mes_atual AND lsp THEN qtd ELSE 0 END),
+            COALESCE(SUM(CASE WHEN mes_atual AND lsp THEN valor_total END), 0.0),
+            COALESCE(SUM(CASE WHEN mes_atual AND lsp AND status = 'RECEBIDO' THEN valor_total END), 0.0),
+            COALESCE(SUM(CASE WHEN mes_atual AND lsp AND status = 'RECEBIDO' THEN qtd END), 0),
+            COALESCE(SUM(CASE WHEN mes_atual AND lsp AND status = 'PENDENTE' THEN valor_total END), 0.0),
+            COALESCE(SUM(CASE WHEN mes_atual AND lsp AND status = 'PENDENTE' THEN qtd END), 0),
+            COALESCE(SUM(CASE WHEN mes_atual AND status = 'PENDENTE' AND venc_key < ? THEN valor_total END), 0.0),
+            COALESCE(SUM(CASE WHEN mes_atual AND status = 'PENDENTE' AND venc_key < ? THEN qtd END), 0),
+            COALESCE(SUM(CASE WHEN NOT mes_atual AND lsp AND status = 'RECEBIDO' THEN valor_total END), 0.0)
+        FROM (
+            SELECT receber.*, (venc_key >= ?) AS mes_atual, (conta_contabil_lsp = 0) AS lsp
+            FROM receber
+        )
+        GROUP BY cliente
+    """, (min(ant_ini, venc_ini), max(ant_fim, venc_fim), hoje_key, hoje_key, venc_ini))
+
+    kpis = KPIsReceber()
+    clientes = []
+    for (cliente, qtd_mes, total, realizada, count_realizada, pendente, count_pendente,
+         vencidas, count_vencidas, anterior) in cur.fetchall():
+        kpis.total_a_receber += total
+        kpis.realizada += realizada
+        kpis.count_realizada += count_realizada
+        kpis.pendente += pendente
+        kpis.count_pendente += count_pendente
+        kpis.vencidas += vencidas
+        kpis.count_vencidas += count_vencidas
+        kpis.realizada_mes_anterior += anterior
+        if qtd_mes:
+            clientes.append((cliente, total, realizada, pendente))
+
+    # Top clientes do mês por valor total (recebido + pendente + demais status)
+    clientes.sort(key=lambda c: c[1], reverse=True)
+    kpis.top_clientes = clientes[:limite_top]
+    return kpis
+
+
+def _kpis_pagar(cur, mes, ano, hoje_key, meses_seguintes):
+    """
+    Uma leitura de resumo_pagar_diario do mês atual até o último mês projetado,
+    agrupada por mês (venc_key / 100 = yyyymm).
+    """
+    venc_ini, _ = intervalo_mes_key(mes, ano)
+    ultimo_mes, ultimo_ano = _deslocar_mes(mes, ano, meses_seguintes)
+    _, fim_periodo = intervalo_mes_key(ultimo_mes, ultimo_ano)
+
+    cur.execute("""
+        WITH pagar AS (
+            SELECT venc_key, status, valor_total, qtd
+            FROM resumo_pagar_diario
+            WHERE venc_key BETWEEN ? AND ?
+            AND fornecedor != 'REIS TRANSPORTES'
+        )
+        SELECT
+            venc_key / 100 AS ano_mes,
+            COALESCE(SUM(valor_total), 0.0),
+            COALESCE(SUM(CASE WHEN status != 'PAGO' AND status != 'Pago' THEN valor_total END), 0.0),
+            COALESCE(SUM(CASE WHEN status != 'PAGO' AND status != 'Pago' THEN qtd END), 0),
+            COALESCE(SUM(CASE WHEN status != 'PAGO' AND status != 'Pago' AND venc_key < ? THEN valor_total END), 0.0),
+            COALESCE(SUM(CASE WHEN status != 'PAGO' AND status != 'Pago' AND venc_key < ? THEN qtd END), 0)
+        FROM pagar
+        GROUP BY ano_mes
+    """, (venc_ini, fim_periodo, hoje_key, hoje_key))
+
+    por_mes = {}
+    kpis = KPIsPagar()
+    for ano_mes, total, pendente, count_pendente, vencidas, count_vencidas in cur.fetchall():
+        por_mes[ano_mes] = total
+        if ano_mes == ano * 100 + mes:
+            kpis = KPIsPagar(total, pendente, count_pendente, vencidas, count_vencidas)
+    return kpis, por_mes
+
+
+def _projecao_por_mes(cur, mes, ano, meses_seguintes):
+    """Meta da projeção de cada mês do período, numa leitura de resumo_projecao_mensal."""
+    ultimo_mes, ultimo_ano = _deslocar_mes(mes, ano, meses_seguintes)
+    cur.execute("""
+        SELECT ano * 100 + mes AS ano_mes, COALESCE(SUM(valor_total), 0.0)
+        FROM resumo_projecao_mensal
+        WHERE ano * 100 + mes BETWEEN ? AND ?
+        GROUP BY ano_mes
+    """, (ano * 100 + mes, ultimo_ano * 100 + ultimo_mes))
+    return dict(cur.fetchall())
+
+
+def calcular_kpis_mes(cur, mes, ano, hoje_key, meses_seguintes=3, limite_top=5):
+    """
+    Calcula os KPIs do resumo executivo para mes/ano.
+    São três leituras (receber, pagar, projeção), cada uma com agregação condicional.
+    """
+    venc_ini, venc_fim = intervalo_mes_key(mes, ano)
+    ant_ini, ant_fim = intervalo_mes_key(*_deslocar_mes(mes, ano, -1))
+
+    receber = _kpis_receber(cur, venc_ini, venc_fim, ant_ini, ant_fim, hoje_key, limite_top)
+    pagar, pagar_por_mes = _kpis_pagar(cur, mes, ano, hoje_key, meses_seguintes)
+    projecao_por_mes = _projecao_por_mes(cur, mes, ano, meses_seguintes)
+
+    kpis = KPIsMes(
+        mes=mes,
+        ano=ano,
+        receber=receber,
+        pagar=pagar,
+        meta=projecao_por_mes.get(ano * 100 + mes, 0.0),
+    )
+    for i in range(1, meses_seguintes + 1):
+        mes_proj, ano_proj = _deslocar_mes(mes, ano, i)
+        chave = ano_proj * 100 + mes_proj
+        kpis.meses_seguintes.append(
+            (mes_proj, ano_proj, projecao_por_mes.get(chave, 0.0), pagar_por_mes.get(chave, 0.0))
+        )
+    return kpis
@@ -7,7 +7,10 @@ import json
 import sqlite3
 import os
 
-# Lock global para sincronizar acesso ao banco de dados
+from .veiculo_helper import VeiculoHelper
+
+# Lock para serializar as escritas deste módulo no banco. Leituras não o usam:
+# em WAL leitores rodam em paralelo entre si e com o escritor
 db_lock = threading.Lock()
 
 bp = Blueprint('logistica', __name__, url_prefix='/logistica')
@@ -126,51 +129,52 @@ def carregar_ultimo_mapa_calor():
     """Carrega o último upload do mapa de calor"""
     conn = None
     try:
-        with db_lock:  # Usar lock para evitar conflitos
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Buscar último upload ativo
-            cursor.execute('''
-                SELECT id, nome_arquivo, data_upload, total_locais
-                FROM mapa_calor_uploads
-                WHERE ativo = 1
-                ORDER BY data_upload DESC
-                LIMIT 1
-            ''')
-            
-            upload = cursor.fetchone()
-            
-            if not upload:
-                return None
-            
-            upload_id = upload[0]
-            
-            # Buscar dados do upload
-            cursor.execute('''
-                SELECT cidade, latitude, longitude, valor, peso
-                FROM mapa_calor_dados
-                WHERE upload_id = ?
-            ''', (upload_id,))
-            
-            dados = []
-            for row in cursor.fetchall():
-                dados.append({
-                    'cidade': row[0],
-                    'lat': row[1],
-                    'lng': row[2],
-                    'valor': row[3],
-                    'peso': row[4] if len(row) > 4 else 0  # Compatibilidade com dados antigos
-                })
-            
-            return {
-                'upload_id': upload_id,
-                'nome_arquivo': upload[1],
-                'data_upload': upload[2],
-                'total_locais': upload[3],
-                'dados': dados
-            }
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        # Leitura sem db_lock; a transação de leitura garante o mesmo snapshot nas duas consultas
+        cursor.execute('BEGIN')
+        
+        # Buscar último upload ativo
+        cursor.execute('''
+            SELECT id, nome_arquivo, data_upload, total_locais
+            FROM mapa_calor_uploads
+            WHERE ativo = 1
+            ORDER BY data_upload DESC
+            LIMIT 1
+        ''')
+        
+        upload = cursor.fetchone()
+        
+        if not upload:
+            return None
+        
+        upload_id = upload[0]
+        
+        # Buscar dados do upload
+        cursor.execute('''
+            SELECT cidade, latitude, longitude, valor, peso
+            FROM mapa_calor_dados
+            WHERE upload_id = ?
+        ''', (upload_id,))
+        
+        dados = []
+        for row in cursor.fetchall():
+            dados.append({
+                'cidade': row[0],
+                'lat': row[1],
+                'lng': row[2],
+                'valor': row[3],
+                'peso': row[4] if len(row) > 4 else 0  # Compatibilidade com dados antigos
+            })
         
+        return {
+            'upload_id': upload_id,
+            'nome_arquivo': upload[1],
+            'data_upload': upload[2],
+            'total_locais': upload[3],
+            'dados': dados
+        }
+    
     except Exception as e:
         print(f"❌ Erro ao carregar último mapa de calor: {e}")
         return None
@@ -182,29 +186,28 @@ def get_veiculo_info(placa):
     """Busca informações completas do veículo no banco de dados local"""
     conn = None
     try:
-        with db_lock:  # Usar lock para evitar conflitos
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Buscar tipologia e perfil (status) da placa na tabela veiculos_suporte
-            cursor.execute('''
-                SELECT tipologia, status FROM veiculos_suporte 
-                WHERE placa = ? AND ativo = 1
-            ''', (placa,))
-            
-            resultado = cursor.fetchone()
-            
-            if resultado:
-                return {
-                    'tipologia': resultado[0],
-                    'perfil': resultado[1]
-                }
-            else:
-                return {
-                    'tipologia': None,
-                    'perfil': None
-                }
-            
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        # Buscar tipologia e perfil (status) da placa na tabela veiculos_suporte
+        cursor.execute('''
+            SELECT tipologia, status FROM veiculos_suporte 
+            WHERE placa = ? AND ativo = 1
+        ''', (placa,))
+        
+        resultado = cursor.fetchone()
+        
+        if resultado:
+            return {
+                'tipologia': resultado[0],
+                'perfil': resultado[1]
+            }
+        else:
+            return {
+                'tipologia': None,
+                'perfil': None
+            }
+        
     except Exception as e:
         print(f"❌ Erro ao buscar informações da placa {placa}: {e}")
         return {
@@ -215,18 +218,25 @@ def get_veiculo_info(placa):
         if conn:
             conn.close()
 
+def _placa_valida(placa):
+    return placa and placa != 'N/A' and placa != '' and placa != 'None'
+
 def enrich_data_with_tipologia(data):
     """Enriquece os dados da planilha com tipologia e perfil do banco local"""
     encontrados = 0
     total_processados = 0
     
-    for item in data:
-        placa = item.get('Placa', '').strip()
+    # Todas as placas numa única consulta (antes era uma consulta por linha da planilha)
+    placas = [item.get('Placa', '').strip() for item in data]
+    veiculos = VeiculoHelper.buscar_placas_com_custo([p for p in placas if _placa_valida(p)])
+    
+    for item, placa in zip(data, placas):
         total_processados += 1
         
-        if placa and placa != 'N/A' and placa != '' and placa != 'None':
-            # Buscar informações completas do veículo
-            veiculo_info = get_veiculo_info(placa)
+        if _placa_valida(placa):
+            # Informações completas do veículo
+            veiculo = veiculos.get(placa.upper(), {})
+            veiculo_info = {'tipologia': veiculo.get('tipologia'), 'perfil': veiculo.get('status')}
             
             # Debug para primeira placa
             if total_processados == 1:
@@ -1,6 +1,16 @@
 from flask import Flask, render_template, redirect, url_for, request, session, flash, jsonify, send_from_directory
-from .database import init_db, get_connection
-from .importacao import importar_arquivo
+from .database import init_db, get_connection, data_key, intervalo_mes_key, garantir_chaves_data, DB_PATH
+from .fila_importacao import FilaCheiaError, enfileirar_importacao, garantir_tabela_jobs, listar_jobs, obter_job
+from .agregados import preparar_resumos
+from .cache_resultados import cache_por_versao, invalidar_cache
+from .kpis import calcular_kpis_mes
+from .gravacao_projecao import CLIENTES_PROJECAO, garantir_chave_projecao, gravar_projecao
+from .calendario import semanas_do_padrao, semanas_dos_meses, garantir_calendario_semanas
+from .db_managers.migrate import migrar_valores_centavos
+from .migracoes import aplicar_migracoes, avisar_planos_sem_indice
+from .snapshot_analitico import agendar_snapshot, get_connection_analitica
+from .pool_conexoes import liberar_conexoes_da_thread
+from . import instrumentacao_sql
 import bcrypt
 import os
 from datetime import datetime, timedelta
@@ -8,6 +18,26 @@ from datetime import datetime, timedelta
 app = Flask(__name__)
 app.secret_key = "frz-secret"  # chave de sessão
 
+# Conexões SQLite do pool da thread que ficaram abertas voltam ao pool ao fim de cada requisição
+app.teardown_appcontext(liberar_conexoes_da_thread)
+
+
+# Instrumentação SQL opcional (FINANCEIRO_DEBUG_SQL=1): consultas da requisição, N+1 e planos das lentas
+@app.before_request
+def _iniciar_instrumentacao_sql():
+    instrumentacao_sql.iniciar_registro(f"{request.method} {request.full_path.rstrip('?')}")
+
+
+@app.after_request
+def _encerrar_instrumentacao_sql(response):
+    resumo = instrumentacao_sql.encerrar_registro()
+    if resumo is not None:
+        response.headers['X-SQL-Consultas'] = instrumentacao_sql.cabecalho(resumo)
+        if resumo['n_mais_1']:
+            print(f"🐢 {resumo['requisicao']}: {len(resumo['n_mais_1'])} consulta(s) repetida(s) (N+1) "
+                  f"em {resumo['consultas']} consultas")
+    return response
+
 # Função para formatação brasileira de valores
 def format_currency(value):
     """Formata valores para padrão brasileiro: 1.234.567,89"""
@@ -46,27 +76,6 @@ def format_currency_no_decimal(value):
 app.jinja_env.filters['currency'] = format_currency
 app.jinja_env.filters['currency_no_decimal'] = format_currency_no_decimal
 
-# Função inteligente para normalizar nomes de clientes
-def normalizar_nome_cliente(nome):
-    """Normaliza nomes removendo acentos, espaços extras e padronizando maiúsculas"""
-    import unicodedata
-    
-    if not nome:
-        return ""
-    
-    # Remove acentos
-    nome = unicodedata.normalize('NFD', nome)
-    nome = ''.join(char for char in nome if unicodedata.category(char) != 'Mn')
-    
-    # Converte para maiúsculo e remove espaços extras
-    nome = nome.upper().strip()
-    
-    # Remove espaços duplos
-    while '  ' in nome:
-        nome = nome.replace('  ', ' ')
-    
-    return nome
-
 # Filtro global para excluir LSP Transportes
 def adicionar_filtro_lsp(query, where_exists=False):
     """Adiciona o filtro global para excluir conta_contabil = 'LSP Transportes' nas consultas"""
@@ -77,67 +86,6 @@ def adicionar_filtro_lsp(query, where_exists=False):
     else:
         return f"{query} WHERE {filtro}"
 
-# Lista dos 19 clientes principais (normalizados)
-CLIENTES_19_PRINCIPAIS = [
-    'ADORO', 'ADORO S.A.', 'ADORO SAO CARLOS', 'AGRA FOODS', 'ALIBEM', 'FRIBOI',
-    'GOLDPAO CD SAO JOSE DOS CAMPOS', 'GTFOODS BARUERI', 'JK DISTRIBUIDORA', 
-    'LATICINIO CARMONA', 'MARFRIG - ITUPEVA CD', 'MARFRIG - PROMISSAO', 
-    'MARFRIG GLOBAL FOODS S A', 'MINERVA S A', 'PAMPLONA JANDIRA', 
-    'PEIXES MEGGS PESCADOS LTDA - SJBV', 'SANTA LUCIA', 'SAUDALI', 'VALENCIO JATAI'
-]
-
-def eh_cliente_principal(nome_cliente):
-    """Verifica se um cliente está na lista dos 19 principais usando normalização inteligente"""
-    nome_normalizado = normalizar_nome_cliente(nome_cliente)
-    
-    # Verifica contra cada cliente da lista principal
-    for cliente_principal in CLIENTES_19_PRINCIPAIS:
-        cliente_principal_normalizado = normalizar_nome_cliente(cliente_principal)
-        
-        # Verifica match exato
-        if nome_normalizado == cliente_principal_normalizado:
-            return True
-            
-        # Verifica match parcial para casos como "GTFOODS BARUERI " (com espaço)
-        if cliente_principal_normalizado in nome_normalizado or nome_normalizado in cliente_principal_normalizado:
-            # Só aceita se a diferença for apenas espaços
-            if abs(len(nome_normalizado) - len(cliente_principal_normalizado)) <= 2:
-                return True
-    
-    return False
-
-def filtrar_clientes_principais(cursor, tabela, condicoes_extras=""):
-    """
-    Retorna lista de clientes principais da tabela com suas variações reais do banco
-    """
-    # Busca todos os clientes únicos da tabela
-    query = f"SELECT DISTINCT cliente FROM {tabela} {condicoes_extras}"
-    cursor.execute(query)
-    todos_clientes = [row[0] for row in cursor.fetchall() if row[0]]
-    
-    # Filtra apenas os que são clientes principais
-    clientes_filtrados = []
-    for cliente in todos_clientes:
-        if eh_cliente_principal(cliente):
-            clientes_filtrados.append(cliente)
-    
-    return clientes_filtrados
-
-def criar_condicao_clientes_principais(cursor, tabela, condicoes_extras=""):
-    """
-    Cria condição SQL para filtrar apenas os 19 clientes principais
-    """
-    clientes_reais = filtrar_clientes_principais(cursor, tabela, condicoes_extras)
-    
-    if not clientes_reais:
-        return "1=0", []  # Nenhum cliente encontrado
-    
-    # Cria placeholders
-    placeholders = ','.join(['?' for _ in clientes_reais])
-    condicao = f"cliente IN ({placeholders})"
-    
-    return condicao, clientes_reais
-
 # --- helper: login required decorator (DESATIVADO) ---
 from functools import wraps
 def login_required(f):
@@ -201,6 +149,35 @@ except Exception:
 # Inicializa banco de dados somente quando executado como script
 # (não executar no import para evitar apagar dados durante testes/imports)
 
+def preparar_banco():
+    """
+    Ao iniciar o servidor (__main__ e run_app.py), nunca no import: garante as estruturas
+    derivadas não destrutivas (chaves de data, centavos, resumos dos dashboards, índices)
+    para bancos criados antes delas existirem, agenda o snapshot analítico e prepara a
+    fila de importação.
+    """
+    try:
+        if os.path.exists(DB_PATH):
+            conn = get_connection()
+            garantir_chaves_data(conn)
+            migrar_valores_centavos(conn)
+            garantir_chave_projecao(conn)
+            garantir_calendario_semanas(conn)
+            preparar_resumos(conn)
+            if aplicar_migracoes(conn):
+                avisar_planos_sem_indice(conn)
+            conn.close()
+            # Snapshot dos dashboards refeito a cada início (o banco pode ter mudado fora do app)
+            agendar_snapshot()
+    except Exception as e:
+        print(f"⚠️ Não foi possível preparar chaves de data/resumos: {e}")
+
+    # Histórico de jobs de importação (e jobs interrompidos por reinício do servidor)
+    try:
+        garantir_tabela_jobs()
+    except Exception as e:
+        print(f"⚠️ Não foi possível preparar a fila de importação: {e}")
+
 # ============================
 # FUNÇÕES AUXILIARES
 # ============================
@@ -337,9 +314,33 @@ def api_dados_executivo():
     tipo = request.args.get('tipo')  # 'receita', 'despesa', 'resultado'
     mes = request.args.get('mes', type=int)
     ano = request.args.get('ano', type=int)
+    # Modo período: de=YYYY-MM&ate=YYYY-MM devolve 'periodos', um item por mês com os campos do modo mensal
+    de = request.args.get('de')
+    ate = request.args.get('ate')
+    
+    if de or ate:
+        if not tipo:
+            return jsonify({"erro": "Parâmetros obrigatórios: tipo, de, ate"}), 400
+        try:
+            meses = meses_do_periodo(de, ate)
+        except ValueError as e:
+            return jsonify({"erro": str(e)}), 400
+        
+        try:
+            if tipo == 'receita':
+                dados = buscar_receitas_periodo(meses)
+            elif tipo == 'despesa':
+                dados = buscar_despesas_periodo(meses)
+            elif tipo == 'resultado':
+                dados = buscar_resultado_periodo(meses)
+            else:
+                return jsonify({"erro": "Tipo inválido. Use: receita, despesa ou resultado"}), 400
+            return jsonify(dados)
+        except Exception as e:
+            return jsonify({"erro": str(e)}), 500
     
     if not all([tipo, mes, ano]):
-        return jsonify({"erro": "Parâmetros obrigatórios: tipo, mes, ano"}), 400
+        return jsonify({"erro": "Parâmetros obrigatórios: tipo, mes, ano (ou tipo, de, ate)"}), 400
     
     try:        
         if tipo == 'receita':
@@ -347,58 +348,8 @@ def api_dados_executivo():
         elif tipo == 'despesa':
             dados = buscar_despesas_por_cliente(mes, ano)
         elif tipo == 'resultado':
-            # Para resultado, usar os mesmos dados do dashboard
-            dados_dashboard = build_dados_frz_log(mes, ano)
-            totais_atual = dados_dashboard['dados_criticos']['totais_mes']
-            
-            # Buscar dados dos 2 meses anteriores para comparação
-            periodos_data = []
-            
-            for i in range(3):  # 3 meses: atual + 2 anteriores
-                mes_calc = mes - i
-                ano_calc = ano
-                
-                if mes_calc <= 0:
-                    mes_calc += 12
-                    ano_calc -= 1
-                
-                if i == 0:
-                    # Mês atual - usar dados já calculados
-                    periodo_dados = {
-                        'periodo': f"{mes_calc:02d}/{ano_calc} (Atual)",
-                        'receitas': totais_atual['receita_realizada'],
-                        'despesas': totais_atual['despesa_realizada'], 
-                        'resultado': totais_atual['resultado_realizado'],
-                        'variacao_percentual': 0
-                    }
-                else:
-                    # Meses anteriores - calcular usando a mesma função
-                    dados_anterior = build_dados_frz_log(mes_calc, ano_calc)
-                    totais_anterior = dados_anterior['dados_criticos']['totais_mes']
-                    
-                    periodo_dados = {
-                        'periodo': f"{mes_calc:02d}/{ano_calc}",
-                        'receitas': totais_anterior['receita_realizada'],
-                        'despesas': totais_anterior['despesa_realizada'],
-                        'resultado': totais_anterior['resultado_realizado'],
-                        'variacao_percentual': 0
-                    }
-                
-                periodos_data.append(periodo_dados)
-            
-            # Calcular variações percentuais
-            for i in range(1, len(periodos_data)):
-                resultado_atual = periodos_data[i-1]['resultado']
-                resultado_anterior = periodos_data[i]['resultado']
-                
-                if resultado_anterior != 0:
-                    variacao = ((resultado_atual - resultado_anterior) / abs(resultado_anterior)) * 100
-                else:
-                    variacao = 100 if resultado_atual > 0 else -100
-                    
-                periodos_data[i-1]['variacao_percentual'] = variacao
-            
-            dados = {'periodos': periodos_data}
+            # Mesma lógica do dashboard (build_dados_frz_log), servida pelo cache versionado
+            dados = buscar_resultado_comparativo(mes, ano)
         else:
             return jsonify({"erro": "Tipo inválido. Use: receita, despesa ou resultado"}), 400
             
@@ -407,30 +358,60 @@ def api_dados_executivo():
         return jsonify({"erro": str(e)}), 500
 
 
+# Lista dos 19 clientes FRZ (planejamento e APIs executivas)
+CLIENTES_FRZ = [
+    'ADORO', 'ADORO S.A.', 'ADORO SAO CARLOS', 'AGRA FOODS', 'ALIBEM', 'FRIBOI',
+    'GOLDPAO CD SAO JOSE DOS CAMPOS', 'GTFOODS BARUERI', 'JK DISTRIBUIDORA', 
+    'LATICINIO CARMONA', 'MARFRIG - ITUPEVA CD', 'MARFRIG - PROMISSAO', 
+    'MARFRIG GLOBAL FOODS S A', 'MINERVA S A', 'PAMPLONA JANDIRA', 
+    'PEIXES MEGGOS PESCADOS LTDA - SJBV', 'SANTA LUCIA', 'SAUDALI', 'VALENCIO JATAÍ'
+]
+
+# Limite de meses aceitos no modo período das APIs
+MAX_MESES_PERIODO = 36
+
+
+def meses_do_periodo(de, ate):
+    """
+    Converte de/ate no formato YYYY-MM na tupla ((mes, ano), ...) de todos os meses do período.
+    Levanta ValueError para formato inválido, período invertido ou longo demais.
+    """
+    try:
+        ano_ini, mes_ini = (int(p) for p in str(de).split('-'))
+        ano_fim, mes_fim = (int(p) for p in str(ate).split('-'))
+    except (ValueError, TypeError):
+        raise ValueError("Parâmetros de/ate devem estar no formato YYYY-MM")
+    if not (1 <= mes_ini <= 12 and 1 <= mes_fim <= 12):
+        raise ValueError("Mês inválido em de/ate")
+
+    inicio = ano_ini * 12 + mes_ini - 1
+    fim = ano_fim * 12 + mes_fim - 1
+    if fim < inicio:
+        raise ValueError("'de' deve ser anterior ou igual a 'ate'")
+    if fim - inicio + 1 > MAX_MESES_PERIODO:
+        raise ValueError(f"Período máximo de {MAX_MESES_PERIODO} meses")
+
+    return tuple((i % 12 + 1, i // 12) for i in range(inicio, fim + 1))
+
+
+@cache_por_versao()
 def buscar_receitas_por_cliente(mes, ano):
     """Busca receitas detalhadas por cliente no mês/ano especificado."""
-    conn = get_connection()
+    conn = get_connection_analitica()
     
-    # Lista dos 19 clientes FRZ
-    clientes_frz = [
-        'ADORO', 'ADORO S.A.', 'ADORO SAO CARLOS', 'AGRA FOODS', 'ALIBEM', 'FRIBOI',
-        'GOLDPAO CD SAO JOSE DOS CAMPOS', 'GTFOODS BARUERI', 'JK DISTRIBUIDORA', 
-        'LATICINIO CARMONA', 'MARFRIG - ITUPEVA CD', 'MARFRIG - PROMISSAO', 
-        'MARFRIG GLOBAL FOODS S A', 'MINERVA S A', 'PAMPLONA JANDIRA', 
-        'PEIXES MEGGOS PESCADOS LTDA - SJBV', 'SANTA LUCIA', 'SAUDALI', 'VALENCIO JATAÍ'
-    ]
+    clientes_frz = CLIENTES_FRZ
     
     query = """
-    SELECT cliente, SUM(valor_principal) as total_receita
+    SELECT cliente, SUM(valor_principal_centavos) / 100.0 as total_receita
     FROM contas_receber 
-    WHERE competencia = ?
+    WHERE competencia_key = ?
       AND status = 'Recebido'
       AND cliente IN ({})
     GROUP BY cliente
     ORDER BY total_receita DESC
     """.format(','.join(['?'] * len(clientes_frz)))
     
-    params = [f"{mes}/{ano}"] + clientes_frz
+    params = [ano * 100 + mes] + clientes_frz
     resultado = conn.execute(query, params).fetchall()
     conn.close()
     
@@ -451,20 +432,21 @@ def buscar_receitas_por_cliente(mes, ano):
     }
 
 
+@cache_por_versao()
 def buscar_despesas_por_cliente(mes, ano):
     """Busca despesas detalhadas por fornecedor no mês/ano especificado."""
-    conn = get_connection()
+    conn = get_connection_analitica()
     
     # Buscar TODOS os registros individuais (incluindo pendentes) EXCLUINDO REIS TRANSPORTES
     query = """
     SELECT fornecedor, conta_contabil, valor_principal, status
     FROM contas_pagar 
-    WHERE competencia = ?
+    WHERE competencia_key = ?
       AND fornecedor != 'REIS TRANSPORTES'
     ORDER BY valor_principal DESC
     """
     
-    params = [f"{mes}/{ano}"]
+    params = [ano * 100 + mes]
     resultado = conn.execute(query, params).fetchall()
     conn.close()
     
@@ -487,12 +469,87 @@ def buscar_despesas_por_cliente(mes, ano):
     }
 
 
+@cache_por_versao()
+def buscar_receitas_periodo(meses):
+    """Receitas por cliente de cada mês do período, numa única consulta agrupada por competência."""
+    chaves = [ano * 100 + mes for mes, ano in meses]
+    conn = get_connection_analitica()
+    
+    query = """
+    SELECT competencia_key, cliente, SUM(valor_principal_centavos) / 100.0 as total_receita
+    FROM contas_receber 
+    WHERE competencia_key BETWEEN ? AND ?
+      AND status = 'Recebido'
+      AND cliente IN ({})
+    GROUP BY competencia_key, cliente
+    ORDER BY competencia_key, total_receita DESC
+    """.format(','.join(['?'] * len(CLIENTES_FRZ)))
+    
+    resultado = conn.execute(query, [min(chaves), max(chaves)] + CLIENTES_FRZ).fetchall()
+    conn.close()
+    
+    periodos = {chave: {'mes': mes, 'ano': ano, 'clientes': [], 'total': 0}
+                for chave, (mes, ano) in zip(chaves, meses)}
+    for row in resultado:
+        periodo = periodos[row['competencia_key']]
+        valor = float(row['total_receita'])
+        periodo['clientes'].append({'nome': row['cliente'], 'valor': valor})
+        periodo['total'] += valor
+    
+    return {
+        'periodos': list(periodos.values()),
+        'total': sum(p['total'] for p in periodos.values())
+    }
+
+
+@cache_por_versao()
+def buscar_despesas_periodo(meses):
+    """
+    Despesas de cada mês do período (sem REIS TRANSPORTES), numa única consulta. Cada mês traz
+    os mesmos lançamentos individuais de buscar_despesas_por_cliente (fornecedor, conta_contabil,
+    valor, status) em 'despesas'.
+    """
+    chaves = [ano * 100 + mes for mes, ano in meses]
+    conn = get_connection_analitica()
+    
+    query = """
+    SELECT competencia_key, fornecedor, conta_contabil, valor_principal, status
+    FROM contas_pagar 
+    WHERE competencia_key BETWEEN ? AND ?
+      AND fornecedor != 'REIS TRANSPORTES'
+    ORDER BY competencia_key, valor_principal DESC
+    """
+    
+    resultado = conn.execute(query, (min(chaves), max(chaves))).fetchall()
+    conn.close()
+    
+    periodos = {chave: {'mes': mes, 'ano': ano, 'despesas': [], 'total': 0}
+                for chave, (mes, ano) in zip(chaves, meses)}
+    for row in resultado:
+        periodo = periodos[row['competencia_key']]
+        valor = float(row['valor_principal'])
+        periodo['despesas'].append({
+            'fornecedor': row['fornecedor'],
+            'conta_contabil': row['conta_contabil'],
+            'valor': valor,
+            'status': row['status']
+        })
+        periodo['total'] += valor
+    
+    return {
+        'periodos': list(periodos.values()),
+        'total': sum(p['total'] for p in periodos.values())
+    }
+
+
+@cache_por_versao()
 def buscar_resultado_comparativo(mes, ano):
     """Busca dados comparativos de resultado para análise mensal usando a mesma lógica do dashboard."""
     
     periodos_data = []
     
-    # Buscar dados dos últimos 3 meses usando a mesma função do dashboard
+    # Últimos 3 meses (atual primeiro), calculados juntos com a mesma lógica do dashboard
+    meses = []
     for i in range(3):
         mes_atual = mes - i
         ano_atual = ano
@@ -500,9 +557,11 @@ def buscar_resultado_comparativo(mes, ano):
         if mes_atual <= 0:
             mes_atual += 12
             ano_atual -= 1
-        
-        # Usar a mesma função que gera os dados do dashboard
-        dados_frz_log = build_dados_frz_log(mes_atual, ano_atual)
+        meses.append((mes_atual, ano_atual))
+    
+    logs = build_dados_frz_log_periodo(tuple(meses))
+    
+    for i, ((mes_atual, ano_atual), dados_frz_log) in enumerate(zip(meses, logs)):
         totais = dados_frz_log['dados_criticos']['totais_mes']
         
         periodo_nome = f"{mes_atual:02d}/{ano_atual}"
@@ -534,20 +593,75 @@ def buscar_resultado_comparativo(mes, ano):
     }
 
 
+@cache_por_versao()
+def buscar_resultado_periodo(meses):
+    """Receitas, despesas e resultado realizados de cada mês do período (ordem cronológica)."""
+    periodos_data = []
+    resultado_anterior = None
+    
+    for (mes, ano), dados_frz_log in zip(meses, build_dados_frz_log_periodo(meses)):
+        totais = dados_frz_log['dados_criticos']['totais_mes']
+        resultado = totais['resultado_realizado']
+        
+        # Variação em relação ao mês anterior do período
+        if resultado_anterior is None:
+            variacao = 0
+        elif resultado_anterior != 0:
+            variacao = ((resultado - resultado_anterior) / abs(resultado_anterior)) * 100
+        else:
+            variacao = 100 if resultado > 0 else -100
+        resultado_anterior = resultado
+        
+        periodos_data.append({
+            'periodo': f"{mes:02d}/{ano}",
+            'mes': mes,
+            'ano': ano,
+            'receitas': totais['receita_realizada'],
+            'despesas': totais['despesa_realizada'],
+            'resultado': resultado,
+            'variacao_percentual': variacao
+        })
+    
+    return {
+        'periodos': periodos_data
+    }
+
+
+@cache_por_versao()
 def build_dados_frz(mes, ano):
     """Constrói dados do FRZ por semanas (sábado a sexta) para o mês/ano especificado."""
     
-    # Lista dos 19 clientes FRZ
-    clientes_frz = [
-        'ADORO', 'ADORO S.A.', 'ADORO SAO CARLOS', 'AGRA FOODS', 'ALIBEM', 'FRIBOI',
-        'GOLDPAO CD SAO JOSE DOS CAMPOS', 'GTFOODS BARUERI', 'JK DISTRIBUIDORA', 
-        'LATICINIO CARMONA', 'MARFRIG - ITUPEVA CD', 'MARFRIG - PROMISSAO', 
-        'MARFRIG GLOBAL FOODS S A', 'MINERVA S A', 'PAMPLONA JANDIRA', 
-        'PEIXES MEGGOS PESCADOS LTDA - SJBV', 'SANTA LUCIA', 'SAUDALI', 'VALENCIO JATAÍ'
-    ]
+    conn = get_connection_analitica()
+    cur = conn.cursor()
     
-    # Calcular semanas do mês (sábado a sexta)
-    semanas = calcular_semanas_sabado_sexta(mes, ano)
+    # Semanas do mês (calendario_semanas) e uma única passada agregada por tabela
+    semanas = semanas_dos_meses(cur, [(mes, ano)])[0]
+    matriz = agregar_matriz_frz(cur, CLIENTES_FRZ, mes, ano)
+    
+    conn.close()
+    return _montar_dados_frz(mes, ano, semanas, matriz)
+
+
+@cache_por_versao()
+def build_dados_frz_periodo(meses):
+    """
+    build_dados_frz para vários meses ((mes, ano), ...): o join com calendario_semanas
+    agrupa todas as semanas do período, então cada tabela é agregada uma única vez.
+    """
+    conn = get_connection_analitica()
+    cur = conn.cursor()
+    semanas_por_mes = semanas_dos_meses(cur, meses)
+    matrizes = agregar_matrizes_frz(cur, CLIENTES_FRZ, meses, semanas_por_mes)
+    conn.close()
+    
+    return [
+        _montar_dados_frz(mes, ano, semanas, matriz)
+        for (mes, ano), semanas, matriz in zip(meses, semanas_por_mes, matrizes)
+    ]
+
+
+def _montar_dados_frz(mes, ano, semanas, matriz):
+    """Monta a estrutura de dados do FRZ de um mês a partir da matriz cliente×semana."""
     
     # Estrutura de dados
     dados = {
@@ -557,17 +671,13 @@ def build_dados_frz(mes, ano):
         'clientes': {}
     }
     
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    # Para cada cliente, buscar dados de cada semana
-    for cliente in clientes_frz:
+    for cliente in CLIENTES_FRZ:
         dados['clientes'][cliente] = {}
         
-        for i, semana in enumerate(semanas):
+        for i in range(len(semanas)):
             dados['clientes'][cliente][f'semana_{i+1}'] = {
-                'projetado': buscar_valor_projetado(cur, cliente, semana, mes, ano),
-                'realizado': buscar_valor_realizado(cur, cliente, semana, mes, ano)
+                'projetado': matriz['projetado'].get((cliente, i), 0.0),
+                'realizado': matriz['realizado'].get((cliente, i), 0.0)
             }
         
         # Total do mês para o cliente
@@ -576,139 +686,143 @@ def build_dados_frz(mes, ano):
             'realizado': sum([dados['clientes'][cliente][f'semana_{i+1}']['realizado'] for i in range(5)])
         }
 
-    # --- Novo: calcular totais realizados por semana considerando TODOS os lançamentos em contas_pagar ---
-    # Isso é usado para calcular "despesas gerais" (agora vindo de contas_pagar)
-    semanas_totais_todos_realizado = []
-    for semana in semanas:
-        # se semana vazia
-        if semana['inicio'] is None or semana['fim'] is None:
-            semanas_totais_todos_realizado.append(0.0)
-            continue
-
-        inicio = semana['inicio']
-        fim = semana['fim']
-        # Se a semana estiver no mesmo mês/ano: projetado/realizado virão de contas_pagar
-        if inicio.month == fim.month and inicio.year == fim.year:
-            # realizado: somente status RECEBIDO (interpretado como pago/realizado)
-            cur.execute("""
-                SELECT COALESCE(SUM(valor_principal), 0.0) FROM contas_pagar
-                WHERE UPPER(status) = 'RECEBIDO'
-                AND fornecedor != 'REIS TRANSPORTES'
-                AND (
-                    CAST(SUBSTR(vencimento, 7, 4) AS INTEGER) = ? AND
-                    CAST(SUBSTR(vencimento, 4, 2) AS INTEGER) = ? AND
-                    CAST(SUBSTR(vencimento, 1, 2) AS INTEGER) BETWEEN ? AND ?
-                )
-            """, (inicio.year, inicio.month, inicio.day, fim.day))
-            total_real_sem = cur.fetchone()[0] or 0.0
-
-            # projetado: todos os registros (sem filtro de status)
-            cur.execute("""
-                SELECT COALESCE(SUM(valor_principal), 0.0) FROM contas_pagar
-                WHERE fornecedor != 'REIS TRANSPORTES'
-                AND (
-                    CAST(SUBSTR(vencimento, 7, 4) AS INTEGER) = ? AND
-                    CAST(SUBSTR(vencimento, 4, 2) AS INTEGER) = ? AND
-                    CAST(SUBSTR(vencimento, 1, 2) AS INTEGER) BETWEEN ? AND ?
-                )
-            """, (inicio.year, inicio.month, inicio.day, fim.day))
-            total_proj_sem = cur.fetchone()[0] or 0.0
-            total_sem = (total_proj_sem, total_real_sem)
-        else:
-            # parte no mês/ano de inicio (dia inicio..31)
-            cur.execute("""
-                SELECT COALESCE(SUM(valor_principal), 0.0) FROM contas_pagar
-                WHERE (
-                    CAST(SUBSTR(vencimento, 7, 4) AS INTEGER) = ? AND
-                    CAST(SUBSTR(vencimento, 4, 2) AS INTEGER) = ? AND
-                    CAST(SUBSTR(vencimento, 1, 2) AS INTEGER) BETWEEN ? AND 31
-                )
-            """, (inicio.year, inicio.month, inicio.day))
-            p1_proj = cur.fetchone()[0] or 0.0
-            cur.execute("""
-                SELECT COALESCE(SUM(valor_principal), 0.0) FROM contas_pagar
-                WHERE UPPER(status) = 'RECEBIDO'
-                AND fornecedor != 'REIS TRANSPORTES'
-                AND (
-                    CAST(SUBSTR(vencimento, 7, 4) AS INTEGER) = ? AND
-                    CAST(SUBSTR(vencimento, 4, 2) AS INTEGER) = ? AND
-                    CAST(SUBSTR(vencimento, 1, 2) AS INTEGER) BETWEEN ? AND 31
-                )
-            """, (inicio.year, inicio.month, inicio.day))
-            p1_real = cur.fetchone()[0] or 0.0
-
-            # parte no mês/ano de fim (1..dia fim)
-            cur.execute("""
-                SELECT COALESCE(SUM(valor_principal), 0.0) FROM contas_pagar
-                WHERE fornecedor != 'REIS TRANSPORTES'
-                AND (
-                    CAST(SUBSTR(vencimento, 7, 4) AS INTEGER) = ? AND
-                    CAST(SUBSTR(vencimento, 4, 2) AS INTEGER) = ? AND
-                    CAST(SUBSTR(vencimento, 1, 2) AS INTEGER) BETWEEN 1 AND ?
-                )
-            """, (fim.year, fim.month, fim.day))
-            p2_proj = cur.fetchone()[0] or 0.0
-            cur.execute("""
-                SELECT COALESCE(SUM(valor_principal), 0.0) FROM contas_pagar
-                WHERE UPPER(status) = 'RECEBIDO'
-                AND fornecedor != 'REIS TRANSPORTES'
-                AND (
-                    CAST(SUBSTR(vencimento, 7, 4) AS INTEGER) = ? AND
-                    CAST(SUBSTR(vencimento, 4, 2) AS INTEGER) = ? AND
-                    CAST(SUBSTR(vencimento, 1, 2) AS INTEGER) BETWEEN 1 AND ?
-                )
-            """, (fim.year, fim.month, fim.day))
-            p2_real = cur.fetchone()[0] or 0.0
-            total_sem = (p1_proj + p2_proj, p1_real + p2_real)
-
-        semanas_totais_todos_realizado.append(total_sem)
-
-    # anexa ao dicionário de dados para uso em cálculo de totais
-    # cada item agora é (projetado_total_semana, realizado_total_semana)
-    dados['semanas_totais_todos_realizado'] = semanas_totais_todos_realizado
-
-    # --- Novo: calcular totais projetados por semana considerando TODOS os clientes (tabela projecao) ---
-    semanas_totais_todos_projetado = []
-    for semana in semanas:
-        if semana['inicio'] is None or semana['fim'] is None:
-            semanas_totais_todos_projetado.append(0.0)
-            continue
+    # Totais por semana considerando TODOS os lançamentos em contas_pagar (despesas gerais)
+    # cada item é (projetado_total_semana, realizado_total_semana); semanas vazias ficam 0.0
+    dados['semanas_totais_todos_realizado'] = matriz['pagar_semanas']
 
-        inicio = semana['inicio']
-        fim = semana['fim']
-
-        if inicio.month == fim.month and inicio.year == fim.year:
-            cur.execute("""
-                SELECT COALESCE(SUM(CAST(valor AS REAL)), 0.0) FROM projecao
-                WHERE mes = ? AND ano = ? AND dia BETWEEN ? AND ?
-            """, (inicio.month, inicio.year, inicio.day, fim.day))
-            totalp = cur.fetchone()[0] or 0.0
-        else:
-            cur.execute("""
-                SELECT COALESCE(SUM(CAST(valor AS REAL)), 0.0) FROM projecao
-                WHERE mes = ? AND ano = ? AND dia BETWEEN ? AND 31
-            """, (inicio.month, inicio.year, inicio.day))
-            p1 = cur.fetchone()[0] or 0.0
-            cur.execute("""
-                SELECT COALESCE(SUM(CAST(valor AS REAL)), 0.0) FROM projecao
-                WHERE mes = ? AND ano = ? AND dia BETWEEN 1 AND ?
-            """, (fim.month, fim.year, fim.day))
-            p2 = cur.fetchone()[0] or 0.0
-            totalp = p1 + p2
-
-        semanas_totais_todos_projetado.append(totalp)
-
-    dados['semanas_totais_todos_projetado'] = semanas_totais_todos_projetado
+    # Totais projetados por semana considerando TODOS os clientes (tabela projecao)
+    dados['semanas_totais_todos_projetado'] = matriz['projecao_semanas']
     
     # Calcular totais gerais
     dados['totais'] = calcular_totais_frz(dados)
     
-    conn.close()
     return dados
 
+
+def agregar_matriz_frz(cur, clientes, mes, ano):
+    """Matriz cliente×semana do FRZ de um único mês (ver agregar_matrizes_frz)."""
+    return agregar_matrizes_frz(cur, clientes, [(mes, ano)])[0]
+
+
+def agregar_matrizes_frz(cur, clientes, meses, semanas_por_mes=None):
+    """
+    Calcula a matriz cliente×semana do FRZ de um ou mais meses ((mes, ano), ...) com um GROUP BY
+    por tabela de origem: cada dia (projecao e resumos diários de receber/pagar) é ligado à sua
+    semana de planejamento por calendario_semanas (data_key → semana_id). Semanas que cruzam
+    meses não precisam de tratamento especial e o custo praticamente não cresce com o número de meses.
+
+    Retorna uma lista (um item por mês) de dicts com:
+      - 'projetado': {(cliente, idx_semana): valor} vindo de projecao
+      - 'realizado': {(cliente, idx_semana): valor} vindo de resumo_receber_diario (RECEBIDO)
+      - 'pagar_semanas': [(projetado, realizado), ...] de resumo_pagar_diario por semana
+      - 'projecao_semanas': [total, ...] de projecao (todos os clientes) por semana
+    """
+    if semanas_por_mes is None:
+        semanas_por_mes = semanas_dos_meses(cur, meses)
+
+    resultados = [
+        {
+            'projetado': {},
+            'realizado': {},
+            # semanas vazias ficam 0.0; semanas válidas no formato (projetado, realizado)
+            'pagar_semanas': [
+                0.0 if semana['inicio'] is None or semana['fim'] is None else (0.0, 0.0)
+                for semana in semanas
+            ],
+            'projecao_semanas': [0.0] * len(semanas)
+        }
+        for semanas in semanas_por_mes
+    ]
+
+    # semana_id → (posição do mês, idx da semana)
+    posicoes = {}
+    datas = []
+    for m, ((mes, ano), semanas) in enumerate(zip(meses, semanas_por_mes)):
+        for idx, semana in enumerate(semanas):
+            if semana['inicio'] is None or semana['fim'] is None:
+                continue
+            posicoes[(ano * 100 + mes) * 10 + idx] = (m, idx)
+            datas.extend([data_key(semana['inicio']), data_key(semana['fim'])])
+    if not posicoes:
+        return resultados
+
+    # limites externos: range scan no índice de venc_key e nas semanas do período
+    limites = [min(datas), max(datas), min(posicoes), max(posicoes)]
+    clientes_set = set(clientes)
+
+    # Projeção: agrupa por cliente e semana; o total geral da semana soma todos os clientes
+    cur.execute("""
+        SELECT p.cliente, c.semana_id, COALESCE(SUM(p.valor_centavos), 0) / 100.0
+        FROM projecao p
+        JOIN calendario_semanas c ON c.data_key = p.ano * 10000 + p.mes * 100 + p.dia
+        WHERE p.ano * 10000 + p.mes * 100 + p.dia BETWEEN ? AND ?
+        AND c.semana_id BETWEEN ? AND ?
+        GROUP BY p.cliente, c.semana_id
+    """, limites)
+    for cliente, semana_id, valor in cur.fetchall():
+        if semana_id not in posicoes:
+            continue
+        m, idx = posicoes[semana_id]
+        valor = valor or 0.0
+        resultados[m]['projecao_semanas'][idx] += valor
+        if cliente in clientes_set:
+            resultados[m]['projetado'][(cliente, idx)] = valor
+
+    # Realizado: somente status RECEBIDO dos clientes pedidos
+    placeholders = ','.join(['?'] * len(clientes))
+    cur.execute(f"""
+        SELECT r.cliente, c.semana_id, COALESCE(SUM(r.valor_total), 0.0)
+        FROM resumo_receber_diario r
+        JOIN calendario_semanas c ON c.data_key = r.venc_key
+        WHERE r.venc_key BETWEEN ? AND ?
+        AND c.semana_id BETWEEN ? AND ?
+        AND r.cliente IN ({placeholders})
+        AND UPPER(r.status) = 'RECEBIDO'
+        AND r.conta_contabil_lsp = 0
+        GROUP BY r.cliente, c.semana_id
+    """, limites + list(clientes))
+    for cliente, semana_id, valor in cur.fetchall():
+        if semana_id in posicoes:
+            m, idx = posicoes[semana_id]
+            resultados[m]['realizado'][(cliente, idx)] = valor or 0.0
+
+    # Contas a pagar: projetado (todos os status) e realizado (RECEBIDO) na mesma passada
+    cur.execute("""
+        SELECT c.semana_id,
+               COALESCE(SUM(cp.valor_total), 0.0),
+               COALESCE(SUM(CASE WHEN UPPER(cp.status) = 'RECEBIDO' THEN cp.valor_total ELSE 0 END), 0.0)
+        FROM resumo_pagar_diario cp
+        JOIN calendario_semanas c ON c.data_key = cp.venc_key
+        WHERE cp.venc_key BETWEEN ? AND ?
+        AND c.semana_id BETWEEN ? AND ?
+        AND cp.fornecedor != 'REIS TRANSPORTES'
+        GROUP BY c.semana_id
+    """, limites)
+    for semana_id, projetado, realizado in cur.fetchall():
+        if semana_id in posicoes:
+            m, idx = posicoes[semana_id]
+            resultados[m]['pagar_semanas'][idx] = (projetado or 0.0, realizado or 0.0)
+
+    return resultados
+
+
+@cache_por_versao()
 def build_dados_frz_log(mes, ano):
     """Constrói análise executiva completa do FRZ com métricas avançadas."""
-    dados_frz = build_dados_frz(mes, ano)
+    return _analisar_frz_log(mes, ano, build_dados_frz(mes, ano))
+
+
+@cache_por_versao()
+def build_dados_frz_log_periodo(meses):
+    """build_dados_frz_log para vários meses ((mes, ano), ...) a partir de build_dados_frz_periodo."""
+    return [
+        _analisar_frz_log(mes, ano, dados_frz)
+        for (mes, ano), dados_frz in zip(meses, build_dados_frz_periodo(meses))
+    ]
+
+
+def _analisar_frz_log(mes, ano, dados_frz):
+    """Métricas executivas do FRZ de um mês a partir dos dados de build_dados_frz."""
     
     # === DADOS CRÍTICOS DO PLANEJAMENTO FRZ (TOPO) ===
     # Extrair dados reais das receitas, despesas e resultados
@@ -961,264 +1075,7 @@ def build_dados_frz_log(mes, ano):
 
 def calcular_semanas_sabado_sexta(mes, ano):
     """Retorna as semanas do mês baseadas no padrão estático do print fornecido."""
-    
-    # Mapeamento estático das semanas para cada mês (baseado no print)
-    semanas_estaticas = {
-        1: [  # Janeiro
-            {'label': 'SEMANA 1 A 7', 'inicio_dia': 1, 'fim_dia': 7},
-            {'label': 'SEMANA 8 A 14', 'inicio_dia': 8, 'fim_dia': 14},
-            {'label': 'SEMANA 15 A 21', 'inicio_dia': 15, 'fim_dia': 21},
-            {'label': 'SEMANA 22 A 28', 'inicio_dia': 22, 'fim_dia': 28},
-            {'label': '-', 'inicio_dia': None, 'fim_dia': None}
-        ],
-        2: [  # Fevereiro
-            {'label': 'SEMANA 1 A 7', 'inicio_dia': 1, 'fim_dia': 7},
-            {'label': 'SEMANA 8 A 14', 'inicio_dia': 8, 'fim_dia': 14},
-            {'label': 'SEMANA 15 A 21', 'inicio_dia': 15, 'fim_dia': 21},
-            {'label': 'SEMANA 22 A 28', 'inicio_dia': 22, 'fim_dia': 28},
-            {'label': '-', 'inicio_dia': None, 'fim_dia': None}
-        ],
-        3: [  # Março
-            {'label': 'SEMANA 1 A 7', 'inicio_dia': 1, 'fim_dia': 7},
-            {'label': 'SEMANA 8 A 14', 'inicio_dia': 8, 'fim_dia': 14},
-            {'label': 'SEMANA 15 A 21', 'inicio_dia': 15, 'fim_dia': 21},
-            {'label': 'SEMANA 22 A 28', 'inicio_dia': 22, 'fim_dia': 28},
-            {'label': 'SEMANA 29 A 4', 'inicio_dia': 29, 'fim_dia': 4}  # Abril
-        ],
-        4: [  # Abril
-            {'label': 'SEMANA 5 A 11', 'inicio_dia': 5, 'fim_dia': 11},
-            {'label': 'SEMANA 12 A 18', 'inicio_dia': 12, 'fim_dia': 18},
-            {'label': 'SEMANA 19 A 25', 'inicio_dia': 19, 'fim_dia': 25},
-            {'label': 'SEMANA 26 A 2', 'inicio_dia': 26, 'fim_dia': 2},  # Maio
-            {'label': '-', 'inicio_dia': None, 'fim_dia': None}
-        ],
-        5: [  # Maio
-            {'label': 'SEMANA 3 A 9', 'inicio_dia': 3, 'fim_dia': 9},
-            {'label': 'SEMANA 10 A 16', 'inicio_dia': 10, 'fim_dia': 16},
-            {'label': 'SEMANA 17 A 23', 'inicio_dia': 17, 'fim_dia': 23},
-            {'label': 'SEMANA 24 A 30', 'inicio_dia': 24, 'fim_dia': 30},
-            {'label': '-', 'inicio_dia': None, 'fim_dia': None}
-        ],
-        6: [  # Junho
-            {'label': 'SEMANA 31 A 6', 'inicio_dia': 31, 'fim_dia': 6},  # Maio-Junho
-            {'label': 'SEMANA 7 A 13', 'inicio_dia': 7, 'fim_dia': 13},
-            {'label': 'SEMANA 14 A 20', 'inicio_dia': 14, 'fim_dia': 20},
-            {'label': 'SEMANA 21 A 27', 'inicio_dia': 21, 'fim_dia': 27},
-            {'label': 'SEMANA 28 A 4', 'inicio_dia': 28, 'fim_dia': 4}  # Julho
-        ],
-        7: [  # Julho
-            {'label': 'SEMANA 5 A 11', 'inicio_dia': 5, 'fim_dia': 11},
-            {'label': 'SEMANA 12 A 18', 'inicio_dia': 12, 'fim_dia': 18},
-            {'label': 'SEMANA 19 A 25', 'inicio_dia': 19, 'fim_dia': 25},
-            {'label': 'SEMANA 26 A 1', 'inicio_dia': 26, 'fim_dia': 1},  # Agosto
-            {'label': '-', 'inicio_dia': None, 'fim_dia': None}
-        ],
-        8: [  # Agosto
-            {'label': 'SEMANA 2 A 8', 'inicio_dia': 2, 'fim_dia': 8},
-            {'label': 'SEMANA 9 A 15', 'inicio_dia': 9, 'fim_dia': 15},
-            {'label': 'SEMANA 16 A 22', 'inicio_dia': 16, 'fim_dia': 22},
-            {'label': 'SEMANA 23 A 29', 'inicio_dia': 23, 'fim_dia': 29},
-            {'label': '-', 'inicio_dia': None, 'fim_dia': None}
-        ],
-        9: [  # Setembro
-            {'label': 'SEMANA 30 A 5', 'inicio_dia': 30, 'fim_dia': 5},  # Agosto-Setembro
-            {'label': 'SEMANA 6 A 12', 'inicio_dia': 6, 'fim_dia': 12},
-            {'label': 'SEMANA 13 A 19', 'inicio_dia': 13, 'fim_dia': 19},
-            {'label': 'SEMANA 20 A 26', 'inicio_dia': 20, 'fim_dia': 26},
-            {'label': 'SEMANA 27 A 3', 'inicio_dia': 27, 'fim_dia': 3}  # Outubro
-        ],
-        10: [  # Outubro
-            {'label': 'SEMANA 4 A 10', 'inicio_dia': 4, 'fim_dia': 10},
-            {'label': 'SEMANA 11 A 17', 'inicio_dia': 11, 'fim_dia': 17},
-            {'label': 'SEMANA 18 A 24', 'inicio_dia': 18, 'fim_dia': 24},
-            {'label': 'SEMANA 25 A 31', 'inicio_dia': 25, 'fim_dia': 31},
-            {'label': '-', 'inicio_dia': None, 'fim_dia': None}
-        ],
-        11: [  # Novembro
-            {'label': 'SEMANA 1 A 7', 'inicio_dia': 1, 'fim_dia': 7},
-            {'label': 'SEMANA 8 A 14', 'inicio_dia': 8, 'fim_dia': 14},
-            {'label': 'SEMANA 15 A 21', 'inicio_dia': 15, 'fim_dia': 21},
-            {'label': 'SEMANA 22 A 28', 'inicio_dia': 22, 'fim_dia': 28},
-            {'label': '-', 'inicio_dia': None, 'fim_dia': None}
-        ],
-        12: [  # Dezembro
-            {'label': 'SEMANA 29 A 5', 'inicio_dia': 29, 'fim_dia': 5},  # Novembro-Dezembro
-            {'label': 'SEMANA 6 A 12', 'inicio_dia': 6, 'fim_dia': 12},
-            {'label': 'SEMANA 13 A 19', 'inicio_dia': 13, 'fim_dia': 19},
-            {'label': 'SEMANA 20 A 26', 'inicio_dia': 20, 'fim_dia': 26},
-            {'label': 'SEMANA 27 A 2', 'inicio_dia': 27, 'fim_dia': 2}  # Janeiro próximo
-        ]
-    }
-    
-    from datetime import datetime
-    
-    # Pegar as semanas estáticas para o mês
-    semanas_do_mes = semanas_estaticas.get(mes, [])
-    
-    semanas = []
-    for idx, semana_config in enumerate(semanas_do_mes):
-        if semana_config['inicio_dia'] is None:
-            # Semana vazia
-            semanas.append({
-                'inicio': None,
-                'fim': None,
-                'label': '-'
-            })
-            continue
-
-        # Calcular as datas reais (suportando semanas que cruzam mês anterior/próximo)
-        start_day = semana_config['inicio_dia']
-        end_day = semana_config['fim_dia']
-        try:
-            # Inicializar anos/meses para inicio e fim
-            inicio_year = ano
-            inicio_month = mes
-            fim_year = ano
-            fim_month = mes
-
-            if start_day > end_day:
-                # A semana cruza um mês: decidir se o início é no mês anterior ou o fim é no mês seguinte
-                # Regra: se for a primeira semana (idx==0) assume que começa no mês anterior e termina no mês corrente.
-                # Se for a última semana (idx==4) assume que começa no mês corrente e termina no mês seguinte.
-                if idx == 0:
-                    # início no mês anterior
-                    if mes == 1:
-                        inicio_month = 12
-                        inicio_year = ano - 1
-                    else:
-                        inicio_month = mes - 1
-                    fim_month = mes
-                    fim_year = ano
-                elif idx == 4:
-                    # fim no mês seguinte
-                    inicio_month = mes
-                    inicio_year = ano
-                    if mes == 12:
-                        fim_month = 1
-                        fim_year = ano + 1
-                    else:
-                        fim_month = mes + 1
-                else:
-                    # Caso intermediário: por segurança assumir início no mês corrente e fim no mês corrente
-                    inicio_month = mes
-                    fim_month = mes
-
-            inicio = datetime(inicio_year, inicio_month, start_day)
-            fim = datetime(fim_year, fim_month, min(end_day, 31))
-        except ValueError:
-            inicio = None
-            fim = None
-
-        semanas.append({
-            'inicio': inicio,
-            'fim': fim,
-            'label': semana_config['label']
-        })
-    
-    return semanas
-
-
-def buscar_valor_projetado(cur, cliente, semana, mes, ano):
-    """Busca valor projetado para o cliente na semana especificada."""
-    # Se a semana está vazia (label = '-'), retornar 0
-    if semana['inicio'] is None or semana['fim'] is None:
-        return 0.0
-    
-    # Se a semana cruza meses (inicio e fim em meses diferentes), somar em dois intervalos
-    inicio = semana['inicio']
-    fim = semana['fim']
-    if inicio is None or fim is None:
-        return 0.0
-
-    if inicio.month == fim.month and inicio.year == fim.year:
-        cur.execute("SELECT SUM(valor) FROM projecao WHERE cliente = ? AND mes = ? AND ano = ? AND dia BETWEEN ? AND ?",
-                    (cliente, inicio.month, inicio.year, inicio.day, fim.day))
-        resultado = cur.fetchone()[0]
-        return resultado if resultado else 0.0
-    else:
-        # parte 1: inicio.month/inicio.year de inicio.day..31
-        cur.execute("SELECT SUM(valor) FROM projecao WHERE cliente = ? AND mes = ? AND ano = ? AND dia BETWEEN ? AND 31",
-                    (cliente, inicio.month, inicio.year, inicio.day))
-        p1 = cur.fetchone()[0] or 0.0
-        # parte 2: fim.month/fim.year de 1..fim.day
-        cur.execute("SELECT SUM(valor) FROM projecao WHERE cliente = ? AND mes = ? AND ano = ? AND dia BETWEEN 1 AND ?",
-                    (cliente, fim.month, fim.year, fim.day))
-        p2 = cur.fetchone()[0] or 0.0
-        return p1 + p2
-
-
-def buscar_valor_realizado(cur, cliente, semana, mes, ano):
-    """Busca valor realizado (recebido) para o cliente na semana especificada."""
-    from datetime import datetime
-    
-    # Se a semana está vazia (label = '-'), retornar 0
-    if semana['inicio'] is None or semana['fim'] is None:
-        return 0.0
-    
-    # Converter datas da semana para formato de comparação
-    inicio_semana = semana['inicio']
-    fim_semana = semana['fim']
-
-    if inicio_semana is None or fim_semana is None:
-        return 0.0
-
-    # Se a semana está no mesmo mês/ano
-    if inicio_semana.month == fim_semana.month and inicio_semana.year == fim_semana.year:
-        cur.execute("""
-            SELECT SUM(valor_principal) FROM contas_receber 
-            WHERE cliente = ? AND UPPER(status) = 'RECEBIDO'
-            AND conta_contabil != 'LSP Transportes'
-            AND (
-                CAST(SUBSTR(vencimento, 7, 4) AS INTEGER) = ? AND
-                CAST(SUBSTR(vencimento, 4, 2) AS INTEGER) = ? AND
-                CAST(SUBSTR(vencimento, 1, 2) AS INTEGER) BETWEEN ? AND ?
-            )
-        """, (
-            cliente,
-            inicio_semana.year,
-            inicio_semana.month,
-            inicio_semana.day,
-            fim_semana.day
-        ))
-        resultado = cur.fetchone()[0]
-        return resultado if resultado else 0.0
-    else:
-        # Somar parte no mês/ano de inicio (dia inicio..31)
-        cur.execute("""
-            SELECT SUM(valor_principal) FROM contas_receber 
-            WHERE cliente = ? AND UPPER(status) = 'RECEBIDO'
-            AND conta_contabil != 'LSP Transportes'
-            AND (
-                CAST(SUBSTR(vencimento, 7, 4) AS INTEGER) = ? AND
-                CAST(SUBSTR(vencimento, 4, 2) AS INTEGER) = ? AND
-                CAST(SUBSTR(vencimento, 1, 2) AS INTEGER) BETWEEN ? AND 31
-            )
-        """, (
-            cliente,
-            inicio_semana.year,
-            inicio_semana.month,
-            inicio_semana.day
-        ))
-        p1 = cur.fetchone()[0] or 0.0
-
-        # Somar parte no mês/ano de fim (1..dia fim)
-        cur.execute("""
-            SELECT SUM(valor_principal) FROM contas_receber 
-            WHERE cliente = ? AND UPPER(status) = 'RECEBIDO'
-            AND conta_contabil != 'LSP Transportes'
-            AND (
-                CAST(SUBSTR(vencimento, 7, 4) AS INTEGER) = ? AND
-                CAST(SUBSTR(vencimento, 4, 2) AS INTEGER) = ? AND
-                CAST(SUBSTR(vencimento, 1, 2) AS INTEGER) BETWEEN 1 AND ?
-            )
-        """, (
-            cliente,
-            fim_semana.year,
-            fim_semana.month,
-            fim_semana.day
-        ))
-        p2 = cur.fetchone()[0] or 0.0
-        return p1 + p2
+    return semanas_do_padrao(mes, ano)
 
 
 def calcular_totais_frz(dados):
@@ -1310,7 +1167,7 @@ def calcular_totais_frz(dados):
 
 def build_dashboard_data_with_filters(mes, ano, limit_recent=20):
     """Coleta dados filtrados por mês/ano incluindo projeções."""
-    conn = get_connection()
+    conn = get_connection_analitica()
     cur = conn.cursor()
 
     # Converte parâmetros para inteiro
@@ -1330,70 +1187,33 @@ def build_dashboard_data_with_filters(mes, ano, limit_recent=20):
         'PEIXES MEGGS PESCADOS LTDA - SJBV', 'SANTA LUCIA', 'SAUDALI', 'Saudali', 'VALENCIO JATAÍ'
     ]
     
-    # Busca receita realizada (APENAS os 19 clientes pré-cadastrados e status recebido)
-    # Lista FIXA dos 19 clientes permitidos (regra rígida)
-    clientes_19_rigidos = [
-        'ADORO', 'ADORO S.A.', 'ADORO SAO CARLOS', 'AGRA FOODS', 'ALIBEM', 'FRIBOI',
-        'GOLDPAO CD SAO JOSE DOS CAMPOS', 'GTFOODS BARUERI', 'JK DISTRIBUIDORA', 
-        'LATICINIO CARMONA', 'MARFRIG - ITUPEVA CD', 'MARFRIG - PROMISSAO', 
-        'MARFRIG GLOBAL FOODS S A', 'MINERVA S A', 'PAMPLONA JANDIRA', 
-        'PEIXES MEGGS PESCADOS LTDA - SJBV', 'SANTA LUCIA', 'SAUDALI', 'VALENCIO JATAÍ'
-    ]
-    
-    # Função para verificar se um cliente do banco pertence aos 19
-    def cliente_pertence_aos_19(cliente_banco):
-        cliente_upper = cliente_banco.upper().strip()
-        for cliente_permitido in clientes_19_rigidos:
-            cliente_permitido_upper = cliente_permitido.upper().strip()
-            # Busca flexível: contém ou é contido
-            if (cliente_permitido_upper in cliente_upper or 
-                cliente_upper in cliente_permitido_upper or
-                cliente_upper == cliente_permitido_upper):
-                return True
-        return False
-    
     # Busca TODOS os registros dos 19 clientes no mês/ano (sem filtro de status)
-    pattern = f"%/{mes}/{ano}%"
+    # Intervalo do mês pela chave yyyymmdd (range scan no índice de venc_key)
+    venc_ini, venc_fim = intervalo_mes_key(mes_int, ano_int)
     
-    # Query para pegar TODOS os registros do mês (independente do status) e filtrar em Python
+    # Totais do mês dos 19 clientes (independente do status); principal_id vem de cliente_canonico
     cur.execute("""
-        SELECT cliente, valor_principal
-        FROM contas_receber
-        WHERE vencimento LIKE ?
-        AND conta_contabil != 'LSP Transportes'
-    """, (pattern,))
-    
-    todos_registros = cur.fetchall()
-    
-    # Filtra apenas os que pertencem aos 19 clientes (sem filtro de status)
-    total_receber_count = 0
-    total_receber_valor = 0.0
-    
-    for cliente_banco, valor in todos_registros:
-        if cliente_pertence_aos_19(cliente_banco):
-            try:
-                valor_float = float(valor)
-                total_receber_valor += valor_float
-                total_receber_count += 1
-            except (ValueError, TypeError):
-                continue
-    
-    # Simula o resultado no formato esperado
-    contas_receber = (total_receber_count, total_receber_valor)
+        SELECT COALESCE(SUM(qtd), 0), COALESCE(SUM(valor_total), 0.0)
+        FROM resumo_receber_diario
+        WHERE venc_key BETWEEN ? AND ?
+        AND conta_contabil_lsp = 0
+        AND principal_id IS NOT NULL
+    """, (venc_ini, venc_fim))
+    contas_receber = cur.fetchone()
 
     # Busca dados de contas a pagar (TODOS os registros do mês/ano)
     # Puxar 100% dos custos onde o mês de vencimento corresponde ao filtro
     cur.execute("""
-        SELECT COUNT(*), COALESCE(SUM(CAST(valor_principal AS REAL)), 0.0)
-        FROM contas_pagar
-        WHERE vencimento LIKE ?
-    """, (pattern,))
+        SELECT COALESCE(SUM(qtd), 0), COALESCE(SUM(valor_total), 0.0)
+        FROM resumo_pagar_diario
+        WHERE venc_key BETWEEN ? AND ?
+    """, (venc_ini, venc_fim))
     contas_pagar = cur.fetchone()
 
     # Busca dados de projeção
     cur.execute("""
-        SELECT COALESCE(SUM(CAST(valor AS REAL)), 0.0), COUNT(*) 
-        FROM projecao 
+        SELECT COALESCE(SUM(valor_total), 0.0), COALESCE(SUM(qtd), 0)
+        FROM resumo_projecao_mensal 
         WHERE mes = ? AND ano = ?
     """, (mes_int, ano_int))
     projecao_result = cur.fetchone()
@@ -1420,7 +1240,7 @@ def build_dashboard_data_with_filters(mes, ano, limit_recent=20):
     # Busca os clientes que estão na projeção para o mês/ano específico
     cur.execute("""
         SELECT DISTINCT cliente 
-        FROM projecao 
+        FROM resumo_projecao_mensal 
         WHERE mes = ? AND ano = ?
     """, (mes_int, ano_int))
     clientes_projecao = [row[0] for row in cur.fetchall()]
@@ -1466,42 +1286,28 @@ def build_dashboard_data_with_filters(mes, ano, limit_recent=20):
             return 0.0
 
     # PARA O CARD "RECEITA REALIZADA": usar apenas status RECEBIDO dos 19 clientes
-    # Busca todos os registros com status RECEBIDO no mês/ano e filtra pelos 19 clientes
     recebido_cond = "(UPPER(TRIM(status)) = 'RECEBIDO')"
     
     cur.execute(f"""
-        SELECT cliente, valor_principal
-        FROM contas_receber
+        SELECT COALESCE(SUM(qtd), 0), COALESCE(SUM(valor_total), 0.0)
+        FROM resumo_receber_diario
         WHERE {recebido_cond}
-        AND vencimento LIKE ?
-        AND conta_contabil != 'LSP Transportes'
-    """, (pattern,))
-    
-    registros_recebidos = cur.fetchall()
-    
-    # Filtra apenas os que pertencem aos 19 clientes com status RECEBIDO
-    recebido_count = 0
-    recebido_valor = 0.0
-    
-    for cliente_banco, valor in registros_recebidos:
-        if cliente_pertence_aos_19(cliente_banco):
-            try:
-                valor_float = float(valor)
-                recebido_valor += valor_float
-                recebido_count += 1
-            except (ValueError, TypeError):
-                continue
+        AND venc_key BETWEEN ? AND ?
+        AND conta_contabil_lsp = 0
+        AND principal_id IS NOT NULL
+    """, (venc_ini, venc_fim))
+    recebido_count, recebido_valor = cur.fetchone()
 
     # PARA O CARD "CONTAS A PAGAR" (valores realizados): usar apenas status RECEBIDO
     pago_cond = "(UPPER(TRIM(status)) = 'RECEBIDO')"
     
     cur.execute(f"""
-        SELECT COUNT(*), COALESCE(SUM(CAST(valor_principal AS REAL)), 0.0)
-        FROM contas_pagar
+        SELECT COALESCE(SUM(qtd), 0), COALESCE(SUM(valor_total), 0.0)
+        FROM resumo_pagar_diario
         WHERE {pago_cond}
-        AND vencimento LIKE ?
+        AND venc_key BETWEEN ? AND ?
         AND fornecedor != 'REIS TRANSPORTES'
-    """, (pattern,))
+    """, (venc_ini, venc_fim))
     
     contas_pagar_realizadas = cur.fetchone()
 
@@ -1514,7 +1320,7 @@ def build_dashboard_data_with_filters(mes, ano, limit_recent=20):
             status,
             'receber' as tipo
         FROM contas_receber 
-        WHERE vencimento LIKE ?
+        WHERE venc_key BETWEEN ? AND ?
         AND conta_contabil != 'LSP Transportes'
         UNION ALL
         SELECT 
@@ -1524,10 +1330,10 @@ def build_dashboard_data_with_filters(mes, ano, limit_recent=20):
             status,
             'pagar' as tipo
         FROM contas_pagar 
-        WHERE vencimento LIKE ?
+        WHERE venc_key BETWEEN ? AND ?
         ORDER BY vencimento
         LIMIT ?
-    """, (pattern, pattern, limit_recent))
+    """, (venc_ini, venc_fim, venc_ini, venc_fim, limit_recent))
     lancamentos = cur.fetchall()
 
     # Normaliza valores em lancamentos para float (previne TypeError em templates)
@@ -1543,26 +1349,18 @@ def build_dashboard_data_with_filters(mes, ano, limit_recent=20):
         tipo = row[4]
         normalized_lancamentos.append((nome, valor, venc, status, tipo))
 
-    # Alertas (vencimentos próximos 7 dias no período filtrado)
-    # Não confiamos em date()/strftime sobre strings no formato dd/mm/YYYY,
-    # então buscamos os vencimentos no mês/ano e contamos em Python os que caem
-    # nos próximos 7 dias.
-    cur.execute("SELECT vencimento FROM contas_receber WHERE status != 'Pago' AND vencimento LIKE ? AND conta_contabil != 'LSP Transportes'", (pattern,))
-    vr = [r[0] for r in cur.fetchall()]
-    cur.execute("SELECT vencimento FROM contas_pagar WHERE status != 'Pago' AND vencimento LIKE ? AND fornecedor != 'REIS TRANSPORTES'", (pattern,))
-    vp = [r[0] for r in cur.fetchall()]
-    alertas = 0
+    # Alertas (vencimentos próximos 7 dias no período filtrado), contados no resumo diário
     hoje = datetime.now().date()
-    limite = hoje + timedelta(days=7)
-    for v in vr + vp:
-        try:
-            # Espera formato 'DD/MM/YYYY'
-            d = datetime.strptime(v.strip(), '%d/%m/%Y').date()
-            if hoje <= d <= limite:
-                alertas += 1
-        except Exception:
-            # ignora formatos desconhecidos
-            continue
+    alerta_ini = max(venc_ini, data_key(hoje))
+    alerta_fim = min(venc_fim, data_key(hoje + timedelta(days=7)))
+    cur.execute("""
+        SELECT
+            (SELECT COALESCE(SUM(qtd), 0) FROM resumo_receber_diario
+             WHERE status != 'Pago' AND venc_key BETWEEN ? AND ? AND conta_contabil_lsp = 0)
+          + (SELECT COALESCE(SUM(qtd), 0) FROM resumo_pagar_diario
+             WHERE status != 'Pago' AND venc_key BETWEEN ? AND ? AND fornecedor != 'REIS TRANSPORTES')
+    """, (alerta_ini, alerta_fim, alerta_ini, alerta_fim))
+    alertas = cur.fetchone()[0] or 0
 
     conn.close()
 
@@ -1665,16 +1463,16 @@ def build_dashboard_data(limit_recent=20):
 
     # Busca dados de contas a receber (TODOS os status)
     cur.execute("""
-        SELECT COUNT(*), COALESCE(SUM(valor_principal), 0) 
-        FROM contas_receber 
-        WHERE conta_contabil != 'LSP Transportes'
+        SELECT COALESCE(SUM(qtd), 0), COALESCE(SUM(valor_total), 0) 
+        FROM resumo_receber_diario 
+        WHERE conta_contabil_lsp = 0
     """)
     contas_receber = cur.fetchone()
 
     # Busca dados de contas a pagar (TODOS os status)
     cur.execute("""
-        SELECT COUNT(*), COALESCE(SUM(valor_principal), 0) 
-        FROM contas_pagar 
+        SELECT COALESCE(SUM(qtd), 0), COALESCE(SUM(valor_total), 0) 
+        FROM resumo_pagar_diario 
         WHERE fornecedor != 'REIS TRANSPORTES'
     """)
     contas_pagar = cur.fetchone()
@@ -1705,16 +1503,18 @@ def build_dashboard_data(limit_recent=20):
     """)
     lancamentos = cur.fetchall()
 
-    # Busca alertas (vencimentos próximos)
+    # Busca alertas (vencimentos nos próximos 7 dias) pela chave yyyymmdd;
+    # date(vencimento) não entende o formato dd/mm/yyyy gravado pelo ERP
+    hoje = datetime.now().date()
+    hoje_key = data_key(hoje)
+    limite_key = data_key(hoje + timedelta(days=7))
     cur.execute("""
-        SELECT COUNT(*) 
-        FROM (
-            SELECT vencimento FROM contas_receber WHERE status != 'Pago' AND conta_contabil != 'LSP Transportes'
-            UNION ALL
-            SELECT vencimento FROM contas_pagar WHERE status != 'Pago' AND fornecedor != 'REIS TRANSPORTES'
-        ) 
-        WHERE date(vencimento) <= date('now', '+7 days')
-    """)
+        SELECT
+            (SELECT COALESCE(SUM(qtd), 0) FROM resumo_receber_diario
+             WHERE venc_key BETWEEN ? AND ? AND status != 'Pago' AND conta_contabil_lsp = 0)
+          + (SELECT COALESCE(SUM(qtd), 0) FROM resumo_pagar_diario
+             WHERE venc_key BETWEEN ? AND ? AND status != 'Pago' AND fornecedor != 'REIS TRANSPORTES')
+    """, (hoje_key, limite_key, hoje_key, limite_key))
     alertas = cur.fetchone()[0]
 
     conn.close()
@@ -1751,45 +1551,29 @@ def build_dashboard_data(limit_recent=20):
 @login_required
 def projecao():
     conn = get_connection()
-    cur = conn.cursor()
 
     if request.method == "POST":
         mes = int(request.form["mes"])
         ano = int(request.form["ano"])
 
-        # Salva as projeções
+        # Células preenchidas do formulário (campo cliente_<id>_<dia>); gravadas pelo nome do cliente
+        celulas = []
         for key, value in request.form.items():
             if key.startswith("cliente_") and value.strip():
                 _, cliente_id, dia = key.split("_")
                 cliente_id = int(cliente_id)
-                dia = int(dia)
+                if not 1 <= cliente_id <= len(CLIENTES_PROJECAO):
+                    continue
                 valor = float(value.replace(".", "").replace(",", "."))
+                celulas.append((CLIENTES_PROJECAO[cliente_id - 1], int(dia), valor))
 
-                # Remove duplicado
-                cur.execute("""
-                    DELETE FROM projecao 
-                    WHERE cliente = ? AND dia = ? AND mes = ? AND ano = ?
-                """, (cliente_id, dia, mes, ano))
-
-                # Insere novo valor
-                cur.execute("""
-                    INSERT INTO projecao (cliente, dia, mes, ano, valor)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (cliente_id, dia, mes, ano, valor))
-
-        conn.commit()
+        gravar_projecao(conn, mes, ano, celulas)
+        invalidar_cache()
+        agendar_snapshot()
         flash("Projeção salva com sucesso!", "success")
 
     # Lista de clientes para a projeção
-    clientes_permitidos = [
-        'ADORO', 'ADORO S.A.', 'ADORO SAO CARLOS', 'AGRA FOODS', 'ALIBEM', 'FRIBOI',
-        'GOLDPAO CD SAO JOSE DOS CAMPOS', 'GTFOODS BARUERI', 'JK DISTRIBUIDORA', 
-        'LATICINIO CARMONA', 'MARFRIG - ITUPEVA CD', 'MARFRIG - PROMISSAO', 
-        'MARFRIG GLOBAL FOODS S A', 'MINERVA S A', 'PAMPLONA JANDIRA', 
-        'PEIXES MEGGS PESCADOS LTDA - SJBV', 'SANTA LUCIA', 'SAUDALI', 'VALENCIO JATAÍ'
-    ]
-
-    clientes = [(i+1, nome) for i, nome in enumerate(clientes_permitidos)]
+    clientes = [(i+1, nome) for i, nome in enumerate(CLIENTES_PROJECAO)]
 
     conn.close()
     return render_template("projecao.html", clientes=clientes)
@@ -1805,13 +1589,7 @@ def api_get_projecao():
     conn = get_connection()
     cur = conn.cursor()
     # Lista fixa de nomes (mesma ordem usada na tela de projeção)
-    clientes_permitidos = [
-        'ADORO', 'ADORO S.A.', 'ADORO SAO CARLOS', 'AGRA FOODS', 'ALIBEM', 'FRIBOI',
-        'GOLDPAO CD SAO JOSE DOS CAMPOS', 'GTFOODS BARUERI', 'JK DISTRIBUIDORA', 
-        'LATICINIO CARMONA', 'MARFRIG - ITUPEVA CD', 'MARFRIG - PROMISSAO', 
-        'MARFRIG GLOBAL FOODS S A', 'MINERVA S A', 'PAMPLONA JANDIRA', 
-        'PEIXES MEGGS PESCADOS LTDA - SJBV', 'SANTA LUCIA', 'SAUDALI', 'VALENCIO JATAÍ'
-    ]
+    clientes_permitidos = CLIENTES_PROJECAO
 
     # Inicializa estrutura com zeros para todos os 19 clientes
     data = {nome: [0.0] * 31 for nome in clientes_permitidos}
@@ -1868,30 +1646,40 @@ def api_post_projecao():
     mes = data.get('mes')
     ano = data.get('ano')
     linhas = data.get('linhas', [])
+    # 'celulas' traz apenas o que mudou na grade: [{cliente, dia, valor}]
+    celulas_alteradas = data.get('celulas', [])
 
     if not mes or not ano:
         return jsonify({'status': 'error', 'message': 'mes e ano são obrigatórios'}), 400
 
+    def para_float(valor):
+        try:
+            return float(valor or 0.0)
+        except Exception:
+            return 0.0
+
+    celulas = []
+    for celula in celulas_alteradas:
+        try:
+            dia = int(celula.get('dia'))
+        except Exception:
+            continue
+        if 1 <= dia <= 31:
+            celulas.append((celula.get('cliente', ''), dia, para_float(celula.get('valor'))))
+
+    # Formato antigo: linhas completas (31 posições por cliente)
+    for linha in linhas:
+        cliente = linha.get('cliente', '')
+        valores = linha.get('valores', [])
+        for i in range(31):
+            celulas.append((cliente, i + 1, para_float(valores[i]) if i < len(valores) else 0.0))
+
     conn = get_connection()
-    cur = conn.cursor()
     try:
-        # substitui todas as entradas do mês/ano (delete + insert)
-        cur.execute("DELETE FROM projecao WHERE mes = ? AND ano = ?", (mes, ano))
-
-        for linha in linhas:
-            cliente = linha.get('cliente', '')
-            valores = linha.get('valores', [])
-            # garante 31 posições
-            for i in range(31):
-                dia = i + 1
-                try:
-                    valor = float(valores[i]) if i < len(valores) else 0.0
-                except Exception:
-                    valor = 0.0
-                cur.execute("INSERT INTO projecao (cliente, dia, mes, ano, valor) VALUES (?, ?, ?, ?, ?)", (cliente, dia, mes, ano, valor))
-
-        conn.commit()
-        return jsonify({'status': 'success'})
+        gravadas, removidas = gravar_projecao(conn, mes, ano, celulas)
+        invalidar_cache()
+        agendar_snapshot()
+        return jsonify({'status': 'success', 'gravadas': gravadas, 'removidas': removidas})
     except Exception as e:
         conn.rollback()
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -1936,174 +1724,47 @@ def resumo():
         mes = datetime.now().month
         ano = datetime.now().year
     
-    conn = get_connection()
+    conn = get_connection_analitica()
     cur = conn.cursor()
     
     # ===== CALCULAR KPIs PRINCIPAIS =====
-    
-    # 1. RECEITA TOTAL (realizada vs projetada)
-    pattern = f"%/{mes:02d}/{ano}%"
-    
-    # Receita realizada (apenas clientes dos 19 e status RECEBIDO)
-    # Usar sistema inteligente para filtrar clientes principais
-    condicao_clientes, clientes_reais = criar_condicao_clientes_principais(
-        cur, 'contas_receber', 
-        f"WHERE vencimento LIKE '{pattern}' AND UPPER(status) = 'RECEBIDO'"
-    )
-    
-    cur.execute(f"""
-        SELECT COALESCE(SUM(CAST(valor_principal AS REAL)), 0.0)
-        FROM contas_receber
-        WHERE vencimento LIKE ? AND UPPER(status) = 'RECEBIDO' 
-        AND conta_contabil != 'LSP Transportes'
-        AND {condicao_clientes}
-    """, [pattern] + clientes_reais)
-    receita_realizada = cur.fetchone()[0] or 0.0
-    
-    # Total A Receber (TODOS os status + 19 clientes + mês/ano) para detalhamento da receita
-    condicao_clientes_total, clientes_reais_total = criar_condicao_clientes_principais(
-        cur, 'contas_receber', 
-        f"WHERE vencimento LIKE '{pattern}'"
-    )
-    
-    cur.execute(f"""
-        SELECT COALESCE(SUM(CAST(valor_principal AS REAL)), 0.0)
-        FROM contas_receber
-        WHERE vencimento LIKE ? 
-        AND conta_contabil != 'LSP Transportes'
-        AND {condicao_clientes_total}
-    """, [pattern] + clientes_reais_total)
-    receita_total_a_receber = cur.fetchone()[0] or 0.0
-    
-    # Receita projetada (meta da projeção)
-    cur.execute("""
-        SELECT COALESCE(SUM(CAST(valor AS REAL)), 0.0)
-        FROM projecao 
-        WHERE mes = ? AND ano = ?
-    """, (mes, ano))
-    receita_meta = cur.fetchone()[0] or 0.0
-    
-    # 2. CONTAS A RECEBER (total e vencidas) - filtrado por mês/ano + 19 clientes + Status Pendente
-    # Usar sistema inteligente para filtrar clientes principais
-    condicao_clientes_receber, clientes_reais_receber = criar_condicao_clientes_principais(
-        cur, 'contas_receber', 
-        f"WHERE vencimento LIKE '{pattern}' AND UPPER(status) = 'PENDENTE'"
-    )
-    
-    cur.execute(f"""
-        SELECT 
-            COALESCE(SUM(CAST(valor_principal AS REAL)), 0.0),
-            COUNT(*)
-        FROM contas_receber
-        WHERE UPPER(status) = 'PENDENTE'
-        AND vencimento LIKE ?
-        AND conta_contabil != 'LSP Transportes'
-        AND {condicao_clientes_receber}
-    """, [pattern] + clientes_reais_receber)
-    receber_dados = cur.fetchone()
-    total_receber = receber_dados[0] or 0.0
-    count_receber = receber_dados[1] or 0
-    
-    # Contas vencidas (vencimento < hoje) - filtrado por mês/ano + 19 clientes + Status Pendente
-    hoje = datetime.now().strftime("%d/%m/%Y")
-    cur.execute(f"""
-        SELECT 
-            COALESCE(SUM(CAST(valor_principal AS REAL)), 0.0),
-            COUNT(*)
-        FROM contas_receber
-        WHERE UPPER(status) = 'PENDENTE'
-        AND vencimento LIKE ?
-        AND {condicao_clientes_receber}
-        AND LENGTH(vencimento) = 10
-        AND DATE(SUBSTR(vencimento, 7, 4) || '-' || SUBSTR(vencimento, 4, 2) || '-' || SUBSTR(vencimento, 1, 2)) < DATE('now')
-    """, [pattern] + clientes_reais_receber)
-    receber_vencidas_dados = cur.fetchone()
-    receber_vencidas = receber_vencidas_dados[0] or 0.0
-    count_receber_vencidas = receber_vencidas_dados[1] or 0
-    
-    # 3. CONTAS A PAGAR (total e vencidas) - filtrado por mês/ano
-    cur.execute("""
-        SELECT 
-            COALESCE(SUM(CAST(valor_principal AS REAL)), 0.0),
-            COUNT(*)
-        FROM contas_pagar
-        WHERE status != 'PAGO' AND status != 'Pago'
-        AND vencimento LIKE ?
-        AND fornecedor != 'REIS TRANSPORTES'
-    """, (pattern,))
-    pagar_dados = cur.fetchone()
-    total_pagar = pagar_dados[0] or 0.0
-    count_pagar = pagar_dados[1] or 0
-    
-    # Contas vencidas (vencimento < hoje) - filtrado por mês/ano
-    cur.execute("""
-        SELECT 
-            COALESCE(SUM(CAST(valor_principal AS REAL)), 0.0),
-            COUNT(*)
-        FROM contas_pagar
-        WHERE status != 'PAGO' AND status != 'Pago'
-        AND vencimento LIKE ?
-        AND LENGTH(vencimento) = 10
-        AND DATE(SUBSTR(vencimento, 7, 4) || '-' || SUBSTR(vencimento, 4, 2) || '-' || SUBSTR(vencimento, 1, 2)) < DATE('now')
-        AND fornecedor != 'REIS TRANSPORTES'
-    """, (pattern,))
-    pagar_vencidas_dados = cur.fetchone()
-    pagar_vencidas = pagar_vencidas_dados[0] or 0.0
-    count_pagar_vencidas = pagar_vencidas_dados[1] or 0
-    
-    # 4. CONTAS A PAGAR TOTAL (para cálculo do fluxo de caixa - TODOS os status)
-    cur.execute("""
-        SELECT COALESCE(SUM(CAST(valor_principal AS REAL)), 0.0)
-        FROM contas_pagar
-        WHERE vencimento LIKE ?
-        AND fornecedor != 'REIS TRANSPORTES'
-    """, (pattern,))
-    pagar_total = cur.fetchone()[0] or 0.0
-    
-    # 4. FLUXO DE CAIXA (receita realizada - contas a pagar total)
+    # Uma leitura por tabela de resumo (receber, pagar, projeção) com agregação condicional
+    hoje_key = data_key(datetime.now())
+    kpis = calcular_kpis_mes(cur, mes, ano, hoje_key)
+    
+    # 1. RECEITA TOTAL (realizada vs projetada) - apenas clientes dos 19, sem LSP Transportes
+    receita_realizada = kpis.receber.realizada
+    receita_total_a_receber = kpis.receber.total_a_receber
+    receita_meta = kpis.meta
+    
+    # 2. CONTAS A RECEBER (pendentes e vencidas) - 19 clientes + status Pendente
+    total_receber = kpis.receber.pendente
+    count_receber = kpis.receber.count_pendente
+    receber_vencidas = kpis.receber.vencidas
+    count_receber_vencidas = kpis.receber.count_vencidas
+    
+    # 3. CONTAS A PAGAR (em aberto e vencidas)
+    total_pagar = kpis.pagar.pendente
+    count_pagar = kpis.pagar.count_pendente
+    pagar_vencidas = kpis.pagar.vencidas
+    count_pagar_vencidas = kpis.pagar.count_vencidas
+    
+    # 4. FLUXO DE CAIXA (receita realizada - contas a pagar total, TODOS os status)
+    pagar_total = kpis.pagar.total
     fluxo_caixa = receita_realizada - pagar_total
     
     # 4.1. FLUXO DE CAIXA PROJETADO (meta da projeção - contas a pagar total)
     fluxo_caixa_projetado = receita_meta - pagar_total
     
     # 5. TOP 5 CLIENTES DO MÊS (19 clientes principais, por valor total - recebido + pendente)
-    cur.execute(f"""
-        SELECT 
-            cliente,
-            COALESCE(SUM(CAST(valor_principal AS REAL)), 0.0) as total,
-            COALESCE(SUM(CASE WHEN UPPER(status) = 'RECEBIDO' THEN CAST(valor_principal AS REAL) ELSE 0 END), 0.0) as recebido,
-            COALESCE(SUM(CASE WHEN UPPER(status) = 'PENDENTE' THEN CAST(valor_principal AS REAL) ELSE 0 END), 0.0) as pendente
-        FROM contas_receber
-        WHERE vencimento LIKE ?
-        AND conta_contabil != 'LSP Transportes'
-        AND {condicao_clientes}
-        GROUP BY cliente
-        ORDER BY total DESC
-        LIMIT 5
-    """, [pattern] + clientes_reais)
-    top_clientes = cur.fetchall()
+    top_clientes = kpis.receber.top_clientes
     
     # ===== DADOS COMPARATIVOS E PROJEÇÕES =====
     
-    # Calcular mês anterior
+    # Mês anterior (receita também filtrada pelos 19 clientes)
     mes_anterior = mes - 1 if mes > 1 else 12
     ano_anterior = ano if mes > 1 else ano - 1
-    pattern_anterior = f"%/{mes_anterior:02d}/{ano_anterior}%"
-    
-    # Receita do período anterior (também filtrada pelos 19 clientes)
-    condicao_clientes_anterior, clientes_reais_anterior = criar_condicao_clientes_principais(
-        cur, 'contas_receber', 
-        f"WHERE vencimento LIKE '{pattern_anterior}' AND UPPER(status) = 'RECEBIDO'"
-    )
-    
-    cur.execute(f"""
-        SELECT COALESCE(SUM(CAST(valor_principal AS REAL)), 0.0)
-        FROM contas_receber
-        WHERE vencimento LIKE ? AND UPPER(status) = 'RECEBIDO'
-        AND conta_contabil != 'LSP Transportes'
-        AND {condicao_clientes_anterior}
-    """, [pattern_anterior] + clientes_reais_anterior)
-    receita_anterior = cur.fetchone()[0] or 0.0
+    receita_anterior = kpis.receber.realizada_mes_anterior
     
     # Crescimento percentual
     crescimento_receita = ((receita_realizada - receita_anterior) / receita_anterior * 100) if receita_anterior > 0 else 0
@@ -2112,40 +1773,11 @@ def resumo():
     barra_crescimento = max(10, min(100, 50 + crescimento_receita))
     
     # Projeção de fluxo de caixa para próximos 3 meses: Projeção - A Pagar
-    projecao_fluxo = []
     meses_nomes = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
-    
-    for i in range(1, 4):  # Próximos 3 meses
-        mes_proj = mes + i
-        ano_proj = ano
-        if mes_proj > 12:
-            mes_proj -= 12
-            ano_proj += 1
-        
-        # Buscar dados da projeção (todos os clientes da tabela projecao)
-        cur.execute("""
-            SELECT COALESCE(SUM(CAST(valor AS REAL)), 0.0) 
-            FROM projecao
-            WHERE mes = ? AND ano = ?
-        """, (mes_proj, ano_proj))
-        receita_projetada = cur.fetchone()[0] or 0.0
-        
-        # Buscar contas a pagar para o mês (TODOS os status - igual ao card principal)
-        cur.execute("""
-            SELECT COALESCE(SUM(CAST(valor_principal AS REAL)), 0.0)
-            FROM contas_pagar
-            WHERE vencimento LIKE ?
-            AND fornecedor != 'REIS TRANSPORTES'
-        """, (f"%/{mes_proj:02d}/{ano_proj}%",))
-        contas_a_pagar = cur.fetchone()[0] or 0.0
-        
-        # Fluxo = Projeção - A Pagar
-        fluxo_projetado = receita_projetada - contas_a_pagar
-        
-        projecao_fluxo.append({
-            'nome': meses_nomes[mes_proj - 1],
-            'valor': fluxo_projetado
-        })
+    projecao_fluxo = [
+        {'nome': meses_nomes[mes_proj - 1], 'valor': receita_projetada - contas_a_pagar}
+        for mes_proj, _, receita_projetada, contas_a_pagar in kpis.meses_seguintes
+    ]
     
     # Alertas de fluxo
     alertas_fluxo = [proj for proj in projecao_fluxo if proj['valor'] < 0]
@@ -2156,13 +1788,7 @@ def resumo():
     percentual_inadimplencia = (títulos_vencidos / total_títulos * 100) if total_títulos > 0 else 0
     
     # Ticket médio (baseado nos 19 clientes)
-    cur.execute(f"""
-        SELECT COUNT(*) FROM contas_receber 
-        WHERE vencimento LIKE ? AND UPPER(status) = 'RECEBIDO'
-        AND conta_contabil != 'LSP Transportes'
-        AND {condicao_clientes}
-    """, [pattern] + clientes_reais)
-    total_transacoes = cur.fetchone()[0] or 1
+    total_transacoes = kpis.receber.count_realizada or 1
     ticket_medio = receita_realizada / total_transacoes if total_transacoes > 0 else 0
     
     # ===== CALCULAR STATUS GERAL =====
@@ -2287,9 +1913,19 @@ def importacao():
             flash("Nenhum arquivo selecionado.", "error")
             return redirect(url_for("importacao"))
 
+        # A importação roda na fila em segundo plano; a requisição só grava o upload
         for file in files:
-            msg = importar_arquivo(file)
-            flash(f"{file.filename}: {msg}", "success")
+            try:
+                job_id, anterior = enfileirar_importacao(file, request.form.get("modo", "incremental"),
+                                                         session.get("user_name"))
+                if anterior:
+                    mensagem = anterior['resultado'].get('mensagem', '')
+                    flash(f"{file.filename}: ♻️ Arquivo idêntico à importação #{anterior['id']} "
+                          f"({anterior['data_importacao']}), nada a processar. {mensagem}", "success")
+                else:
+                    flash(f"{file.filename}: ⏳ Importação #{job_id} na fila.", "success")
+            except (ValueError, FilaCheiaError) as e:
+                flash(f"{file.filename}: {e}", "error")
 
         return redirect(url_for("importacao"))
 
@@ -2299,6 +1935,9 @@ def importacao():
     if os.path.isdir(uploads_dir):
         for fname in sorted(os.listdir(uploads_dir), reverse=True):
             fpath = os.path.join(uploads_dir, fname)
+            # Subpastas (ex: uploads aguardando na fila de importação) não são listadas
+            if os.path.isdir(fpath):
+                continue
             try:
                 mtime = os.path.getmtime(fpath)
                 size = os.path.getsize(fpath)
@@ -2320,7 +1959,35 @@ def importacao():
             except Exception:
                 continue
 
-    return render_template("importacao.html", uploads=uploads)
+    try:
+        jobs = listar_jobs()
+    except Exception as e:
+        print(f"⚠️ Não foi possível listar os jobs de importação: {e}")
+        jobs = []
+
+    return render_template("importacao.html", uploads=uploads, jobs=jobs)
+
+
+@app.route("/api/importacao/jobs/<int:job_id>")
+@login_required
+def api_importacao_job(job_id):
+    job = obter_job(job_id)
+    if not job:
+        return jsonify({"erro": "Job não encontrado"}), 404
+    return jsonify(job)
+
+
+@app.route("/debug/queries")
+@login_required
+def debug_queries():
+    """Resumos SQL das últimas requisições (só com FINANCEIRO_DEBUG_SQL=1)."""
+    if not instrumentacao_sql.ATIVO:
+        return jsonify({"erro": "Instrumentação SQL desativada (defina FINANCEIRO_DEBUG_SQL=1)"}), 404
+    return jsonify({
+        "limite_n_mais_1": instrumentacao_sql.LIMITE_N_MAIS_1,
+        "limite_lenta_ms": instrumentacao_sql.LIMITE_LENTA_MS,
+        "requisicoes": instrumentacao_sql.ultimos_resumos(),
+    })
 
 
 @app.route('/uploads/<path:filename>')
@@ -2336,4 +2003,5 @@ def uploaded_file(filename):
 if __name__ == "__main__":
     # Inicializa banco ao iniciar o servidor
     init_db()
+    preparar_banco()
     app.run(debug=True, host="0.0.0.0", port=5000)
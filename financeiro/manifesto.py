@@ -492,7 +492,8 @@ def integrar_manifesto_completo(dados_excel):
     veiculos_encontrados = 0
     if placas:
         print(f"🚚 Buscando dados de {len(placas)} veículos...")
-        dados_veiculos = VeiculoHelper.buscar_multiplas_placas(placas)
+        # Veículo, tipologia e custo da frota numa única consulta com junção
+        dados_veiculos = VeiculoHelper.buscar_placas_com_custo(placas)
         veiculos_encontrados = sum(1 for v in dados_veiculos.values() if v.get('encontrado', False))
         print(f"✅ Veículos encontrados: {veiculos_encontrados}/{len(placas)}")
     
@@ -524,8 +525,8 @@ def integrar_manifesto_completo(dados_excel):
                 placa = str(item[col]).upper().strip()
                 break
         
-        if placa and placa in dados_veiculos:
-            veiculo = dados_veiculos[placa]
+        veiculo = dados_veiculos.get(placa) if placa else None
+        if veiculo:
             item_enriquecido.update({
                 'veiculo_status': veiculo.get('status'),
                 'veiculo_tipologia': veiculo.get('tipologia'),
@@ -575,11 +576,11 @@ def integrar_manifesto_completo(dados_excel):
                     except (ValueError, TypeError):
                         continue
             
-            # Calcular custo se tiver tipologia e KM
+            # Calcular custo se tiver tipologia e KM (custos já vieram com o veículo)
             if km_viagem > 0:
-                custo_frota_fixa = CustoFrotaHelper.calcular_custo_frota_fixa(
-                    item_enriquecido.get('veiculo_tipologia'), 
-                    km_viagem
+                custo_frota_fixa = CustoFrotaHelper.calcular_com_custos(
+                    veiculo['custo_fixo'], veiculo['custo_variavel'],
+                    km_viagem, veiculo['custo_encontrado']
                 )
         
         item_enriquecido.update({
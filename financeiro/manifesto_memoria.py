@@ -0,0 +1,107 @@
+"""
+Manifesto acumulado em memória, compartilhado pelo processo.
+
+MargemAnaliseService e PainelFreteService carregavam cada um o seu
+DataFrame de uploads/Manifesto_Acumulado.xlsx: o painel com todas as
+colunas já no import e a margem com parte delas, em cache próprio por
+mtime. O processo guardava duas cópias do maior conjunto de dados e
+interpretava a planilha duas vezes.
+
+Aqui o manifesto é carregado uma vez por versão do arquivo (mtime +
+tamanho) e compactado: colunas de texto com poucos valores distintos
+(cliente, veículo, tipologia, destino, perfil...) viram category e as
+colunas float64 viram float32 quando nenhum valor perde dígitos (float32
+guarda ~7 algarismos significativos: 2076.2135 ou 1234567.89 ficariam
+diferentes). Frete Correto e Despesas Gerais ficam sempre em float64
+porque são somados nos totais em reais dos dashboards, e a soma em
+float32 perderia os centavos. Mes/Ano/Dia já vêm calculados a partir de
+Data.
+
+obter_manifesto() devolve uma cópia rasa: colunas criadas, renomeadas ou
+removidas pelo chamador não afetam a versão compartilhada. Os valores
+não devem ser alterados no lugar.
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .cache_planilhas import ler_planilha
+
+MANIFESTO_PATH = os.path.join(os.path.dirname(__file__), 'uploads', 'Manifesto_Acumulado.xlsx')
+
+# Somadas em reais nos dashboards: mantidas em float64
+COLUNAS_MONETARIAS = ('Frete Correto', 'Despesas Gerais')
+
+# Texto vira category quando os valores distintos são no máximo esta fração das linhas
+FRACAO_MAX_CATEGORIA = 0.5
+
+_lock = threading.Lock()
+_df = None
+_versao = None
+
+
+def _versao_arquivo(caminho):
+    st = os.stat(caminho)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _compactar(df):
+    """Texto repetitivo em category e float64 sem perda (exceto monetárias) em float32."""
+    for coluna in df.columns:
+        serie = df[coluna]
+        if coluna in COLUNAS_MONETARIAS:
+            continue
+        if serie.dtype == np.float64:
+            compacta = serie.astype(np.float32)
+            # float32 guarda ~7 algarismos: só compacta se todo valor volta ao mesmo decimal
+            if compacta.astype(str).astype(np.float64).equals(serie):
+                df[coluna] = compacta
+        elif serie.dtype == object or pd.api.types.is_string_dtype(serie.dtype):
+            preenchidos = serie.count()
+            if preenchidos and serie.nunique() <= preenchidos * FRACAO_MAX_CATEGORIA:
+                df[coluna] = serie.astype('category')
+    return df
+
+
+def _carregar(caminho):
+    df = ler_planilha(caminho)
+    df['Data'] = pd.to_datetime(df['Data'], errors='coerce')
+    for coluna in COLUNAS_MONETARIAS:
+        if coluna in df.columns:
+            df[coluna] = pd.to_numeric(df[coluna], errors='coerce').fillna(0)
+    df['Mes'] = df['Data'].dt.month
+    df['Ano'] = df['Data'].dt.year
+    df['Dia'] = df['Data'].dt.day
+    return _compactar(df)
+
+
+def obter_manifesto(caminho=MANIFESTO_PATH, recarregar=False):
+    """
+    Retorna (df, versao): cópia rasa do manifesto compartilhado e a versão do arquivo
+    (None sem arquivo, com df vazio). Recarrega quando o arquivo muda ou recarregar=True.
+    """
+    global _df, _versao
+    if not os.path.exists(caminho):
+        print(f"❌ Arquivo não encontrado: {caminho}")
+        return pd.DataFrame(), None
+
+    versao = _versao_arquivo(caminho)
+    with _lock:
+        if recarregar or _df is None or versao != _versao:
+            print(f"📁 Carregando manifesto compartilhado... ({os.path.getsize(caminho) / 1024 / 1024:.1f} MB)")
+            _df = _carregar(caminho)
+            _versao = versao
+            print(f"✅ Manifesto carregado: {len(_df)} registros, "
+                  f"{_df.memory_usage(deep=True).sum() / 1024 / 1024:.1f} MB em memória")
+        return _df.copy(deep=False), _versao
+
+
+def descartar_manifesto():
+    """Libera a cópia em memória; a próxima chamada de obter_manifesto relê o arquivo."""
+    global _df, _versao
+    with _lock:
+        _df = None
+        _versao = None
@@ -15,6 +15,8 @@ from datetime import datetime, timedelta
 from collections import defaultdict
 import json
 
+from .manifesto_memoria import obter_manifesto
+
 # Blueprint para as rotas de margem
 margem_bp = Blueprint('margem_analise', __name__)
 
@@ -22,7 +24,7 @@ class MargemAnaliseService:
     def __init__(self):
         self.db_path = os.path.join(os.path.dirname(__file__), '..', 'financeiro.db')
         self._cache = {}  # Cache para dados processados
-        self._last_modified = None  # Timestamp do último arquivo carregado
+        self._versao_manifesto = None  # Versão (mtime, tamanho) do manifesto em cache
         self._df_cache = None  # Cache do DataFrame principal
         
     def filtrar_dados_validos(self, df_resultado):
@@ -38,36 +40,18 @@ class MargemAnaliseService:
         return sqlite3.connect(self.db_path)
     
     def carregar_dados_manifesto(self):
-        """Carrega dados do manifesto acumulado do arquivo Excel com cache"""
+        """Deriva os dados de margem do manifesto compartilhado (manifesto_memoria), com cache por versão"""
         try:
-            # Caminho para o arquivo Excel
-            manifesto_path = os.path.join(os.path.dirname(__file__), 'uploads', 'Manifesto_Acumulado.xlsx')
-            
-            if not os.path.exists(manifesto_path):
-                print(f"Arquivo não encontrado: {manifesto_path}")
+            df_manifesto, versao = obter_manifesto()
+            if versao is None:
                 return pd.DataFrame()
             
-            # Verificar se o arquivo foi modificado
-            current_modified = os.path.getmtime(manifesto_path)
-            
-            # Se já temos cache e o arquivo não foi modificado, retornar cache
-            if (self._df_cache is not None and 
-                self._last_modified is not None and 
-                current_modified == self._last_modified):
+            # Se já temos cache da mesma versão do arquivo, retornar cache
+            if self._df_cache is not None and versao == self._versao_manifesto:
                 print("📊 Usando dados do cache (performance otimizada)")
                 return self._df_cache
             
-            print(f"📁 Carregando arquivo Excel... ({os.path.getsize(manifesto_path) / 1024 / 1024:.1f} MB)")
-            
-            # Carregar apenas as colunas necessárias para melhor performance
-            colunas_necessarias = [
-                'Data', 'Tipologia', 'Veículo', 'Destino', 'Cliente_Real',
-                'Frete Correto', 'Despesas Gerais', 'Status_Veiculo'
-            ]
-            
-            df = pd.read_excel(manifesto_path, usecols=colunas_necessarias)
-            
-            # Verificar e mapear colunas (nomes reais do arquivo)
+            # Apenas as colunas usadas na análise, com os nomes da margem
             colunas_mapeamento = {
                 'Frete Correto': 'frete_receber',    # Receita de frete
                 'Despesas Gerais': 'frete_pagar',    # Despesa/custo de frete
@@ -78,18 +62,9 @@ class MargemAnaliseService:
                 'Status_Veiculo': 'perfil',          # FIXO/SPOT
                 'Data': 'Data'
             }
+            df = df_manifesto[list(colunas_mapeamento)].rename(columns=colunas_mapeamento)
             
-            # Verificar quais colunas existem e renomear
-            for col_original, col_nova in colunas_mapeamento.items():
-                if col_original in df.columns and col_original != col_nova:
-                    df[col_nova] = df[col_original]
-            
-            # Conversões e limpeza
-            df['Data'] = pd.to_datetime(df['Data'], errors='coerce')
-            df['frete_receber'] = pd.to_numeric(df['frete_receber'], errors='coerce').fillna(0)
-            df['frete_pagar'] = pd.to_numeric(df['frete_pagar'], errors='coerce').fillna(0)
-            
-            # Cálculos derivados
+            # Cálculos derivados (Data e valores já convertidos no manifesto compartilhado)
             df['margem_liquida'] = df['frete_receber'] - df['frete_pagar']
             df['margem_percentual'] = np.where(df['frete_receber'] > 0, 
                                              (df['margem_liquida'] / df['frete_receber']) * 100, 0)
@@ -104,7 +79,7 @@ class MargemAnaliseService:
             
             # Salvar no cache
             self._df_cache = df
-            self._last_modified = current_modified
+            self._versao_manifesto = versao
             print(f"✅ Dados carregados e cacheados: {len(df)} registros")
             
             return df
@@ -176,8 +151,8 @@ def api_dados_gerais():
                 'ticket_medio': float(df['frete_receber'].mean()) if not df.empty else 0,
                 'operacoes_lucro': len(df[df['margem_liquida'] > 0]),
                 'operacoes_prejuizo': len(df[df['margem_liquida'] < 0]),
-                'melhor_tipologia': df.groupby('Tipologia')['margem_percentual'].mean().idxmax() if not df.empty else '-',
-                'pior_tipologia': df.groupby('Tipologia')['margem_percentual'].mean().idxmin() if not df.empty else '-'
+                'melhor_tipologia': df.groupby('Tipologia', observed=True)['margem_percentual'].mean().idxmax() if not df.empty else '-',
+                'pior_tipologia': df.groupby('Tipologia', observed=True)['margem_percentual'].mean().idxmin() if not df.empty else '-'
             },
             'alertas': {
                 'operacoes_prejuizo': int(len(df[df['margem_liquida'] < 0])),
@@ -243,7 +218,7 @@ def api_evolucao_anual():
             return jsonify({'error': 'Nenhum dado encontrado com os filtros aplicados'}), 404
         
         # Agrupar por mês/ano
-        df_mensal = df.groupby(['ano', 'mes']).agg({
+        df_mensal = df.groupby(['ano', 'mes'], observed=True).agg({
             'frete_receber': 'sum',
             'frete_pagar': 'sum'
         }).round(2)
@@ -315,7 +290,7 @@ def api_ranking_melhores():
         # Definir agrupamento e lógica baseado no tipo de análise
         if tipo_analise == 'destino':
             # Para destinos: agrupar por destino apenas
-            resultado = df.groupby('DESTINO').agg({
+            resultado = df.groupby('DESTINO', observed=True).agg({
                 'frete_receber': 'sum',
                 'frete_pagar': 'sum'
             }).reset_index()
@@ -353,7 +328,7 @@ def api_ranking_melhores():
                 
         elif tipo_analise == 'placa':
             # Para placas: agrupar por placa
-            resultado = df.groupby(['Placa', 'Tipologia']).agg({
+            resultado = df.groupby(['Placa', 'Tipologia'], observed=True).agg({
                 'frete_receber': 'sum',
                 'frete_pagar': 'sum'
             }).reset_index()
@@ -391,7 +366,7 @@ def api_ranking_melhores():
                 
         else:
             # Para tipologia: uma placa por tipologia (lógica original)
-            resultado_placas = df.groupby(['Placa', 'Tipologia']).agg({
+            resultado_placas = df.groupby(['Placa', 'Tipologia'], observed=True).agg({
                 'frete_receber': 'sum',
                 'frete_pagar': 'sum'
             }).reset_index()
@@ -491,7 +466,7 @@ def api_ranking_piores():
         # Definir agrupamento e lógica baseado no tipo de análise
         if tipo_analise == 'destino':
             # Para destinos: agrupar por destino apenas
-            resultado = df.groupby('DESTINO').agg({
+            resultado = df.groupby('DESTINO', observed=True).agg({
                 'frete_receber': 'sum',
                 'frete_pagar': 'sum'
             }).reset_index()
@@ -529,7 +504,7 @@ def api_ranking_piores():
                 
         elif tipo_analise == 'placa':
             # Para placas: agrupar por placa
-            resultado = df.groupby(['Placa', 'Tipologia']).agg({
+            resultado = df.groupby(['Placa', 'Tipologia'], observed=True).agg({
                 'frete_receber': 'sum',
                 'frete_pagar': 'sum'
             }).reset_index()
@@ -567,7 +542,7 @@ def api_ranking_piores():
                 
         else:
             # Para tipologia: uma placa por tipologia (lógica original)
-            resultado_placas = df.groupby(['Placa', 'Tipologia']).agg({
+            resultado_placas = df.groupby(['Placa', 'Tipologia'], observed=True).agg({
                 'frete_receber': 'sum',
                 'frete_pagar': 'sum'
             }).reset_index()
@@ -641,7 +616,7 @@ def api_analise_tipologia():
             return jsonify({'error': 'Nenhum dado disponível'}), 404
         
         # Agrupar por tipologia
-        analise = df.groupby('Tipologia').agg({
+        analise = df.groupby('Tipologia', observed=True).agg({
             'frete_receber': 'sum',
             'frete_pagar': 'sum',
             'margem_liquida': 'sum'
@@ -655,7 +630,7 @@ def api_analise_tipologia():
         )
         
         # Contar operações
-        operacoes = df.groupby('Tipologia').size()
+        operacoes = df.groupby('Tipologia', observed=True).size()
         analise['total_operacoes'] = operacoes
         
         # Converter para dicionário
@@ -688,7 +663,7 @@ def api_analise_destinos():
             return jsonify({'error': 'Nenhum dado disponível'}), 404
         
         # Agrupar por destino
-        analise = df.groupby('DESTINO').agg({
+        analise = df.groupby('DESTINO', observed=True).agg({
             'frete_receber': 'sum',
             'frete_pagar': 'sum',
             'margem_liquida': 'sum'
@@ -702,7 +677,7 @@ def api_analise_destinos():
         )
         
         # Contar operações
-        operacoes = df.groupby('DESTINO').size()
+        operacoes = df.groupby('DESTINO', observed=True).size()
         analise['total_operacoes'] = operacoes
         
         # Ordenar por margem percentual (melhor primeiro)
@@ -738,7 +713,7 @@ def api_analise_placas():
             return jsonify({'error': 'Nenhum dado disponível'}), 404
         
         # Agrupar por placa e tipologia
-        analise = df.groupby(['Placa', 'Tipologia']).agg({
+        analise = df.groupby(['Placa', 'Tipologia'], observed=True).agg({
             'frete_receber': 'sum',
             'frete_pagar': 'sum',
             'margem_liquida': 'sum'
@@ -752,7 +727,7 @@ def api_analise_placas():
         )
         
         # Contar operações
-        operacoes = df.groupby(['Placa', 'Tipologia']).size()
+        operacoes = df.groupby(['Placa', 'Tipologia'], observed=True).size()
         analise['total_operacoes'] = operacoes
         
         # Ordenar por margem percentual (melhor primeiro)
@@ -818,7 +793,7 @@ def api_limpar_cache():
     try:
         margem_service._cache = {}
         margem_service._df_cache = None
-        margem_service._last_modified = None
+        margem_service._versao_manifesto = None
         return jsonify({'status': 'success', 'message': 'Cache limpo com sucesso'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""
+Migrações versionadas do banco principal (financeiro.db).
+
+O schema.sql não declara índices secundários em contas_receber,
+contas_pagar, projecao, veiculos_suporte e custo_frota, então as buscas por
+cliente, fornecedor, período da projeção, tipologia e tipo de veículo
+varriam a tabela inteira. Cada migração aqui é um passo numerado e
+idempotente (CREATE INDEX IF NOT EXISTS via database.criar_indice, que
+reconhece o nome alternado da tabela sombra). A versão aplicada fica em
+schema_version; cada passo roda numa transação própria junto com o seu
+registro, então uma falha desfaz só aquele passo e a próxima inicialização
+tenta de novo a partir dele.
+
+verificar_planos() roda EXPLAIN QUERY PLAN nas consultas quentes dos
+dashboards e helpers e aponta as que ainda varrem a tabela.
+"""
+
+import time
+
+from .database import criar_indice
+
+MIGRACOES = [
+    (1, 'Índices de cliente/fornecedor em contas_receber e contas_pagar', (
+        "CREATE INDEX IF NOT EXISTS idx_contas_receber_cliente ON contas_receber (cliente, competencia_key)",
+        "CREATE INDEX IF NOT EXISTS idx_contas_pagar_fornecedor ON contas_pagar (fornecedor, competencia_key)",
+    )),
+    (2, 'Índices de período da projeção (mês/ano e chave yyyymmdd do calendário)', (
+        "CREATE INDEX IF NOT EXISTS idx_projecao_periodo ON projecao (ano, mes, dia)",
+        "CREATE INDEX IF NOT EXISTS idx_projecao_data_key ON projecao ((ano * 10000 + mes * 100 + dia))",
+    )),
+    (3, 'Índices de tipologia em veiculos_suporte e tipo de veículo em custo_frota', (
+        "CREATE INDEX IF NOT EXISTS idx_veiculos_suporte_tipologia ON veiculos_suporte (tipologia, ativo)",
+        "CREATE INDEX IF NOT EXISTS idx_custo_frota_tipo ON custo_frota (tipo_veiculo)",
+        "CREATE INDEX IF NOT EXISTS idx_custo_frota_tipo_upper ON custo_frota (UPPER(tipo_veiculo), ativo)",
+    )),
+]
+
+# (descrição, consulta, parâmetros) das consultas quentes que devem usar índice
+CONSULTAS_VERIFICADAS = [
+    ("Receitas por cliente na competência (dashboard)",
+     "SELECT cliente, SUM(valor_principal_centavos) FROM contas_receber "
+     "WHERE competencia_key = ? AND status = 'Recebido' AND cliente IN (?, ?) GROUP BY cliente",
+     (202401, 'ADORO', 'FRIBOI')),
+    ("Despesas por fornecedor no intervalo de competências (dashboard)",
+     "SELECT competencia_key, fornecedor, SUM(valor_principal_centavos) FROM contas_pagar "
+     "WHERE competencia_key BETWEEN ? AND ? GROUP BY competencia_key, fornecedor",
+     (202401, 202412)),
+    ("Contas a receber por vencimento (fluxo de caixa)",
+     "SELECT * FROM contas_receber WHERE venc_key BETWEEN ? AND ?",
+     (20240101, 20240131)),
+    ("Contas a pagar por vencimento (fluxo de caixa)",
+     "SELECT * FROM contas_pagar WHERE venc_key BETWEEN ? AND ?",
+     (20240101, 20240131)),
+    ("Títulos de um cliente",
+     "SELECT * FROM contas_receber WHERE cliente = ?",
+     ('ADORO',)),
+    ("Clientes distintos do razão (clientes principais)",
+     "SELECT DISTINCT cliente FROM contas_receber WHERE cliente IS NOT NULL",
+     ()),
+    ("Projeção do mês (tela de projeção)",
+     "SELECT cliente, dia, valor FROM projecao WHERE mes = ? AND ano = ?",
+     (1, 2024)),
+    ("Projeção por data do calendário (planejamento semanal)",
+     "SELECT cliente FROM projecao p WHERE p.ano * 10000 + p.mes * 100 + p.dia BETWEEN ? AND ?",
+     (20240101, 20240131)),
+    ("Veículo por placa (VeiculoHelper, logística)",
+     "SELECT tipologia, status FROM veiculos_suporte WHERE placa = ? AND ativo = 1",
+     ('ABC1D23',)),
+    ("Veículos por tipologia",
+     "SELECT placa FROM veiculos_suporte WHERE tipologia = ? AND ativo = 1",
+     ('TRUCK',)),
+    ("Custo da frota por tipologia (CustoFrotaHelper)",
+     "SELECT custo_fixo, custo_variavel FROM custo_frota WHERE UPPER(tipo_veiculo) = ? AND ativo = 1 LIMIT 1",
+     ('TRUCK',)),
+    ("Cliente padrão por nome",
+     "SELECT id FROM clientes_padrao WHERE nome = ?",
+     ('ADORO',)),
+]
+
+
+def garantir_tabela_versao(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT NOT NULL,
+            aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duracao_ms REAL
+        )
+    """)
+    conn.commit()
+
+
+def versao_atual(conn):
+    row = conn.execute("SELECT MAX(versao) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def aplicar_migracoes(conn, ate=None):
+    """
+    Aplica em ordem as migrações com versão acima da registrada (até a versão ate, se informada).
+    Para no primeiro passo que falhar, desfazendo só ele. Retorna as versões aplicadas.
+    """
+    garantir_tabela_versao(conn)
+    atual = versao_atual(conn)
+    aplicadas = []
+    cur = conn.cursor()
+    for versao, descricao, comandos in MIGRACOES:
+        if versao <= atual or (ate is not None and versao > ate):
+            continue
+        inicio = time.perf_counter()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            for ddl in comandos:
+                criar_indice(cur, ddl)
+            cur.execute(
+                "INSERT INTO schema_version (versao, descricao, duracao_ms) VALUES (?, ?, ?)",
+                (versao, descricao, round((time.perf_counter() - inicio) * 1000, 2))
+            )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ Migração {versao} ({descricao}) falhou e foi desfeita: {str(e)}")
+            break
+        aplicadas.append(versao)
+        print(f"🧱 Migração {versao} aplicada: {descricao}")
+    return aplicadas
+
+
+def _usa_indice(plano):
+    """True se todas as tabelas do plano são buscadas por índice (SEARCH); SCAN, mesmo de um índice, lê tudo."""
+    return not any(detalhe.startswith('SCAN') and detalhe != 'SCAN CONSTANT ROW' for detalhe in plano)
+
+
+def verificar_planos(conn):
+    """
+    EXPLAIN QUERY PLAN das consultas verificadas.
+    Retorna lista de (descricao, usa_indice, plano); consultas de tabelas ausentes são ignoradas.
+    """
+    resultados = []
+    for descricao, sql, params in CONSULTAS_VERIFICADAS:
+        try:
+            plano = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+        except Exception as e:
+            print(f"⚠️ Plano não verificado ({descricao}): {str(e)}")
+            continue
+        resultados.append((descricao, _usa_indice(plano), plano))
+    return resultados
+
+
+def avisar_planos_sem_indice(conn):
+    """Imprime as consultas verificadas que varrem a tabela. Retorna quantas são."""
+    sem_indice = [(d, p) for d, ok, p in verificar_planos(conn) if not ok]
+    for descricao, plano in sem_indice:
+        print(f"🐢 Consulta sem índice: {descricao} -> {' | '.join(plano)}")
+    return len(sem_indice)
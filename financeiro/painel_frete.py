@@ -1,9 +1,10 @@
 from flask import Blueprint, render_template, jsonify, request
 import pandas as pd
-import os
 import numpy as np
 from datetime import datetime
 
+from .manifesto_memoria import MANIFESTO_PATH, obter_manifesto
+
 def convert_to_json_serializable(obj):
     """Converte tipos numpy/pandas para tipos Python nativos"""
     if isinstance(obj, dict):
@@ -23,50 +24,16 @@ def convert_to_json_serializable(obj):
 
 painel_frete_bp = Blueprint('painel_frete', __name__)
 
-# Caminho para o arquivo de manifesto acumulado
-MANIFESTO_PATH = os.path.join(os.path.dirname(__file__), 'uploads', 'Manifesto_Acumulado.xlsx')
-
 class PainelFreteService:
     def __init__(self):
         self.df_manifesto = None
-        self.ultima_modificacao = None
-        self.carregar_dados()
-    
-    def verificar_atualizacao_arquivo(self):
-        """Verifica se o arquivo foi modificado desde a última leitura"""
-        try:
-            if os.path.exists(MANIFESTO_PATH):
-                modificacao_atual = os.path.getmtime(MANIFESTO_PATH)
-                if self.ultima_modificacao is None or modificacao_atual > self.ultima_modificacao:
-                    self.ultima_modificacao = modificacao_atual
-                    return True
-            return False
-        except Exception as e:
-            print(f"Erro ao verificar modificação do arquivo: {e}")
-            return False
+        self.versao_manifesto = None
+        # Nada é lido no import: o manifesto compartilhado carrega na primeira requisição
     
     def carregar_dados(self, forcar_recarga=False):
-        """Carrega dados do Excel, recarregando se necessário"""
+        """Manifesto compartilhado (manifesto_memoria), relido só quando o arquivo muda"""
         try:
-            # Verificar se precisa recarregar
-            if not forcar_recarga and not self.verificar_atualizacao_arquivo():
-                return self.df_manifesto  # Dados já estão atualizados, retornar DataFrame existente
-                
-            if os.path.exists(MANIFESTO_PATH):
-                print("🔄 Recarregando dados do manifesto...")
-                self.df_manifesto = pd.read_excel(MANIFESTO_PATH)
-                self.df_manifesto['Data'] = pd.to_datetime(self.df_manifesto['Data'], errors='coerce')
-                self.df_manifesto['Mes'] = self.df_manifesto['Data'].dt.month
-                self.df_manifesto['Ano'] = self.df_manifesto['Data'].dt.year
-                self.df_manifesto['Dia'] = self.df_manifesto['Data'].dt.day
-                
-                self.df_manifesto['Frete Correto'] = pd.to_numeric(self.df_manifesto['Frete Correto'], errors='coerce').fillna(0)
-                self.df_manifesto['Despesas Gerais'] = pd.to_numeric(self.df_manifesto['Despesas Gerais'], errors='coerce').fillna(0)
-                
-                print(f"✅ Dados carregados: {len(self.df_manifesto)} registros")
-            else:
-                print(f"❌ Arquivo não encontrado: {MANIFESTO_PATH}")
-                self.df_manifesto = pd.DataFrame()
+            self.df_manifesto, self.versao_manifesto = obter_manifesto(MANIFESTO_PATH, recarregar=forcar_recarga)
         except Exception as e:
             print(f"❌ Erro ao carregar dados: {e}")
             self.df_manifesto = pd.DataFrame()
@@ -100,7 +67,8 @@ class PainelFreteService:
         if self.df_manifesto.empty:
             return pd.DataFrame()
         
-        df_filtrado = self.df_manifesto.copy()
+        # Cópia rasa: os filtros geram frames novos e o manifesto compartilhado não é alterado
+        df_filtrado = self.df_manifesto.copy(deep=False)
         
         try:
             if perfil:
@@ -141,7 +109,7 @@ class PainelFreteService:
             
             # Cliente mais rentável
             if 'Cliente_Real' in df_filtrado.columns:
-                cliente_rentabilidade = df_filtrado.groupby('Cliente_Real').agg({
+                cliente_rentabilidade = df_filtrado.groupby('Cliente_Real', observed=True).agg({
                     'Frete Correto': 'sum',
                     'Despesas Gerais': 'sum'
                 })
@@ -177,7 +145,7 @@ class PainelFreteService:
         
         try:
             # Agrupar por dia
-            dados_diarios = df_filtrado.groupby('Dia').agg({
+            dados_diarios = df_filtrado.groupby('Dia', observed=True).agg({
                 'Frete Correto': 'sum',
                 'Despesas Gerais': 'sum'
             }).reset_index()
@@ -212,7 +180,7 @@ class PainelFreteService:
         if not df_filtrado.empty:
             try:
                 # Agrupar por mês
-                dados_mensais = df_filtrado.groupby('Mes').agg({
+                dados_mensais = df_filtrado.groupby('Mes', observed=True).agg({
                     'Frete Correto': 'sum',
                     'Despesas Gerais': 'sum'
                 }).reset_index()
@@ -246,7 +214,7 @@ class PainelFreteService:
         
         try:
             # Agrupar por cliente
-            dados_clientes = df_filtrado.groupby('Cliente_Real').agg({
+            dados_clientes = df_filtrado.groupby('Cliente_Real', observed=True).agg({
                 'Frete Correto': 'sum',
                 'Despesas Gerais': 'sum'
             }).reset_index()
@@ -275,7 +243,7 @@ class PainelFreteService:
         
         try:
             # Agrupar por veículo
-            dados_veiculos = df_filtrado.groupby('Veículo').agg({
+            dados_veiculos = df_filtrado.groupby('Veículo', observed=True).agg({
                 'Frete Correto': 'sum',
                 'Despesas Gerais': 'sum'
             }).reset_index()
@@ -358,7 +326,7 @@ def api_detalhes_receita():
             return jsonify({'error': 'Nenhum dado encontrado'})
         
         # Todos os clientes (não apenas top 5)
-        top_clientes = df_filtrado.groupby('Cliente_Real').agg({
+        top_clientes = df_filtrado.groupby('Cliente_Real', observed=True).agg({
             'Frete Correto': 'sum'
         }).reset_index().sort_values('Frete Correto', ascending=False)
         
@@ -366,13 +334,13 @@ def api_detalhes_receita():
         top_clientes['participacao_pct'] = (top_clientes['Frete Correto'] / total_faturado * 100).round(1)
         
         # Todos os veículos (não apenas top 5)
-        top_veiculos = df_filtrado.groupby('Veículo').agg({
+        top_veiculos = df_filtrado.groupby('Veículo', observed=True).agg({
             'Frete Correto': 'sum',
             'Manifesto': 'count'  # Número de viagens
         }).reset_index().sort_values('Frete Correto', ascending=False)
         
         # Criar tabela completa combinando cliente e veículo
-        tabela_completa = df_filtrado.groupby(['Cliente_Real', 'Veículo']).agg({
+        tabela_completa = df_filtrado.groupby(['Cliente_Real', 'Veículo'], observed=True).agg({
             'Frete Correto': 'sum',
             'Manifesto': 'count'
         }).reset_index().sort_values('Frete Correto', ascending=False)
@@ -431,7 +399,7 @@ def api_detalhes_despesas():
             return jsonify({'error': 'Nenhum dado encontrado'})
         
         # Todas as despesas por cliente e veículo
-        top_despesas = df_filtrado.groupby(['Cliente_Real', 'Veículo']).agg({
+        top_despesas = df_filtrado.groupby(['Cliente_Real', 'Veículo'], observed=True).agg({
             'Despesas Gerais': 'sum'
         }).reset_index().sort_values('Despesas Gerais', ascending=False)
         
@@ -439,7 +407,7 @@ def api_detalhes_despesas():
         top_despesas['participacao_pct'] = (top_despesas['Despesas Gerais'] / total_despesas * 100).round(1)
         
         # Veículo mais usado
-        veiculo_mais_usado = df_filtrado.groupby('Veículo').agg({
+        veiculo_mais_usado = df_filtrado.groupby('Veículo', observed=True).agg({
             'Manifesto': 'count'
         }).reset_index().sort_values('Manifesto', ascending=False).iloc[0]
         
@@ -495,6 +463,10 @@ def api_detalhes_despesas_completo():
         if df_filtrado.empty:
             return jsonify({'error': 'Nenhum dado encontrado'})
         
+        # Colunas compactadas em float32 (manifesto_memoria) voltam ao decimal digitado: 601.14, não 601.1400146484375
+        for coluna in df_filtrado.select_dtypes(include=np.float32).columns:
+            df_filtrado[coluna] = df_filtrado[coluna].astype(str).astype(float)
+        
         # Converter DataFrame para lista de dicionários
         registros = []
         for _, row in df_filtrado.iterrows():
@@ -542,7 +514,7 @@ def api_detalhes_margem_completo():
         # Calcular dados agregados por cliente e veículo
         detalhes = []
         if 'Cliente_Real' in df_filtrado.columns:
-            agrupado = df_filtrado.groupby(['Cliente_Real', 'Veículo']).agg({
+            agrupado = df_filtrado.groupby(['Cliente_Real', 'Veículo'], observed=True).agg({
                 'Frete Correto': 'sum',
                 'Despesas Gerais': 'sum',
                 'Data': 'first'
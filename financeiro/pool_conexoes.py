@@ -0,0 +1,207 @@
+"""
+Pool de conexões SQLite por thread.
+
+database.get_connection() e DatabaseManager.get_connection() abriam uma
+conexão nova a cada chamada e reexecutavam os PRAGMAs; helpers chamados em
+laço (CustoFrotaHelper, ClienteHelper) pagavam isso centenas de vezes por
+requisição. Aqui cada thread mantém conexões já configuradas por arquivo de
+banco: os PRAGMAs e o cache de instruções preparadas são aplicados uma vez.
+
+O conn.close() dos chamadores continua valendo: a conexão volta ociosa para
+o pool da thread em vez de ser fechada. Na devolução, a transação aberta é
+desfeita (como o close faria), os cursores ainda abertos são fechados (um
+SELECT não consumido prenderia a conexão num snapshot antigo do WAL) e
+row_factory/isolation_level voltam ao padrão. Chamadas aninhadas na mesma
+thread recebem conexões distintas, como antes.
+
+No Flask, liberar_conexoes_da_thread() roda no teardown de cada requisição
+e devolve ao pool as conexões que o código esqueceu de fechar.
+"""
+
+import os
+import sqlite3
+import threading
+import weakref
+from urllib.request import url2pathname
+
+from . import instrumentacao_sql
+
+# Instruções preparadas mantidas por conexão (padrão do sqlite3: 128)
+CACHE_INSTRUCOES = 256
+
+# Conexões ociosas guardadas por thread e por banco; as excedentes são fechadas
+MAX_OCIOSAS_POR_THREAD = 4
+
+PRAGMAS_PADRAO = (
+    # WAL (write-ahead logging) para melhorar concorrência entre leitura/escrita
+    'PRAGMA journal_mode=WAL;',
+    # SQLite aguarda locks por até 30s
+    'PRAGMA busy_timeout = 30000;',
+)
+
+
+class ConexaoPool(sqlite3.Connection):
+    """Conexão cujo close() a devolve ao pool da thread. fechar() fecha de verdade."""
+
+    def cursor(self, *args, **kwargs):
+        if instrumentacao_sql.ATIVO and not args and 'factory' not in kwargs:
+            kwargs['factory'] = instrumentacao_sql.CursorInstrumentado
+        cur = super().cursor(*args, **kwargs)
+        self._cursores.add(cur)
+        return cur
+
+    # Connection.execute* não passam por self.cursor(); sem isso os cursores não seriam rastreados
+    def execute(self, *args, **kwargs):
+        return self.cursor().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self.cursor().executemany(*args, **kwargs)
+
+    def executescript(self, *args, **kwargs):
+        return self.cursor().executescript(*args, **kwargs)
+
+    def close(self):
+        pool = self.__dict__.get('_pool')
+        if pool is None or not pool.devolver(self):
+            self.fechar()
+
+    def fechar(self):
+        pool = self.__dict__.pop('_pool', None)
+        if pool is not None:
+            pool.esquecer(self)
+        super().close()
+
+
+class PoolConexoes:
+    """Conexões ociosas por (thread, banco, configuração)."""
+
+    def __init__(self, max_ociosas=MAX_OCIOSAS_POR_THREAD):
+        self.max_ociosas = max_ociosas
+        self._local = threading.local()
+
+    def _estado(self):
+        if not hasattr(self._local, 'ociosas'):
+            self._local.ociosas = {}
+            self._local.em_uso = weakref.WeakSet()
+        return self._local
+
+    def _abrir(self, chave):
+        caminho, timeout, pragmas, row_factory = chave
+        conn = sqlite3.connect(caminho, timeout=timeout, factory=ConexaoPool,
+                               cached_statements=CACHE_INSTRUCOES, uri=caminho.startswith('file:'))
+        conn._cursores = weakref.WeakSet()
+        conn._chave = chave
+        conn._row_factory_padrao = row_factory
+        conn.row_factory = row_factory
+        for pragma in pragmas:
+            try:
+                conn.execute(pragma).close()
+            except Exception:
+                # Se a execução das PRAGMAs falhar (por exemplo, em bancos remotos), seguimos com a conexão.
+                # Um ATTACH que falha não: as consultas dariam 'no such table' longe da causa
+                if pragma.lstrip().upper().startswith('ATTACH'):
+                    conn.fechar()
+                    raise
+        conn._inode = _inode(caminho)
+        conn._pool = self
+        return conn
+
+    def obter(self, caminho, timeout=30, pragmas=PRAGMAS_PADRAO, row_factory=sqlite3.Row):
+        """Conexão ociosa da thread para o banco (ou uma nova, já configurada). Aceita URI 'file:...'."""
+        if not caminho.startswith('file:'):
+            caminho = os.path.abspath(caminho)
+        chave = (caminho, timeout, tuple(pragmas), row_factory)
+        estado = self._estado()
+        ociosas = estado.ociosas.setdefault(chave, [])
+
+        conn = None
+        while ociosas and conn is None:
+            candidata = ociosas.pop()
+            # Arquivo recriado (ex: banco apagado e reinicializado): a conexão aponta para o antigo
+            if candidata._inode != _inode(caminho):
+                candidata.fechar()
+            else:
+                conn = candidata
+        if conn is None:
+            conn = self._abrir(chave)
+        estado.em_uso.add(conn)
+        return conn
+
+    def devolver(self, conn):
+        """Prepara a conexão para o próximo uso e a guarda ociosa. Retorna False se ela deve ser fechada."""
+        estado = self._estado()
+        if conn not in estado.em_uso:
+            # Conexão de outra thread, ou devolvida duas vezes
+            return conn in estado.ociosas.get(conn._chave, ())
+        estado.em_uso.discard(conn)
+        try:
+            for cur in list(conn._cursores):
+                cur.close()
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = conn._row_factory_padrao
+            conn.isolation_level = ''
+        except Exception:
+            return False
+
+        ociosas = estado.ociosas.setdefault(conn._chave, [])
+        if len(ociosas) >= self.max_ociosas:
+            return False
+        ociosas.append(conn)
+        return True
+
+    def esquecer(self, conn):
+        estado = self._estado()
+        estado.em_uso.discard(conn)
+        ociosas = estado.ociosas.get(getattr(conn, '_chave', None), [])
+        if conn in ociosas:
+            ociosas.remove(conn)
+
+    def liberar_thread(self):
+        """Devolve ao pool as conexões da thread que não foram fechadas. Retorna quantas eram."""
+        estado = self._estado()
+        esquecidas = list(estado.em_uso)
+        for conn in esquecidas:
+            conn.close()
+        return len(esquecidas)
+
+    def fechar_ociosas(self, filtro):
+        """Fecha de verdade as conexões ociosas da thread cujo caminho passa no filtro. Retorna quantas."""
+        estado = self._estado()
+        fechadas = 0
+        for chave in [c for c in estado.ociosas if filtro(c[0])]:
+            for conn in estado.ociosas.pop(chave):
+                conn.fechar()
+                fechadas += 1
+        return fechadas
+
+    def fechar_thread(self):
+        """Fecha de verdade todas as conexões ociosas da thread (ex: fim de uma thread de trabalho)."""
+        estado = self._estado()
+        for ociosas in list(estado.ociosas.values()):
+            for conn in list(ociosas):
+                conn.fechar()
+        estado.ociosas.clear()
+
+
+def _inode(caminho):
+    if caminho.startswith('file:'):
+        caminho = url2pathname(caminho[len('file:'):].split('?', 1)[0])
+    try:
+        return os.stat(caminho).st_ino
+    except OSError:
+        return None
+
+
+pool_conexoes = PoolConexoes()
+
+
+def obter_conexao(caminho, timeout=30, pragmas=PRAGMAS_PADRAO, row_factory=sqlite3.Row):
+    return pool_conexoes.obter(caminho, timeout, pragmas, row_factory)
+
+
+def liberar_conexoes_da_thread(exc=None):
+    """Gancho de teardown do Flask: conexões esquecidas voltam ao pool com a transação desfeita."""
+    esquecidas = pool_conexoes.liberar_thread()
+    if esquecidas:
+        print(f"⚠️ {esquecidas} conexão(ões) SQLite não fechada(s) na requisição devolvida(s) ao pool")
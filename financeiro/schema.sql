@@ -17,6 +17,7 @@ CREATE TABLE IF NOT EXISTS contas_receber (
     vencimento_original TEXT,
     competencia TEXT,
     valor_principal REAL,
+    valor_principal_centavos INTEGER,
     juros_desc REAL,
     valor_titulo REAL,
     data_baixa TEXT,
@@ -28,7 +29,15 @@ CREATE TABLE IF NOT EXISTS contas_receber (
     conta_contabil TEXT,
     centro_custo TEXT,
     status TEXT,
-    descricao_receita TEXT
+    descricao_receita TEXT,
+    -- Chaves de data ordenáveis (yyyymmdd; competência em yyyymm) para range scans
+    venc_key INTEGER,
+    emissao_key INTEGER,
+    baixa_key INTEGER,
+    competencia_key INTEGER,
+    -- Importação incremental: chave natural do título e hash do conteúdo da linha
+    chave_natural TEXT,
+    hash_conteudo INTEGER
 );
 
 -- Tabela de suporte para veículos do frete
@@ -67,6 +76,7 @@ CREATE TABLE IF NOT EXISTS contas_pagar (
     vencimento_original TEXT,
     competencia TEXT,
     valor_principal REAL,
+    valor_principal_centavos INTEGER,
     juros_desc REAL,
     valor_titulo REAL,
     data_baixa TEXT,
@@ -78,7 +88,15 @@ CREATE TABLE IF NOT EXISTS contas_pagar (
     conta_contabil TEXT,
     centro_custo TEXT,
     status TEXT,
-    descricao_despesa TEXT
+    descricao_despesa TEXT,
+    -- Chaves de data ordenáveis (yyyymmdd; competência em yyyymm) para range scans
+    venc_key INTEGER,
+    emissao_key INTEGER,
+    baixa_key INTEGER,
+    competencia_key INTEGER,
+    -- Importação incremental: chave natural do título e hash do conteúdo da linha
+    chave_natural TEXT,
+    hash_conteudo INTEGER
 );
 
 CREATE TABLE IF NOT EXISTS projecao (
@@ -88,6 +106,7 @@ CREATE TABLE IF NOT EXISTS projecao (
     ano INTEGER NOT NULL,
     dia INTEGER NOT NULL CHECK(dia BETWEEN 1 AND 31),
     valor REAL NOT NULL,
+    valor_centavos INTEGER,
     criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -0,0 +1,172 @@
+"""
+Snapshot somente leitura do banco para os dashboards analíticos.
+
+/resumo, /api/dados_executivo e build_dashboard_data_with_filters liam o
+mesmo financeiro.db que as importações e o salvamento da projeção gravam:
+uma importação longa atrasava os dashboards e as varreduras longas dos
+dashboards seguravam o checkpoint do WAL. Depois de cada escrita bem
+sucedida, uma thread de fundo copia o banco com a API de backup online do
+SQLite (cópia consistente, sem bloquear quem grava) para um arquivo novo,
+financeiro_analitico.<versão>.db; a versão mais recente é a publicada.
+
+Cada cópia tem nome próprio porque o pool mantém conexões ociosas abertas
+no snapshot em uso, e no Windows um arquivo aberto pelo SQLite não pode ser
+sobrescrito nem apagado. Ao notar uma versão nova, cada thread fecha as
+suas conexões ociosas nas versões antigas; as antigas são apagadas na
+cópia seguinte (as que ainda estiverem abertas ficam para a próxima).
+
+As consultas dos dashboards abrem o snapshot com immutable=1: sem locks,
+sem WAL e sem verificar mudanças no arquivo, então nunca disputam com as
+escritas. Publicar um snapshot novo invalida o cache de resultados. Enquanto
+não existe snapshot (primeira execução), ou se a última cópia falhou, as
+leituras vão para o banco vivo.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.request import pathname2url
+
+from .cache_resultados import invalidar_cache
+from .database import DB_PATH, get_connection
+from .pool_conexoes import obter_conexao, pool_conexoes
+
+ATIVO = True
+
+SNAPSHOT_DIR = os.path.dirname(DB_PATH)
+_RE_SNAPSHOT = re.compile(r"^financeiro_analitico\.(\d+)\.db$")
+
+_lock = threading.Lock()
+_pendente = False
+_trabalhando = False
+# Última cópia falhou: as leituras voltam ao banco vivo até a próxima cópia bem sucedida
+_falhou = False
+_local = threading.local()
+
+
+def _uri(caminho):
+    return f"file:{pathname2url(caminho)}?immutable=1"
+
+
+def _eh_snapshot(caminho):
+    return bool(_RE_SNAPSHOT.match(os.path.basename(caminho.split('?', 1)[0])))
+
+
+def _versoes():
+    """Snapshots existentes, do mais novo para o mais antigo."""
+    versoes = []
+    try:
+        nomes = os.listdir(SNAPSHOT_DIR)
+    except OSError:
+        return []
+    for nome in nomes:
+        m = _RE_SNAPSHOT.match(nome)
+        if m:
+            versoes.append((int(m.group(1)), os.path.join(SNAPSHOT_DIR, nome)))
+    return [caminho for _, caminho in sorted(versoes, reverse=True)]
+
+
+def snapshot_atual():
+    """Caminho do snapshot publicado, ou None."""
+    versoes = _versoes()
+    return versoes[0] if versoes else None
+
+
+def _limpar_versoes_antigas():
+    for caminho in _versoes()[1:]:
+        try:
+            os.remove(caminho)
+        except OSError:
+            # Ainda aberto por alguma conexão (Windows): removido numa próxima cópia
+            pass
+
+
+def gerar_snapshot():
+    """Copia financeiro.db para uma versão nova do snapshot (API de backup) e a publica. Retorna o tempo em segundos."""
+    global _falhou
+    inicio = time.perf_counter()
+    caminho = os.path.join(SNAPSHOT_DIR, f"financeiro_analitico.{time.time_ns()}.db")
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    try:
+        origem = sqlite3.connect(DB_PATH, timeout=30)
+        destino = sqlite3.connect(temporario)
+        try:
+            # Um único passo: a cópia inteira sai de uma mesma transação de leitura
+            origem.backup(destino)
+            # A cópia herda o modo WAL da origem; immutable=1 precisa de um arquivo autocontido
+            destino.execute("PRAGMA journal_mode=DELETE").fetchone()
+        finally:
+            destino.close()
+            origem.close()
+        # Nome novo, nunca aberto; as tentativas cobrem travas passageiras (antivírus, OneDrive)
+        for tentativa in range(5):
+            try:
+                os.replace(temporario, caminho)
+                break
+            except OSError as e:
+                if tentativa == 4:
+                    raise
+                print(f"⚠️ Tentativa {tentativa+1} de publicar o snapshot falhou: {str(e)}")
+                time.sleep(0.5)
+    except Exception:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+
+    _falhou = False
+    # Resultados calculados sobre o snapshot anterior deixam de valer
+    invalidar_cache()
+    _limpar_versoes_antigas()
+    tempo = time.perf_counter() - inicio
+    print(f"📸 Snapshot analítico atualizado em {tempo:.2f}s")
+    return tempo
+
+
+def _trabalhar():
+    global _pendente, _trabalhando, _falhou
+    while True:
+        with _lock:
+            if not _pendente:
+                _trabalhando = False
+                return
+            _pendente = False
+        try:
+            gerar_snapshot()
+        except Exception as e:
+            print(f"⚠️ Não foi possível atualizar o snapshot analítico: {str(e)}")
+            # O snapshot publicado não tem a escrita que pediu a cópia: lê do banco vivo
+            _falhou = True
+            invalidar_cache()
+
+
+def agendar_snapshot():
+    """
+    Pede um snapshot novo em segundo plano. Pedidos feitos durante uma cópia em andamento
+    viram uma única cópia seguinte.
+    """
+    global _pendente, _trabalhando
+    if not ATIVO:
+        return
+    with _lock:
+        _pendente = True
+        if _trabalhando:
+            return
+        _trabalhando = True
+    threading.Thread(target=_trabalhar, name="snapshot-analitico", daemon=True).start()
+
+
+def get_connection_analitica():
+    """Conexão de leitura dos dashboards: o snapshot imutável ou, sem ele, o banco vivo."""
+    caminho = snapshot_atual() if ATIVO and not _falhou else None
+    if caminho is None:
+        return get_connection()
+    uri = _uri(caminho)
+    if getattr(_local, 'uri', None) != uri:
+        # Versão nova publicada: solta as ociosas desta thread nas versões antigas
+        pool_conexoes.fechar_ociosas(lambda c: c != uri and _eh_snapshot(c))
+        _local.uri = uri
+    return obter_conexao(uri, pragmas=())
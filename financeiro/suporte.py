@@ -3,6 +3,7 @@ import sqlite3
 from datetime import datetime
 from pathlib import Path
 from .database import get_connection
+from .cache_planilhas import aba_ativa, ler_planilha
 
 bp = Blueprint('suporte', __name__, url_prefix='/frete/suporte')
 
@@ -111,20 +112,18 @@ def delete_veiculo(placa):
 def detect_placas_novas():
     """Detecta placas novas no Manifesto_Frete.xlsx"""
     try:
-        import openpyxl
         manifesto_path = Path(__file__).parent / 'uploads' / 'frete' / 'Manifesto_Frete.xlsx'
         
         if not manifesto_path.exists():
             return jsonify({'error': 'Arquivo Manifesto_Frete.xlsx não encontrado'}), 404
         
-        # Ler placas do manifesto
-        wb = openpyxl.load_workbook(str(manifesto_path))
-        ws = wb.active
+        # Ler placas do manifesto (aba ativa do arquivo, via cache colunar)
+        df = ler_planilha(str(manifesto_path), sheet_name=aba_ativa(str(manifesto_path)), header=None)
         
         placas_manifesto = set()
         # Assumindo que a coluna D contém as placas (Veículos)
-        for row in range(2, ws.max_row + 1):  # Skip header
-            placa = ws.cell(row=row, column=4).value  # Coluna D
+        placas = df.iloc[1:, 3] if df.shape[1] > 3 else []  # Skip header
+        for placa in placas:
             if placa and isinstance(placa, str):
                 placa_clean = placa.strip().upper()
                 if placa_clean:
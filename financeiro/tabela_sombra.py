@@ -0,0 +1,129 @@
+"""
+Recarga completa em tabela sombra com troca atômica.
+
+A recarga completa apagava a tabela viva e a preenchia em seguida: quem
+abria /dashboard no meio da importação via o razão vazio ou pela metade, e
+o lock de escrita ficava preso durante toda a carga. Aqui a carga vai para
+<tabela>__staging, que recebe os mesmos índices da tabela viva, e a troca
+é uma única transação curta de ALTER TABLE ... RENAME. Leitores nunca
+esperam pela carga nem enxergam dados parciais.
+
+Como o SQLite não renomeia índices, os índices da sombra recebem o nome
+alternado (sufixo __alt, ou sem ele quando a tabela viva já o usa); a cada
+recarga completa os nomes se alternam. database.indice_existe reconhece os
+dois nomes, para os "CREATE INDEX IF NOT EXISTS" não duplicarem índices.
+"""
+
+import re
+
+from .database import nome_indice_alternado
+
+SUFIXO_STAGING = '__staging'
+SUFIXO_ANTIGA = '__antiga'
+
+
+def nome_staging(tabela):
+    return f"{tabela}{SUFIXO_STAGING}"
+
+
+def _ddl_tabela(cur, tabela):
+    cur.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _renomear_ddl(ddl, tabela, novo_nome):
+    """Troca o nome da tabela no CREATE TABLE (com ou sem aspas, com ou sem IF NOT EXISTS)."""
+    padrao = re.compile(
+        r'CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?["`\[]?' + re.escape(tabela) + r'["`\]]?',
+        re.IGNORECASE
+    )
+    return padrao.sub(f'CREATE TABLE {novo_nome}', ddl, count=1)
+
+
+def criar_tabela_sombra(conn, tabela, ddl=None):
+    """
+    (Re)cria <tabela>__staging vazia, com o DDL informado ou, sem ele, com o mesmo DDL da tabela viva.
+    Retorna o nome da tabela sombra.
+    """
+    cur = conn.cursor()
+    staging = nome_staging(tabela)
+    ddl = ddl or _ddl_tabela(cur, tabela)
+    if not ddl:
+        raise ValueError(f"Tabela {tabela} não existe para criar a sombra")
+
+    cur.execute(f"DROP TABLE IF EXISTS {staging}")
+    cur.execute(_renomear_ddl(ddl, tabela, staging))
+    conn.commit()
+    return staging
+
+
+def indexar_tabela_sombra(conn, tabela):
+    """
+    Recria na sombra os índices da tabela viva, com o nome alternado.
+    Índices que não se aplicam à sombra (coluna inexistente) são ignorados.
+    """
+    cur = conn.cursor()
+    staging = nome_staging(tabela)
+    cur.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (tabela,)
+    )
+    criados = 0
+    for nome, sql in cur.fetchall():
+        alternado = nome_indice_alternado(nome)
+        ddl = re.sub(
+            r'(INDEX\s+(IF\s+NOT\s+EXISTS\s+)?)["`\[]?' + re.escape(nome) + r'["`\]]?\s+ON\s+["`\[]?'
+            + re.escape(tabela) + r'["`\]]?',
+            lambda m: f"{m.group(1)}{alternado} ON {staging}",
+            sql, count=1, flags=re.IGNORECASE
+        )
+        try:
+            cur.execute(f"DROP INDEX IF EXISTS {alternado}")
+            cur.execute(ddl)
+            criados += 1
+        except Exception as e:
+            print(f"⚠️ Índice {nome} não recriado na tabela sombra: {str(e)}")
+    conn.commit()
+    return criados
+
+
+def trocar_tabela_sombra(conn, tabela):
+    """
+    Troca a tabela viva pela sombra numa transação curta (dois RENAME) e descarta a antiga depois.
+    legacy_alter_table evita que o RENAME reescreva referências de views/triggers para a tabela antiga.
+    """
+    cur = conn.cursor()
+    staging = nome_staging(tabela)
+    antiga = f"{tabela}{SUFIXO_ANTIGA}"
+
+    existe = _ddl_tabela(cur, tabela) is not None
+    cur.execute(f"DROP TABLE IF EXISTS {antiga}")
+    conn.commit()
+    cur.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        if existe:
+            cur.execute(f"ALTER TABLE {tabela} RENAME TO {antiga}")
+        cur.execute(f"ALTER TABLE {staging} RENAME TO {tabela}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.execute("PRAGMA legacy_alter_table = OFF")
+
+    # Fora da transação da troca: liberar as páginas da tabela antiga pode demorar
+    cur.execute(f"DROP TABLE IF EXISTS {antiga}")
+    conn.commit()
+    print(f"🔀 Tabela {tabela} trocada pela carga nova")
+
+
+def descartar_tabela_sombra(conn, tabela):
+    """Remove a sombra após uma carga que falhou."""
+    try:
+        conn.rollback()
+        conn.execute(f"DROP TABLE IF EXISTS {nome_staging(tabela)}")
+        conn.commit()
+    except Exception as e:
+        print(f"⚠️ Não foi possível descartar a tabela sombra de {tabela}: {str(e)}")
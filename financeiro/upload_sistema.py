@@ -1,9 +1,11 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, session
 import os
 import re
+import time
 from werkzeug.utils import secure_filename
 from datetime import datetime
 from .manifesto import processar_manifesto, extrair_mes_ano_de_arquivo
+from .deduplicacao_upload import receber_upload, registrar_importacao
 import threading
 import importlib.util
 import traceback
@@ -134,6 +136,20 @@ def schedule_acumulador_background():
         except Exception:
             pass
 
+def _flash_duplicado(rotulo, anterior):
+    """Upload idêntico ao último processado para o mesmo destino: mostra o resultado anterior."""
+    mensagem = (anterior.get('resultado') or {}).get('mensagem', '')
+    flash(f'♻️ {rotulo}: arquivo idêntico ao já processado em {anterior["data_importacao"]}, '
+          f'nada a reprocessar. {mensagem}')
+
+
+def _registrar(arquivo, tamanho, tipo, hash_arquivo, resultado, inicio):
+    registrar_importacao(
+        arquivo.filename, tamanho, tipo, hash_arquivo, resultado.get('success'), resultado.get('message'),
+        tempo=round(time.time() - inicio, 2), usuario=session.get('user_name')
+    )
+
+
 bp = Blueprint('upload_sistema', __name__, url_prefix='/upload')
 
 @bp.route('/')
@@ -174,6 +190,8 @@ def processar():
 
     # Se for manifesto, tentar extrair mês/ano e renomear antes de processar
     saved_path = None
+    anterior = None
+    inicio = time.time()
     if tipo_final == 'manifesto':
         # Extrair mês/ano do arquivo (usa file-like)
         try:
@@ -189,9 +207,10 @@ def processar():
         os.makedirs(uploads_dir, exist_ok=True)
         destino = os.path.join(uploads_dir, novo_nome)
 
-        # Se existir, sobrescrevemos (usuário quer apenas um arquivo por mês)
-        arquivo.stream.seek(0)
-        arquivo.save(destino)
+        # Se existir, sobrescrevemos (usuário quer apenas um arquivo por mês),
+        # a não ser que seja o mesmo arquivo já integrado
+        tipo_historico = f"manifesto:{novo_nome}"
+        hash_arquivo, tamanho, anterior = receber_upload(arquivo, destino, tipo_historico)
         saved_path = destino
     
     # Por enquanto só mostra que recebeu o arquivo com o tipo
@@ -336,6 +355,9 @@ def processar():
             except Exception as e:
                 return {"success": False, "message": f"❌ Erro: {str(e)}", "backup_path": None}
         
+        if anterior:
+            _flash_duplicado('MANIFESTO', anterior)
+            return redirect(url_for('upload_sistema.index'))
         if saved_path:
             resultado = integrar_manifesto_inline(saved_path)
         else:
@@ -344,6 +366,7 @@ def processar():
             temp_path = os.path.join(uploads_dir, secure_filename(arquivo.filename))
             arquivo.save(temp_path)
             resultado = integrar_manifesto_inline(temp_path)
+        _registrar(arquivo, tamanho, tipo_historico, hash_arquivo, resultado, inicio)
         
         if resultado['success']:
             backup_info = f" (backup: {os.path.basename(resultado['backup_path'])})" if resultado['backup_path'] else ""
@@ -370,12 +393,16 @@ def processar():
         os.makedirs(uploads_dir, exist_ok=True)
         destino = os.path.join(uploads_dir, novo_nome)
 
-        # salvar (sobrescrever se necessário)
-        arquivo.stream.seek(0)
-        arquivo.save(destino)
+        # salvar (sobrescrever se necessário), pulando o processamento se for o mesmo arquivo
+        tipo_historico = f"valencio:{novo_nome}"
+        hash_arquivo, tamanho, anterior = receber_upload(arquivo, destino, tipo_historico)
+        if anterior:
+            _flash_duplicado('VALENCIO', anterior)
+            return redirect(url_for('upload_sistema.index'))
 
         from .valencio import processar_valencio
         resultado = processar_valencio(destino)
+        _registrar(arquivo, tamanho, tipo_historico, hash_arquivo, resultado, inicio)
         if resultado['success']:
             flash(f'✅ VALENCIO: {resultado["message"]}')
             # Agendar atualização do Manifesto_Acumulado em background (Valencio afeta coluna "Frete Correto")
@@ -400,12 +427,16 @@ def processar():
         os.makedirs(uploads_dir, exist_ok=True)
         destino = os.path.join(uploads_dir, novo_nome)
 
-        # salvar (sobrescrever se necessário)
-        arquivo.stream.seek(0)
-        arquivo.save(destino)
+        # salvar (sobrescrever se necessário), pulando o processamento se for o mesmo arquivo
+        tipo_historico = f"pamplona:{novo_nome}"
+        hash_arquivo, tamanho, anterior = receber_upload(arquivo, destino, tipo_historico)
+        if anterior:
+            _flash_duplicado('PAMPLONA', anterior)
+            return redirect(url_for('upload_sistema.index'))
 
         from .pamplona import processar_pamplona
         resultado = processar_pamplona(destino)
+        _registrar(arquivo, tamanho, tipo_historico, hash_arquivo, resultado, inicio)
         if resultado['success']:
             flash(f'✅ PAMPLONA: {resultado["message"]}')
             # Agendar atualização do Manifesto_Acumulado em background (Pamplona pode afetar o acumulado)
@@ -140,6 +140,75 @@ class VeiculoHelper:
             print(f"❌ Erro ao buscar múltiplas placas: {e}")
             return {}
     
+    @staticmethod
+    def buscar_placas_com_custo(placas: List[str]) -> Dict[str, Dict]:
+        """
+        Como buscar_multiplas_placas, mais o custo da frota da tipologia de cada veículo
+        (custo_fixo, custo_variavel, custo_encontrado), numa única consulta pelo roteador
+        (db_manager.roteador) em vez de uma busca em custo_frota por linha.
+        
+        Args:
+            placas (List[str]): Lista de placas para buscar
+            
+        Returns:
+            Dict com placa normalizada como chave e dados como valor
+        """
+        from financeiro.db_managers.database_manager import db_manager
+        
+        placas_normalizadas = list(dict.fromkeys(str(p).upper().strip() for p in placas if p))
+        if not placas_normalizadas:
+            return {}
+        
+        try:
+            placeholders = ','.join(['?' for _ in placas_normalizadas])
+            with db_manager.roteador() as conn:
+                # Mesmo critério de CustoFrotaHelper.buscar_custo_por_tipologia: primeiro custo ativo da tipologia
+                resultados = conn.execute(f"""
+                    SELECT v.placa, v.status, v.tipologia, v.data_cadastro, v.ativo,
+                           c.custo_fixo, c.custo_variavel
+                    FROM main.veiculos_suporte v
+                    LEFT JOIN main.custo_frota c ON c.rowid = (
+                        SELECT c2.rowid FROM main.custo_frota c2
+                        WHERE UPPER(c2.tipo_veiculo) = UPPER(TRIM(v.tipologia)) AND c2.ativo = 1
+                        LIMIT 1
+                    )
+                    WHERE v.placa IN ({placeholders}) AND v.ativo = 1
+                """, placas_normalizadas).fetchall()
+        except Exception as e:
+            print(f"❌ Erro ao buscar placas com custo da frota: {e}")
+            return {}
+        
+        dados_encontrados = {}
+        for resultado in resultados:
+            custo_encontrado = resultado[5] is not None
+            dados_encontrados[resultado[0]] = {
+                'placa': resultado[0],
+                'status': resultado[1],
+                'tipologia': resultado[2],
+                'data_cadastro': resultado[3],
+                'ativo': bool(resultado[4]),
+                'encontrado': True,
+                'custo_fixo': float(resultado[5]) if custo_encontrado else 0.0,
+                'custo_variavel': float(resultado[6] or 0) if custo_encontrado else 0.0,
+                'custo_encontrado': custo_encontrado
+            }
+        
+        for placa in placas_normalizadas:
+            if placa not in dados_encontrados:
+                dados_encontrados[placa] = {
+                    'placa': placa,
+                    'status': None,
+                    'tipologia': None,
+                    'data_cadastro': None,
+                    'ativo': False,
+                    'encontrado': False,
+                    'custo_fixo': 0.0,
+                    'custo_variavel': 0.0,
+                    'custo_encontrado': False
+                }
+        
+        return dados_encontrados
+    
     @staticmethod
     def get_status_resumo() -> Dict:
         """
@@ -1,8 +1,9 @@
 import sys
 import os
-sys.path.append('financeiro')
+# Raiz do projeto no path: importacao usa imports relativos do pacote financeiro
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from importacao import salvar_contas_receber
+from financeiro.importacao import salvar_contas_receber
 import pandas as pd
 
 print("=== IMPORTANDO DADOS PARA O BANCO ===\n")
@@ -10,7 +10,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Importar e rodar a aplicação
-from financeiro.main import app
+from financeiro.main import app, preparar_banco
 
 if __name__ == "__main__":
     print("🚀 Iniciando servidor Flask...")
@@ -19,4 +19,5 @@ if __name__ == "__main__":
     print("⭐ Para testar semanas estáticas: http://IP_DO_SERVIDOR:5000/planejamento_frz?mes=3&ano=2025")
     print()
     
+    preparar_banco()
     app.run(debug=True, host="0.0.0.0", port=5000)
\ No newline at end of file
@@ -0,0 +1,286 @@
+"""
+Benchmark da importação de contas a receber / contas a pagar.
+
+Gera exportações sintéticas do ERP (cabeçalhos reais, valores no formato
+brasileiro, utf-8 ou latin-1, separador ';' ou ','), importa cada uma num
+banco SQLite temporário e emite JSON com linhas/s, pico de memória (RSS) e
+tempo por fase: leitura (parse do CSV), conversão (mapeamento, valores,
+chaves de data), gravação (executemany) e finalização (índices, troca da
+tabela, resumos). Cada caso roda num processo próprio, para o pico de RSS
+ser só dele.
+
+Uso:
+    python tools/benchmark_importacao.py --linhas 10000 100000 --saida bench.json
+    python tools/benchmark_importacao.py --tipos pagar --modos incremental --encodings latin-1
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+CABECALHO_RECEBER = [
+    'CNPJ Filial', 'Filial', 'CNPJ Cliente', 'Cliente', 'Sequência', 'Nº Documento', 'Cheque',
+    'Emissão', 'Vencimento', 'Vencimento Original', 'Competência', 'Valor Principal', 'Juros/Desc',
+    'Valor Título', 'Data Baixa', 'Data Liquidação', 'Banco Pagto', 'Conta Pagto', 'Forma Pagto',
+    'Observações', 'Conta Contábil', 'Status', 'Email para fatura'
+]
+
+CABECALHO_PAGAR = [
+    'CNPJ Filial', 'Filial', 'CNPJ Fornecedor', 'Fornecedor', 'Sequência', 'Nº Documento', 'Cheque',
+    'Emissão', 'Vencimento', 'Vencimento Original', 'Competência', 'Valor Principal', 'Juros/Desc',
+    'Valor Título', 'Data Baixa', 'Data Liquidação', 'Banco Pagto', 'Conta Pagto', 'Forma Pagto',
+    'Observações', 'Conta Contábil', 'Centro de Custo', 'Status', 'Descrição Despesa'
+]
+
+CLIENTES = ['MINERVA S A', 'ADORO S.A.', 'GTFOODS BARUERI', 'SAUDALI', 'MARFRIG - PROMISSAO',
+            'VALENCIO JATAÍ', 'LATICINIO CARMONA', 'SANTA LUCIA']
+FORNECEDORES = ['POSTO SÃO JOSÉ LTDA', 'AUTO PEÇAS VALE', 'PNEUS PARAÍBA', 'SEGURADORA FROTA',
+                'ENERGIA ELÉTRICA', 'ALUGUEL GALPÃO SJC']
+CENTROS_CUSTO = ['LSP Transportes', 'Armazém SJC', 'Armazém JAC', 'Administrativo', '']
+STATUS_RECEBER = ['Recebido', 'ABERTO', 'Pendente', 'Cancelado']
+STATUS_PAGAR = ['PAGO', 'Pago', 'ABERTO', 'Cancelado']
+
+MODOS = ('completo', 'incremental', 'carregar_dataframe')
+
+
+# =========================
+# Gerador de exportações sintéticas
+# =========================
+
+def _valor_br(valor):
+    """1234567.8 -> '1.234.567,80'"""
+    texto = f"{valor:,.2f}"
+    return texto.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def gerar_exportacao(caminho, tipo, linhas, encoding='utf-8', separador=';', semente=1):
+    """Grava uma exportação sintética de contas a receber ('receber') ou a pagar ('pagar')."""
+    rnd = random.Random(semente)
+    cabecalho = CABECALHO_RECEBER if tipo == 'receber' else CABECALHO_PAGAR
+    nomes = CLIENTES if tipo == 'receber' else FORNECEDORES
+    status = STATUS_RECEBER if tipo == 'receber' else STATUS_PAGAR
+
+    with open(caminho, 'w', encoding=encoding, newline='') as f:
+        escritor = csv.writer(f, delimiter=separador, quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        escritor.writerow(cabecalho)
+        for i in range(linhas):
+            ano = rnd.choice((2024, 2025, 2026))
+            mes, dia = rnd.randint(1, 12), rnd.randint(1, 28)
+            emissao = f"{dia:02d}/{mes:02d}/{ano}"
+            venc_mes = mes % 12 + 1
+            vencimento = f"{dia:02d}/{venc_mes:02d}/{ano + (mes == 12)}"
+            valor = round(rnd.lognormvariate(8, 1.5), 2)
+            juros = round(rnd.uniform(-50, 50), 2) if rnd.random() < 0.1 else 0.0
+            baixado = rnd.random() < 0.6
+            baixa = vencimento if baixado else ''
+            # Alguns valores vêm vazios ou em formato inválido, como nas exportações reais
+            valor_texto = _valor_br(valor) if rnd.random() > 0.01 else rnd.choice(('', '-', 'N/D'))
+
+            campos = [
+                '12.345.678/0001-90', rnd.choice(('MATRIZ', 'FILIAL SJC', 'FILIAL JAC')),
+                f"{rnd.randint(10, 99)}.{rnd.randint(100, 999)}.{rnd.randint(100, 999)}/0001-{rnd.randint(10, 99)}",
+                rnd.choice(nomes), f"{i % 12 + 1:03d}", f"{100000 + i // 12}", '',
+                emissao, vencimento, vencimento, f"{mes:02d}/{ano}",
+                valor_texto, _valor_br(juros), _valor_br(valor + juros),
+                baixa, baixa, 'BANCO DO BRASIL' if baixado else '', '12345-6' if baixado else '',
+                rnd.choice(('PIX', 'BOLETO', 'TED')) if baixado else '',
+                rnd.choice(('', 'Ref. frete', 'Parcela; ajuste "manual"')), '110001',
+            ]
+            if tipo == 'pagar':
+                campos += [rnd.choice(CENTROS_CUSTO), rnd.choice(status), rnd.choice(('Combustível', 'Manutenção', 'Seguro'))]
+            else:
+                campos += [rnd.choice(status), 'financeiro@cliente.com.br']
+            escritor.writerow(campos)
+    return caminho
+
+
+# =========================
+# Execução de um caso (processo filho)
+# =========================
+
+def _pico_rss_mb():
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa em KB, macOS em bytes
+        return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+    except Exception:
+        return None
+
+
+def _instrumentar(imp, fases):
+    """Envolve as funções de cada fase da importação para acumular o tempo gasto nelas."""
+
+    def cronometrar(funcao, fase):
+        def envolvida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                fases[fase] += time.perf_counter() - inicio
+        return envolvida
+
+    ler_blocos = imp.ler_blocos
+
+    def ler_blocos_cronometrado(*args, **kwargs):
+        blocos = ler_blocos(*args, **kwargs)
+        while True:
+            inicio = time.perf_counter()
+            try:
+                bloco = next(blocos)
+            except StopIteration:
+                fases['leitura'] += time.perf_counter() - inicio
+                return
+            fases['leitura'] += time.perf_counter() - inicio
+            yield bloco
+
+    imp.ler_blocos = ler_blocos_cronometrado
+    imp._dialeto_do_arquivo = cronometrar(imp._dialeto_do_arquivo, 'leitura')
+    imp.mapear_colunas = cronometrar(imp.mapear_colunas, 'conversao')
+    imp._converter_bloco = cronometrar(imp._converter_bloco, 'conversao')
+    imp._inserir_bloco = cronometrar(imp._inserir_bloco, 'gravacao')
+
+
+def executar_caso(caso):
+    """Importa caso['arquivo'] num banco temporário e retorna as medições."""
+    from financeiro import importacao as imp
+
+    pasta = tempfile.mkdtemp(prefix='bench_importacao_')
+    imp.DB_PATH = os.path.join(pasta, 'financeiro.db')
+    conn = sqlite3.connect(imp.DB_PATH)
+    with open(os.path.join(RAIZ, 'financeiro', 'schema.sql'), encoding='utf-8') as f:
+        conn.executescript(f.read())
+    conn.close()
+
+    fases = {'leitura': 0.0, 'conversao': 0.0, 'gravacao': 0.0}
+    _instrumentar(imp, fases)
+    tabela = 'contas_receber' if caso['tipo'] == 'receber' else 'contas_pagar'
+    kwargs = {'tamanho_bloco': caso['bloco']} if caso.get('bloco') else {}
+
+    saida = io.StringIO()
+    inicio = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(saida):
+            if caso['modo'] == 'carregar_dataframe':
+                linhas = len(imp.carregar_dataframe(caso['arquivo']))
+            elif caso['modo'] == 'completo':
+                salvar = imp.salvar_contas_receber if caso['tipo'] == 'receber' else imp.salvar_contas_pagar
+                linhas = salvar(caso['arquivo'], **kwargs)['linhas']
+            else:
+                linhas = imp.importar_incremental(caso['arquivo'], tabela, **kwargs)['linhas']
+        total = time.perf_counter() - inicio
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    if caso['modo'] == 'carregar_dataframe':
+        fases = {'carregar_dataframe': total}
+    else:
+        fases['finalizacao'] = max(total - sum(fases.values()), 0.0)
+
+    return {
+        **{k: caso[k] for k in ('tipo', 'modo', 'linhas_arquivo', 'encoding', 'separador', 'bloco')},
+        'linhas_importadas': linhas,
+        'segundos': round(total, 3),
+        'linhas_por_segundo': round(linhas / total) if total else None,
+        'pico_rss_mb': _pico_rss_mb(),
+        'fases_s': {fase: round(t, 3) for fase, t in fases.items()},
+    }
+
+
+# =========================
+# Orquestração
+# =========================
+
+def _metadados():
+    import pandas as pd
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'sqlite': sqlite3.sqlite_version,
+        'plataforma': platform.platform(),
+    }
+
+
+def _rodar_em_processo(caso):
+    processo = subprocess.run([sys.executable, os.path.abspath(__file__), '--caso', json.dumps(caso)],
+                              capture_output=True, text=True, encoding='utf-8')
+    if processo.returncode != 0:
+        return {**caso, 'erro': processo.stderr.strip().splitlines()[-1:] or ['falha sem saída']}
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da importação de contas a receber/pagar")
+    parser.add_argument('--linhas', type=int, nargs='+', default=[10000, 50000])
+    parser.add_argument('--tipos', nargs='+', choices=('receber', 'pagar'), default=['receber', 'pagar'])
+    parser.add_argument('--modos', nargs='+', choices=MODOS, default=list(MODOS))
+    parser.add_argument('--encodings', nargs='+', choices=('utf-8', 'latin-1'), default=['utf-8', 'latin-1'])
+    parser.add_argument('--separadores', nargs='+', choices=(';', ','), default=[';', ','])
+    parser.add_argument('--bloco', type=int, default=None, help="linhas por bloco (padrão: TAMANHO_BLOCO)")
+    parser.add_argument('--semente', type=int, default=1)
+    parser.add_argument('--saida', help="arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument('--caso', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.caso:
+        print(json.dumps(executar_caso(json.loads(args.caso)), ensure_ascii=False))
+        return
+
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix='bench_exportacoes_') as pasta:
+        for linhas in args.linhas:
+            for tipo in args.tipos:
+                for encoding in args.encodings:
+                    for separador in args.separadores:
+                        nome = f"contas-a-{tipo}.{linhas}.{encoding}.{'pv' if separador == ';' else 'v'}.csv"
+                        arquivo = gerar_exportacao(os.path.join(pasta, nome), tipo, linhas, encoding,
+                                                   separador, args.semente)
+                        for modo in args.modos:
+                            caso = {'arquivo': arquivo, 'tipo': tipo, 'modo': modo, 'linhas_arquivo': linhas,
+                                    'encoding': encoding, 'separador': separador, 'bloco': args.bloco}
+                            resultado = _rodar_em_processo(caso)
+                            resultado.pop('arquivo', None)
+                            resultados.append(resultado)
+                            print(f"⏱️ {tipo} {modo} {linhas:,} linhas {encoding} '{separador}': "
+                                  f"{resultado.get('segundos', '-')}s, {resultado.get('linhas_por_segundo', '-')} linhas/s, "
+                                  f"RSS {resultado.get('pico_rss_mb', '-')} MB", file=sys.stderr)
+
+    relatorio = {**_metadados(), 'casos': resultados}
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+        print(f"📄 Resultado gravado em {args.saida}", file=sys.stderr)
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()